@@ -3,10 +3,12 @@ import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from data_loader import DataLoader
+from data_loader import DataLoader, APP_CACHE_BYTES
 from signal_cache import SignalCacheBuilder, SignalCacheReader
 from indicators import Indicators
 from strategies import Strategies
+import strategy_registry
+import scan_engine
 import datetime
 import os
 
@@ -88,14 +90,6 @@ with st.sidebar.expander("📊 数据状态 (Data Status)", expanded=True):
         
     st.markdown("---")
     if st.button("📥 立即下载行情数据 (Download)", help="从腾讯财经下载日线数据到本地"):
-        import concurrent.futures
-        import requests
-        import json
-        
-        # Define download logic inline or import if path allows
-        # To ensure stability, let's use a simplified inline version or call the script function if adjusted.
-        # Let's use a robust inline version adapted for Streamlit.
-        
         status_container = st.status("正在初始化下载任务...", expanded=True)
         
         # 1. Check Stock List
@@ -116,85 +110,52 @@ with st.sidebar.expander("📊 数据状态 (Data Status)", expanded=True):
             
         # 2. Download Loop
         stocks = stock_df.to_dict('records')
-        total_d = len(stocks)
-        params_list = []
-        
-        # Prepare params
-        for s in stocks:
-             code = s['code']
-             if code.startswith('6'): symbol = f"sh{code}"
-             elif code.startswith('0') or code.startswith('3'): symbol = f"sz{code}"
-             else: symbol = f"sz{code}" # fallback
-             params_list.append((code, symbol))
-             
-        status_container.write("正在并发下载数据 (Tencent API)...")
-        progress_bar = status_container.progress(0)
         
-        def download_one(args):
-            c, sym = args
-            url = f"http://web.ifzq.gtimg.cn/appstock/app/fqkline/get?_var=kline_dayqfq&param={sym},day,,,600,qfq"
-            try:
-                r = requests.get(url, timeout=2)
-                if r.status_code != 200: return False
-                content = r.text
-                if "=" in content: json_str = content.split("=", 1)[1]
-                else: json_str = content
-                data = json.loads(json_str)
-                k_data = data.get('data', {}).get(sym, {})
-                klines = k_data.get('qfqday', []) or k_data.get('day', [])
-                if not klines: return False
-                
-                # Save
-                cols = ['date', 'open', 'close', 'high', 'low', 'volume']
-                recs = []
-                for k in klines:
-                    if len(k) < 6: continue
-                    recs.append({
-                        'date': k[0], 
-                        'open': k[1], 'close': k[2], 
-                        'high': k[3], 'low': k[4], 'volume': k[5]
-                    })
-                if recs:
-                    original_data_path = "stock_app/data/market_data"
-                    if not os.path.exists(original_data_path): os.makedirs(original_data_path)
-                    pd.DataFrame(recs).to_csv(os.path.join(original_data_path, f"{c}.csv"), index=False)
-                    return True
-            except:
-                return False
-            return False
-
-        # Run ThreadPool
-        done_count = 0
-        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-            futures = [executor.submit(download_one, p) for p in params_list]
-            for f in concurrent.futures.as_completed(futures):
-                done_count += 1
-                if done_count % 50 == 0:
-                    progress_bar.progress(done_count / total_d)
-                    
-        status_container.update(label="下载完成!", state="complete", expanded=False)
-        st.success(f"下载任务结束。正在自动构建信号缓存...")
-        
-        # Auto-trigger cache rebuild after download
-        cache_builder = SignalCacheBuilder()
-        cache_status = st.status("正在构建信号缓存...", expanded=True)
-        cache_progress = cache_status.progress(0)
-        cache_text = cache_status.empty()
+        # Incremental mode: only the bars after the last stored date are requested
+        # and appended; a full 600-bar refetch happens only on qfq changes.
+        # Each stock goes straight from the asyncio downloader into a process pool
+        # that computes its signals, so downloading and the cache rebuild overlap.
+        import asyncio
+        from refresh_pipeline import refresh_pipeline
+        from symbol_manifest import SymbolManifest
         
-        def cache_progress_callback(current, total, message):
-            cache_progress.progress(current / total)
-            cache_text.write(f"{message} ({current}/{total})")
+        status_container.write("正在并发下载数据并同步计算信号 (Tencent API, 增量模式)...")
+        progress_bar = status_container.progress(0)
+        cache_progress = status_container.progress(0)
+        cache_text = status_container.empty()
         
-        cache_success = cache_builder.build_all_signals(progress_callback=cache_progress_callback)
+        def pipeline_progress(stage, done_count, total, message):
+            if stage == 'download':
+                if done_count % 50 == 0 or done_count == total:
+                    progress_bar.progress(done_count / total)
+            elif total and (done_count % 50 == 0 or done_count == total):
+                cache_progress.progress(min(done_count / total, 1.0))
+                cache_text.write(f"正在计算信号: {message} ({done_count}/{total})")
         
-        if cache_success:
-            cache_status.update(label="缓存构建完成！", state="complete", expanded=False)
+        try:
+            refresh_stats = asyncio.run(refresh_pipeline(stocks, progress_callback=pipeline_progress,
+                                                         manifest=SymbolManifest()))
+            fetch_summary = refresh_stats['fetch']
+            status_container.write(f"请求数 {fetch_summary.get('requests', 0)}, "
+                                   f"吞吐 {fetch_summary.get('requests_per_s', 0):.1f}/s, "
+                                   f"下载 {refresh_stats['download_s']:.0f}s / 总计 {refresh_stats['total_s']:.0f}s")
+            status_container.update(label="下载与缓存构建完成!", state="complete", expanded=False)
             st.success("🎉 数据下载和缓存构建全部完成！")
-        else:
-            cache_status.update(label="缓存构建部分完成", state="running", expanded=False)
-            st.warning("数据已下载，但缓存构建遇到一些问题，部分功能可能较慢")
+        except Exception as e:
+            status_container.update(label="刷新未完成", state="error", expanded=False)
+            st.warning(f"数据刷新遇到问题，部分功能可能较慢: {e}")
         
         st.rerun()
+    
+    if st.button("⚡ 快速更新今日行情 (Quotes)", help="收盘后用批量实时行情接口追加当日K线，仅数十次请求"):
+        from realtime_quotes import update_from_quotes
+        
+        if os.path.exists(list_path):
+            with st.spinner("正在批量获取当日行情..."):
+                quote_stats = update_from_quotes(pd.read_csv(list_path, dtype={'code': str})['code'].tolist())
+            st.success(f"当日K线更新完成: {quote_stats}")
+        else:
+            st.error("未找到股票列表，请先使用完整下载。")
 
 # --- Theme Toggle ---
 if 'theme' not in st.session_state:
@@ -418,6 +379,9 @@ st.sidebar.markdown("---")
 app_mode = st.sidebar.radio("模式选择 (Mode)", 
     ["策略选股 (Screening)", "个股行情 (Analysis)", 
      "强势股进攻 (Strong Attack)", "弱势股抄底 (Weak Reversal)"])
+scan_executor = st.sidebar.selectbox("扫描并行方式 (Executor)", list(scan_engine.EXECUTORS),
+                                     index=list(scan_engine.EXECUTORS).index(scan_engine.DEFAULT_EXECUTOR),
+                                     help="process: 多进程; thread: 多线程; serial: 单线程 (调试)")
 
 # --- Strategy Selection (Sidebar) ---
 # Only show strategy selection in Screening Mode? 
@@ -742,9 +706,66 @@ def get_loader():
     # Use absolute path relative to this file
     current_dir = os.path.dirname(os.path.abspath(__file__))
     data_dir = os.path.join(current_dir, "data/market_data")
-    return DataLoader(data_dir=data_dir)
+    # The app's loader lives for the whole server: the only one with a frame cache
+    return DataLoader(data_dir=data_dir, cache_bytes=APP_CACHE_BYTES)
 loader = get_loader()
-stock_list_df = loader.get_stock_list()
+# Known-dead symbols (repeated download failures) are left out of scan universes
+stock_list_df = loader.get_stock_list(exclude_dead=True)
+
+
+@st.cache_resource
+def get_scan_pool(data_dir):
+    # One warm worker pool for every rerun and session; started on the first scan
+    return scan_engine.WarmPool(data_dir)
+
+
+if scan_executor == 'process':
+    scan_pool = get_scan_pool(loader.data_dir)
+    with st.sidebar.expander("⚙️ 扫描进程池 (Worker Pool)"):
+        pool_status = scan_pool.status()
+        st.write(f"{pool_status['workers']} workers · "
+                 f"{'运行中' if pool_status['running'] else '未启动'} · 已重启 {pool_status['restarts']} 次")
+        if pool_status['last_restart_reason']:
+            st.caption(f"上次重启: {pool_status['last_restart_reason']}")
+        if pool_status['pending_restart']:
+            st.caption(f"待重启: {pool_status['pending_restart']} (等待 {pool_status['active_scans']} 个扫描结束)")
+        if st.button("♻️ 重启进程池", help="数据文件变化时会自动重启；worker 异常时也可手动重启"):
+            if not scan_pool.request_restart("manual"):
+                st.info("有扫描正在运行，进程池将在扫描结束后重启。")
+else:
+    scan_pool = None
+
+
+def run_scan(job):
+    """Run a scan_engine.ScanJob over the stock list with a progress bar (a rerun cancels it)."""
+    engine = scan_engine.ScanEngine(scan_executor)
+    st.write(f"正在使用 {engine.workers} 个 worker ({scan_executor}) 扫描...")
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+
+    def progress_callback(current, total, message):
+        progress_bar.progress(current / total)
+        status_text.text(message)
+
+    result = engine.run(job, stock_list_df, progress_callback=progress_callback, loader=loader, pool=scan_pool)
+    progress_bar.empty()
+    status_text.empty()
+    st.caption(f"数据源: {'内存映射行情面板 (panel)' if result.source == 'panel' else '个股文件 (files)'}")
+    if result.vectorized:
+        st.caption(f"{result.vectorized} 只股票由全市场信号立方体 (向量化) 一次评估。")
+    if result.file_fallback:
+        st.caption(f"{result.file_fallback} 只股票不在行情面板中 (面板构建后新增)，已从个股文件读取；重建面板可加速。")
+    return result
+
+
+def chart_load_start(family, keys, start):
+    """
+    First date a chart loads: the same warm-up a ScanJob of ``keys`` loads, so its
+    markers match the scan (EMA200 / UA signals depend on the loaded history).
+    Without a selection, the longest warm-up of the family.
+    """
+    specs = strategy_registry.select(family, keys) or strategy_registry.for_family(family)
+    return strategy_registry.load_start(start, specs).strftime("%Y-%m-%d")
 
 # --- Main Application Logic ---
 
@@ -792,7 +813,7 @@ if app_mode == "个股行情 (Analysis)":
             # Need strict load range for proper indicator calc? 
             # Loader basically just loads file, we filter later.
             # But calculating indicators needs history.
-            load_start = (analysis_start - datetime.timedelta(days=400)).strftime("%Y-%m-%d")
+            load_start = chart_load_start('screen', [], analysis_start)
             load_end = analysis_end.strftime("%Y-%m-%d")
             
             df = loader.get_k_data(code, load_start, load_end)
@@ -863,16 +884,6 @@ elif app_mode == "策略选股 (Screening)":
             
         st.info(f"正在扫描 {chart_start} 至 {chart_end} 期间符合策略的股票...")
         
-        stock_codes = stock_list_df['code'].tolist()
-        
-        # Prepare Dates
-        # Load enough data for indicators (e.g. 400 days before start)
-        load_start_str = (chart_start - datetime.timedelta(days=400)).strftime("%Y-%m-%d")
-        load_end_str = chart_end.strftime("%Y-%m-%d")
-        
-        scan_start_str = chart_start.strftime("%Y-%m-%d")
-        scan_end_str = chart_end.strftime("%Y-%m-%d")
-        
         # Determine Check Config
         # (is_checked, col_str, disp_name)
         checks_config = [
@@ -894,51 +905,18 @@ elif app_mode == "策略选股 (Screening)":
             (strat_es, 'Signal_ES', "ES"),
         ]
         
-        tasks = []
-        for code in stock_codes:
-            row = stock_list_df[stock_list_df['code'] == code].iloc[0]
-            name = row.get('name', code)
-            tasks.append((code, name, load_start_str, load_end_str, scan_start_str, scan_end_str, checks_config))
-            
-        import multiprocessing
-        # Use almost all cores
-        cpu_count = max(1, multiprocessing.cpu_count() - 1)
-        
-        from scanner import scan_single_stock
-        
-        # Progress Bar Logic
-        total = len(tasks)
-        processed = 0
-        results = []
-        
-        st.write(f"正在使用 {cpu_count} 个 CPU 核心进行并行筛选...")
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        selected = [col for chk, col, _ in checks_config if chk]
+        if not selected:
+            st.warning("请至少选择一个策略!")
+            st.stop()
         
-        with multiprocessing.Pool(processes=cpu_count) as pool:
-            # unordered yields results as soon as they are ready
-            for res in pool.imap_unordered(scan_single_stock, tasks, chunksize=10):
-                processed += 1
-                if processed % 100 == 0 or processed == total:
-                    progress_bar.progress(processed / total)
-                    status_text.text(f"Scanning {processed}/{total}...")
-                
-                if res:
-                    results.append(res)
-                
-        progress_bar.empty()
-        status_text.empty()
+        # Chunks are loaded in batches and scanned in parallel (scan_engine)
+        result = run_scan(scan_engine.ScanJob('screen', selected, chart_start, chart_end, checks_config=checks_config))
+        results = result.rows
         
         if results:
-            res_df = pd.DataFrame(results)
-            # Sort by Signal Date Descending
-            if 'Signal Date' in res_df.columns:
-                res_df['Signal Date'] = pd.to_datetime(res_df['Signal Date'])
-                res_df = res_df.sort_values(by='Signal Date', ascending=False)
-                res_df['Signal Date'] = res_df['Signal Date'].dt.strftime('%Y-%m-%d')
-                
-            st.session_state['scan_results'] = res_df
+            # Sorted by Signal Date descending
+            st.session_state['scan_results'] = result.to_frame()
             st.success(f"筛选完成！发现 {len(results)} 只符合条件的股票 (Date Range Scan)。")
         else:
             st.session_state['scan_results'] = pd.DataFrame()
@@ -1004,7 +982,26 @@ elif app_mode == "策略选股 (Screening)":
             # Show Chart
             # We need to load data again for this specific stock
             # Use strict load range?
-            load_start_s = (chart_start - datetime.timedelta(days=400)).strftime("%Y-%m-%d")
+            checks_map = {
+                'Signal_Fighting': strat_fighting,
+                'Signal_CYC_MAX': strat_cyc,
+                'Signal_RangeBreak': strat_range,
+                'Signal_20VMA': strat_20vma,
+                'Signal_HMC': strat_hmc,
+                'Signal_HPS': strat_hps,
+                'Signal_TKOS': strat_tkos,
+                'Signal_RKing': strat_rking,
+                'Signal_Limit': strat_limit,
+                'Signal_Boll_Rev': strat_boll,
+                'Signal_RSI2_Rev': strat_rsi,
+                'Signal_2B': strat_2b,
+                'Signal_Wyckoff': strat_wyckoff,
+                'Signal_Spring': strat_spring,
+                'Signal_Pinbar': strat_pinbar,
+                'Signal_ES': strat_es
+            }
+            # Same load window as the scan of the checked strategies
+            load_start_s = chart_load_start('screen', [col for col, chk in checks_map.items() if chk], chart_start)
             load_end_s = chart_end.strftime("%Y-%m-%d")
             
             df_s = loader.get_k_data(code_s, load_start_s, load_end_s)
@@ -1022,25 +1019,6 @@ elif app_mode == "策略选股 (Screening)":
                 # We want to see where the selected strategies triggered
                 final_sig = pd.Series(True, index=df_s.index)
                 selected_any_cfg = False
-                 
-                checks_map = {
-                    'Signal_Fighting': strat_fighting,
-                    'Signal_CYC_MAX': strat_cyc,
-                    'Signal_RangeBreak': strat_range,
-                    'Signal_20VMA': strat_20vma,
-                    'Signal_HMC': strat_hmc,
-                    'Signal_HPS': strat_hps,
-                    'Signal_TKOS': strat_tkos,
-                    'Signal_RKing': strat_rking,
-                    'Signal_Limit': strat_limit,
-                    'Signal_Boll_Rev': strat_boll,
-                    'Signal_RSI2_Rev': strat_rsi,
-                    'Signal_2B': strat_2b,
-                    'Signal_Wyckoff': strat_wyckoff,
-                    'Signal_Spring': strat_spring,
-                    'Signal_Pinbar': strat_pinbar,
-                    'Signal_ES': strat_es
-                }
                 
                 for col_name, is_chk in checks_map.items():
                     if is_chk:
@@ -1176,96 +1154,17 @@ elif app_mode == "强势股进攻 (Strong Attack)":
         st.info(f"正在扫描 {strong_start} 至 {strong_end} 期间符合强势股策略的股票...")
         st.write(f"已选策略: {', '.join(selected_strats)}")
         
-        # Prepare dates
-        load_start_str = (strong_start - datetime.timedelta(days=400)).strftime("%Y-%m-%d")
-        load_end_str = strong_end.strftime("%Y-%m-%d")
-        scan_start_str = strong_start.strftime("%Y-%m-%d")
-        scan_end_str = strong_end.strftime("%Y-%m-%d")
-        
-        # Load index data if RS is selected
-        index_data = None
-        if 'RS' in selected_strats:
+        # The index (RS) is loaded once and shared by every worker
+        job = scan_engine.ScanJob('strong', selected_strats, strong_start, strong_end)
+        if 'index' in job.inputs:
             st.write("加载上证指数数据用于RS计算...")
-            index_code = "000001"  # 上证指数
-            index_data = loader.get_k_data(index_code, load_start_str, load_end_str)
-            if index_data.empty:
-                st.warning("上证指数数据缺失，RS策略将被跳过。")
-        
-        # Scan stocks
-        stock_codes = stock_list_df['code'].tolist()
-        results = []
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for idx, code in enumerate(stock_codes):
-            if idx % 100 == 0 or idx == len(stock_codes) - 1:
-                progress_bar.progress((idx + 1) / len(stock_codes))
-                status_text.text(f"扫描中 {idx + 1}/{len(stock_codes)}...")
-            
-            # Load stock data
-            df = loader.get_k_data(code, load_start_str, load_end_str)
-            if df.empty:
-                continue
-            
-            # Get stock name
-            name = stock_list_df[stock_list_df['code'] == code].iloc[0]['name']
-            
-            # Check strategies
-            try:
-                signals = StrongStrategies.check_all_strong_strategies(
-                    df, 
-                    index_df=index_data,
-                    selected_strategies=selected_strats
-                )
-                
-                # Merge with df for date filtering
-                df_with_signals = df.copy()
-                for col in signals.columns:
-                    df_with_signals[col] = signals[col]
-                
-                # Filter to scan range
-                df_scan = df_with_signals[
-                    (df_with_signals['date'].dt.date >= strong_start) & 
-                    (df_with_signals['date'].dt.date <= strong_end)
-                ]
-                
-                if df_scan.empty:
-                    continue
-                
-                # Check if any signal triggered
-                signal_cols = [f'Signal_{s}' for s in selected_strats]
-                # AND logic: all selected strategies must be True
-                combined_signal = df_scan[signal_cols].all(axis=1)
-                
-                if combined_signal.any():
-                    # Find first signal date
-                    signal_dates = df_scan[combined_signal]['date']
-                    if not signal_dates.empty:
-                        first_signal_date = signal_dates.iloc[-1]  # Most recent
-                        
-                        # Get latest close price
-                        latest_close = df_scan['close'].iloc[-1]
-                        
-                        results.append({
-                            'Code': code,
-                            'Name': name,
-                            'Signal Date': first_signal_date,
-                            'Close': latest_close,
-                            'Strategies': ', '.join(selected_strats)
-                        })
-            except Exception as e:
-                # Skip stocks with errors
-                continue
-        
-        progress_bar.empty()
-        status_text.empty()
+        result = run_scan(job)
+        if 'index' in job.inputs and (job.index_df is None or job.index_df.empty):
+            st.warning("上证指数数据缺失，RS策略将被跳过。")
+        results = result.rows
         
         if results:
-            res_df = pd.DataFrame(results)
-            res_df['Signal Date'] = pd.to_datetime(res_df['Signal Date'])
-            res_df = res_df.sort_values(by='Signal Date', ascending=False)
-            res_df['Signal Date'] = res_df['Signal Date'].dt.strftime('%Y-%m-%d')
+            res_df = result.to_frame()
             
             st.session_state['strong_scan_results'] = res_df
             st.success(f"筛选完成！发现 {len(results)} 只符合条件的强势股。")
@@ -1319,7 +1218,16 @@ elif app_mode == "强势股进攻 (Strong Attack)":
         
         if code_s:
             # Display Chart
-            load_start_s = (strong_start - datetime.timedelta(days=400)).strftime("%Y-%m-%d")
+            selected_strats_chart = []
+            if strat_zscore: selected_strats_chart.append('Z_Score')
+            if strat_rs: selected_strats_chart.append('RS')
+            if strat_tkos_strong: selected_strats_chart.append('TKOS')
+            if strat_dtr: selected_strats_chart.append('DTR_Plus')
+            if strat_fighting_strong: selected_strats_chart.append('Fighting')
+            if strat_ua: selected_strats_chart.append('UA')
+            if strat_hmc_strong: selected_strats_chart.append('HMC')
+            # Same load window as the scan of the selected strategies
+            load_start_s = chart_load_start('strong', selected_strats_chart, strong_start)
             load_end_s = strong_end.strftime("%Y-%m-%d")
             
             df_s = loader.get_k_data(code_s, load_start_s, load_end_s)
@@ -1335,15 +1243,6 @@ elif app_mode == "强势股进攻 (Strong Attack)":
                     index_code = "000001"
                     index_data_chart = loader.get_k_data(index_code, load_start_s, load_end_s)
                 
-                selected_strats_chart = []
-                if strat_zscore: selected_strats_chart.append('Z_Score')
-                if strat_rs: selected_strats_chart.append('RS')
-                if strat_tkos_strong: selected_strats_chart.append('TKOS')
-                if strat_dtr: selected_strats_chart.append('DTR_Plus')
-                if strat_fighting_strong: selected_strats_chart.append('Fighting')
-                if strat_ua: selected_strats_chart.append('UA')
-                if strat_hmc_strong: selected_strats_chart.append('HMC')
-                
                 sigs_s = StrongStrategies.check_all_strong_strategies(
                     df_s, 
                     index_df=index_data_chart,
@@ -1491,117 +1390,21 @@ elif app_mode == "弱势股抄底 (Weak Reversal)":
         st.info(f"正在扫描 {weak_start} 至 {weak_end} 期间符合抄底策略的股票...")
         st.write(f"已选策略: {', '.join(selected_strats)}")
         
-        # Warning about HLP3
+        # HLP3 uses the local chip model
         if 'HLP3' in selected_strats:
-            st.warning("""⚠️ HLP3策略需要筹码分布数据（获利盘比例）。
-            
-系统将使用 akshare 实时获取筹码数据，并自动缓存以提升性能。
-首次获取可能较慢（每只股票约0.5-1秒），后续使用缓存会很快。
-
-💡 建议：如果需要扫描大量股票，考虑先用其他策略初筛，再对结果应用HLP3。""")
-        
-        # Prepare dates
-        load_start_str = (weak_start - datetime.timedelta(days=400)).strftime("%Y-%m-%d")
-        load_end_str = weak_end.strftime("%Y-%m-%d")
-        
-        # Scan stocks
-        stock_codes = stock_list_df['code'].tolist()
-        results = []
-        hlp3_skipped_count = 0
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        for idx, code in enumerate(stock_codes):
-            if idx % 100 == 0 or idx == len(stock_codes) - 1:
-                progress_bar.progress((idx + 1) / len(stock_codes))
-                status_text.text(f"扫描中 {idx + 1}/{len(stock_codes)}...")
-            
-            # Load stock data
-            df = loader.get_k_data(code, load_start_str, load_end_str)
-            if df.empty:
-                continue
-            
-            # Get stock name
-            name = stock_list_df[stock_list_df['code'] == code].iloc[0]['name']
-            
-            # Load chip distribution data if HLP3 is selected
-            if 'HLP3' in selected_strats:
-                from chip_data_loader import ChipDataLoader
-                chip_df = ChipDataLoader.get_chip_data(code, use_cache=True)
-                if not chip_df.empty:
-                    df = ChipDataLoader.merge_with_kline(df, chip_df)
-            
-            # Check strategies
-            try:
-                signals = WeakStrategies.check_all_weak_strategies(
-                    df,
-                    selected_strategies=selected_strats,
-                    winner_col='winner_pct'  # 尝试标准列名
-                )
-                
-                # Check if HLP3 was skipped due to missing data
-                if 'HLP3_Warning' in signals.columns and signals['HLP3_Warning'].any():
-                    hlp3_skipped_count += 1
-                
-                # Merge with df for date filtering
-                df_with_signals = df.copy()
-                for col in signals.columns:
-                    if col.startswith('Signal_'):
-                        df_with_signals[col] = signals[col]
-                
-                # Filter to scan range
-                df_scan = df_with_signals[
-                    (df_with_signals['date'].dt.date >= weak_start) & 
-                    (df_with_signals['date'].dt.date <= weak_end)
-                ]
-                
-                if df_scan.empty:
-                    continue
-                
-                # Check if any signal triggered
-                signal_cols = [f'Signal_{s}' for s in selected_strats]
-                # Filter out columns that don't exist
-                signal_cols = [col for col in signal_cols if col in df_scan.columns]
-                
-                if not signal_cols:
-                    continue
-                
-                # AND logic: all selected strategies must be True
-                combined_signal = df_scan[signal_cols].all(axis=1)
-                
-                if combined_signal.any():
-                    # Find most recent signal date
-                    signal_dates = df_scan[combined_signal]['date']
-                    if not signal_dates.empty:
-                        first_signal_date = signal_dates.iloc[-1]
-                        
-                        # Get latest close price
-                        latest_close = df_scan['close'].iloc[-1]
-                        
-                        results.append({
-                            'Code': code,
-                            'Name': name,
-                            'Signal Date': first_signal_date,
-                            'Close': latest_close,
-                            'Strategies': ', '.join(selected_strats)
-                        })
-            except Exception as e:
-                # Skip stocks with errors
-                continue
+            st.info("ℹ️ HLP3 获利盘比例由本地筹码分布模型（换手率衰减）按批次计算，无需联网。")
         
-        progress_bar.empty()
-        status_text.empty()
+        # Chip distribution (HLP3) is computed per chunk inside the workers
+        result = run_scan(scan_engine.ScanJob('weak', selected_strats, weak_start, weak_end))
+        results = result.rows
+        hlp3_skipped_count = result.hlp3_skipped
         
         # Show HLP3 warning if applicable
         if hlp3_skipped_count > 0 and 'HLP3' in selected_strats:
             st.warning(f"⚠️ {hlp3_skipped_count} 只股票缺少获利盘数据，HLP3策略未生效。")
         
         if results:
-            res_df = pd.DataFrame(results)
-            res_df['Signal Date'] = pd.to_datetime(res_df['Signal Date'])
-            res_df = res_df.sort_values(by='Signal Date', ascending=False)
-            res_df['Signal Date'] = res_df['Signal Date'].dt.strftime('%Y-%m-%d')
+            res_df = result.to_frame()
             
             st.session_state['weak_scan_results'] = res_df
             st.success(f"筛选完成！发现 {len(results)} 只符合条件的抄底标的。")
@@ -1657,7 +1460,17 @@ elif app_mode == "弱势股抄底 (Weak Reversal)":
         
         if code_s:
             # Display Chart
-            load_start_s = (weak_start - datetime.timedelta(days=400)).strftime("%Y-%m-%d")
+            selected_strats_chart = []
+            if strat_hlp3: selected_strats_chart.append('HLP3')
+            if strat_limit: selected_strats_chart.append('Limit')
+            if strat_rsi_rev: selected_strats_chart.append('RSI_Rev')
+            if strat_spring: selected_strats_chart.append('Spring')
+            if strat_pinbar: selected_strats_chart.append('Pinbar')
+            if strat_flow: selected_strats_chart.append('Money_Flow')
+            if strat_ua_weak: selected_strats_chart.append('UA')
+            if strat_dv: selected_strats_chart.append('Double_Vol')
+            # Same load window as the scan of the selected strategies
+            load_start_s = chart_load_start('weak', selected_strats_chart, weak_start)
             load_end_s = weak_end.strftime("%Y-%m-%d")
             
             df_s = loader.get_k_data(code_s, load_start_s, load_end_s)
@@ -1668,15 +1481,9 @@ elif app_mode == "弱势股抄底 (Weak Reversal)":
                                 (df_s['date'].dt.date <= weak_end)]
                 
                 # Calculate signals for visualization
-                selected_strats_chart = []
-                if strat_hlp3: selected_strats_chart.append('HLP3')
-                if strat_limit: selected_strats_chart.append('Limit')
-                if strat_rsi_rev: selected_strats_chart.append('RSI_Rev')
-                if strat_spring: selected_strats_chart.append('Spring')
-                if strat_pinbar: selected_strats_chart.append('Pinbar')
-                if strat_flow: selected_strats_chart.append('Money_Flow')
-                if strat_ua_weak: selected_strats_chart.append('UA')
-                if strat_dv: selected_strats_chart.append('Double_Vol')
+                if 'HLP3' in selected_strats_chart:
+                    from chip_engine import ChipEngine
+                    df_s = ChipEngine.add_winner_pct(df_s)
                 
                 sigs_s = WeakStrategies.check_all_weak_strategies(
                     df_s,
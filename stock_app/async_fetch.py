@@ -0,0 +1,171 @@
+"""
+Asyncio HTTP fetch engine for the downloaders.
+
+- One aiohttp ClientSession with a keep-alive connection pool (no new TCP
+  connection per request).
+- AdaptiveLimiter: AIMD concurrency limit that grows while latency stays under
+  target and backs off on errors or latency spikes.
+- Jittered exponential retry on timeouts, connection errors, 429 and 5xx.
+- Per-request timing metrics, summarised by ``AsyncFetchEngine.summary()``.
+
+The engine only deals with URLs and response text, so it can be pointed at a
+local stub HTTP server for testing.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+
+import aiohttp
+
+
+class FetchError(Exception):
+    """Raised when a URL could not be fetched after all retries."""
+
+    def __init__(self, url, message, status=None):
+        super().__init__(f"{message} ({url})")
+        self.url = url
+        self.status = status
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit driven by observed latency and error rate (AIMD).
+
+    - success under ``target_latency``: limit += 1 / limit (≈ +1 per round of requests)
+    - success over 2 × ``target_latency``: limit × 0.9
+    - error: limit × 0.5, at most once per ``target_latency`` seconds
+    """
+
+    def __init__(self, initial=8, min_limit=2, max_limit=64, target_latency=1.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._last_backoff = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            while self.in_flight >= int(self.limit):
+                await self._cond.wait()
+            self.in_flight += 1
+
+    async def release(self, latency, ok):
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if not ok:
+                if now - self._last_backoff >= self.target_latency:
+                    self.limit = max(self.min_limit, self.limit * 0.5)
+                    self._last_backoff = now
+            elif latency > 2 * self.target_latency:
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            elif latency <= self.target_latency:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class AsyncFetchEngine:
+    """
+    Pooled, adaptive, retrying HTTP GET engine.
+
+    Usage:
+        async with AsyncFetchEngine(headers=HEADERS) as engine:
+            text = await engine.fetch_text(url)
+        print(engine.summary())
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, headers=None, timeout=5, max_retries=3, base_delay=0.5, max_delay=8.0,
+                 limiter=None, pool_size=64):
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter or AdaptiveLimiter(max_limit=pool_size)
+        self.pool_size = pool_size
+        # One record per HTTP attempt: url, status, latency, attempt, ok, error
+        self.metrics = deque(maxlen=100000)
+        self._session = None
+        self._started = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300, keepalive_timeout=30)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._started = time.monotonic()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    def _backoff(self, attempt):
+        # Full jitter: uniform(0, min(cap, base * 2^attempt))
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def fetch_text(self, url, encoding=None):
+        """GET ``url`` and return the body text, retrying transient failures."""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt - 1))
+
+            await self.limiter.acquire()
+            t0 = time.monotonic()
+            status = None
+            ok = False
+            try:
+                async with self._session.get(url) as resp:
+                    status = resp.status
+                    text = await resp.text(encoding=encoding, errors='replace')
+                if status == 200:
+                    ok = True
+                    return text
+                last_error = FetchError(url, f"HTTP {status}", status)
+                if status not in self.RETRY_STATUS:
+                    raise last_error
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = FetchError(url, f"{type(e).__name__}: {e}")
+            finally:
+                latency = time.monotonic() - t0
+                self.metrics.append({
+                    'url': url, 'status': status, 'latency': latency,
+                    'attempt': attempt + 1, 'ok': ok,
+                    'error': None if ok else str(last_error),
+                })
+                await self.limiter.release(latency, ok)
+
+        raise last_error
+
+    def summary(self):
+        """Aggregate metrics: request counts, error rate, latency percentiles, throughput."""
+        records = list(self.metrics)
+        if not records:
+            return {'requests': 0}
+        latencies = sorted(r['latency'] for r in records)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        elapsed = time.monotonic() - self._started if self._started else 0
+        ok = sum(1 for r in records if r['ok'])
+        return {
+            'requests': len(records),
+            'ok': ok,
+            'errors': len(records) - ok,
+            'retries': sum(1 for r in records if r['attempt'] > 1),
+            'p50_latency': pct(0.50),
+            'p90_latency': pct(0.90),
+            'p99_latency': pct(0.99),
+            'requests_per_s': ok / elapsed if elapsed > 0 else 0,
+            'concurrency_limit': int(self.limiter.limit),
+        }
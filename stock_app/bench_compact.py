@@ -0,0 +1,139 @@
+"""
+Memory / speed / precision benchmark of compact mode (compact_panel) on a
+full-market, 600-day panel.
+
+    python stock_app/bench_compact.py [stocks] [days]
+
+Uses the built panel (DataLoader().get_panel()) when it exists, otherwise a
+synthetic 5,000-stock market with fen-quoted prices, staggered listings and
+suspensions.
+"""
+
+import pickle
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from compact_panel import CompactPanel, check_precision
+
+# Strategy-style comparisons whose outcome compact mode could flip
+COMPARISONS = [('close', 'MA20'), ('close', 'MA250'), ('close', 'Boll_Upper'), ('close', 'EMA200'),
+               ('MA5', 'MA20'), ('DIF', 'DEA')]
+
+
+class _SyntheticView:
+    """Minimal PanelView stand-in: view[field] is (stocks × days)."""
+
+    def __init__(self, stocks, days, seed=0):
+        rng = np.random.default_rng(seed)
+        close = np.round(np.exp(np.cumsum(rng.normal(0, 0.02, (stocks, days)), axis=1))
+                         * rng.uniform(3, 80, (stocks, 1)), 2)
+        open_ = np.round(close * (1 + rng.normal(0, 0.01, close.shape)), 2)
+        high = np.maximum(open_, close) + np.round(np.abs(rng.normal(0, 0.05, close.shape)), 2)
+        low = np.minimum(open_, close) - np.round(np.abs(rng.normal(0, 0.05, close.shape)), 2)
+        volume = rng.integers(1_000, 50_000_000, close.shape).astype(np.float64)
+        amount = np.round(volume * close, 2)
+        missing = rng.random(close.shape) < 0.01
+        for i in range(0, stocks, 7):
+            missing[i, :rng.integers(0, days // 2)] = True
+        self._data = {}
+        for name, arr in (('open', open_), ('high', high), ('low', low), ('close', close),
+                          ('volume', volume), ('amount', amount)):
+            self._data[name] = np.where(missing, np.nan, arr)
+        self.codes = [f"{i:06d}" for i in range(stocks)]
+        self.dates = pd.bdate_range('2023-01-02', periods=days)
+        self.fields = list(self._data)
+
+    def __getitem__(self, field):
+        return self._data[field]
+
+
+def _timed(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _mb(n):
+    return f"{n / 2 ** 20:,.0f} MB"
+
+
+def main():
+    stocks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+
+    view = None
+    try:
+        from data_loader import DataLoader
+        view = DataLoader().get_panel()
+    except Exception:
+        view = None
+    if view is None:
+        view = _SyntheticView(stocks, days)
+        print(f"Synthetic market: {stocks} stocks × {days} days")
+    else:
+        print(f"Market panel: {len(view.codes)} stocks × {len(view.dates)} days")
+
+    float_bytes = sum(np.asarray(view[f]).nbytes for f in view.fields) + len(view.dates) * 8
+    compact, t_enc, _ = _timed(lambda: CompactPanel.from_view(view))
+    print(f"\nOHLCV  float64 {_mb(float_bytes)}  compact {_mb(compact.nbytes)}  "
+          f"({float_bytes / compact.nbytes:.1f}x smaller, encode {t_enc:.2f}s)")
+
+    # What a worker receives for a batch of 500 stocks
+    batch = [c for c in compact.codes[:500]]
+    rows = slice(0, len(batch))
+    t0 = time.perf_counter()
+    blob64 = pickle.dumps({f: np.asarray(view[f])[rows] for f in view.fields}, protocol=5)
+    t_pickle64 = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    blob_c = pickle.dumps(compact.view(codes=batch), protocol=5)
+    t_pickle_c = time.perf_counter() - t0
+    print(f"Worker batch (500 stocks)  float64 {_mb(len(blob64))} in {t_pickle64 * 1e3:.0f}ms  "
+          f"compact {_mb(len(blob_c))} in {t_pickle_c * 1e3:.0f}ms")
+
+    ind64, t64, peak64 = _timed(lambda: compact.indicators(dtype=np.float64))
+    ind32, t32, peak32 = _timed(lambda: compact.indicators(dtype=np.float32))
+    size64 = sum(a.nbytes for a in ind64.values())
+    size32 = sum(a.nbytes for a in ind32.values())
+    print(f"Indicators ({len(ind32)} columns)  float64 {_mb(size64)} in {t64:.2f}s (peak {_mb(peak64)})  "
+          f"float32 {_mb(size32)} in {t32:.2f}s (peak {_mb(peak32)})")
+
+    # Both sides in the mode's own precision: ties (e.g. EMA seeded with the first
+    # close) stay ties only when close is rounded to float32 as well
+    ind64['close'] = compact.field('close', np.float64).T
+    ind32['close'] = compact.field('close', np.float32).T
+    print("\nComparison flips float32 vs float64 (of valid bars):")
+    for left, right in COMPARISONS:
+        a64, b64 = ind64[left], ind64[right]
+        a32, b32 = ind32[left], ind32[right]
+        defined = ~(np.isnan(a64) | np.isnan(b64))
+        with np.errstate(invalid='ignore'):
+            flips = int(((a64 > b64) != (a32 > b32))[defined].sum())
+        print(f"  {left} > {right}: {flips} / {int(defined.sum())}")
+    del ind64, ind32
+
+    sample = compact.codes[:500]
+    sub = CompactPanel.from_fields(sample, view.dates, {f: np.asarray(view[f])[:len(sample)] for f in view.fields})
+
+    class _SubView:
+        codes, dates, fields = sample, view.dates, compact.fields
+
+        def __getitem__(self, field):
+            return np.asarray(view[field])[:len(sample)]
+
+    report = check_precision(_SubView(), sub)
+    pd.set_option('display.width', 120)
+    print(f"\nPrecision on {len(sample)} stocks:")
+    print(report.to_string(index=False))
+    print("Bounds:", "OK" if report['ok'].all() else "EXCEEDED")
+
+
+if __name__ == "__main__":
+    main()
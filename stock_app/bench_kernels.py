@@ -0,0 +1,103 @@
+"""
+Benchmark of the kernels module against the pandas rolling equivalents it
+replaces, on 600-bar and 5,000-bar series (one stock).
+
+    python stock_app/bench_kernels.py
+
+Every kernel result is checked against pandas before it is timed.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import kernels
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _same(a, b, exact=False):
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    if not np.array_equal(np.isnan(a), np.isnan(b)):
+        return False
+    mask = ~np.isnan(a)
+    if exact:
+        return np.array_equal(a[mask], b[mask])
+    return np.allclose(a[mask], b[mask], rtol=1e-9, atol=1e-12)
+
+
+def _make_series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = pd.Series(np.round(np.exp(np.cumsum(rng.normal(0, 0.02, n))) * 20, 2))
+    volume = pd.Series(rng.integers(1_000, 1_000_000, n).astype(float))
+    return close, volume
+
+
+def _mad(x):
+    return np.mean(np.abs(x - np.mean(x)))
+
+
+def cases(close, volume):
+    """(name, pandas fn, kernel fn, exact) for every replaced rolling operation."""
+    tp = close * 1.0
+
+    def pandas_stats():
+        return [close.rolling(w).mean() for w in (5, 20, 250)] + \
+               [close.rolling(w).std() for w in (20, 60, 120)]
+
+    def kernel_stats():
+        stats = kernels.PrefixStats(close)
+        return [stats.mean(w) for w in (5, 20, 250)] + [stats.std(w) for w in (20, 60, 120)]
+
+    return [
+        ("MA5/20/250 + Std20/60/120", pandas_stats, kernel_stats, False),
+        ("rolling max 250 (High_52)", lambda: close.rolling(250).max(),
+         lambda: kernels.rolling_max(close, 250), True),
+        ("rolling max 250 (Max_Vol_250)", lambda: volume.rolling(250).max(),
+         lambda: kernels.rolling_max(volume, 250), True),
+        ("rolling min 20", lambda: close.rolling(20).min(),
+         lambda: kernels.rolling_min(close, 20), True),
+        ("rolling argmax 250", lambda: close.rolling(250).apply(np.argmax, raw=True),
+         lambda: kernels.rolling_argmax(close, 250), True),
+        ("rolling MAD 14 (CCI)", lambda: tp.rolling(14).apply(_mad),
+         lambda: kernels.rolling_mad(tp, 14), True),
+    ]
+
+
+def run(lengths=(600, 5000), repeat=5):
+    rows = []
+    for n in lengths:
+        close, volume = _make_series(n)
+        for name, pandas_fn, kernel_fn, exact in cases(close, volume):
+            expected, got = pandas_fn(), kernel_fn()
+            if isinstance(expected, list):
+                ok = all(_same(e, g, exact) for e, g in zip(expected, got))
+            else:
+                ok = _same(expected, got, exact)
+            # Python-callback baselines are slow, time them fewer times
+            reps = 1 if 'apply' in name or 'MAD' in name or 'argmax' in name else repeat
+            t_pandas = _best_of(pandas_fn, reps)
+            t_kernel = _best_of(kernel_fn, repeat)
+            rows.append({'bars': n, 'kernel': name, 'pandas_ms': t_pandas * 1000,
+                         'kernels_ms': t_kernel * 1000, 'speedup': t_pandas / t_kernel,
+                         'matches': ok})
+    return pd.DataFrame(rows)
+
+
+def main():
+    result = run()
+    pd.set_option('display.width', 120)
+    print(result.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+
+
+if __name__ == "__main__":
+    main()
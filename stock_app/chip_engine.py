@@ -0,0 +1,189 @@
+"""
+Chip distribution (cost histogram) engine: local winner_pct for HLP3.
+
+Model (strategy_specs.md, HLP3 / Zero-Profit):
+- every stock holds a histogram of holding costs on its own price grid
+  (``bins`` equal-width bins between its lowest low and highest high)
+- each day's volume is spread uniformly over that day's [low, high]
+- old chips decay by the day's turnover rate:
+      chips[t] = chips[t-1] * (1 - turn[t]) + new_chips[t] * turn[t]
+- winner_pct = share of chips with cost below the close, in percent (0-100)
+
+The recurrence runs in jit_kernels.chip_winner_pct: a Numba loop per stock
+when numba is installed, otherwise one pass of numpy operations per trading
+day vectorized over stocks × bins.
+
+When the bars carry no ``turn`` column (the Tencent source does not report it)
+turnover is estimated from volume relative to its trailing 250-day mean,
+scaled to ``DEFAULT_AVG_TURN``.
+
+    from chip_engine import ChipEngine
+    df = ChipEngine.add_winner_pct(df)                 # one stock
+    frames = ChipEngine.add_winner_pct_many(frames)    # {code: df}, one batch
+    pct = ChipEngine.from_view(view)                   # (days × stocks) from a PanelView
+
+    python stock_app/chip_engine.py      # batch timing + batch/single parity
+"""
+
+import numpy as np
+import pandas as pd
+
+import jit_kernels
+
+DEFAULT_BINS = 120
+# Typical A-share daily turnover, used only when 'turn' is missing
+DEFAULT_AVG_TURN = 0.02
+TURN_WINDOW = 250
+
+
+class ChipEngine:
+    """Turnover-decay cost histogram, vectorized across stocks."""
+
+    @staticmethod
+    def estimate_turn(volume, avg_turn=DEFAULT_AVG_TURN, window=TURN_WINDOW):
+        """Turnover (0-1) proxy: volume / trailing mean volume * avg_turn."""
+        vol = pd.DataFrame(np.asarray(volume, dtype=np.float64).reshape(len(volume), -1))
+        mean = vol.rolling(window, min_periods=1).mean().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            turn = np.where(mean > 0, vol.to_numpy() / mean * avg_turn, 0.0)
+        turn = np.clip(turn, 0.0, 1.0)
+        return turn if np.ndim(volume) == 2 else turn[:, 0]
+
+    @staticmethod
+    def winner_pct(high, low, close, turn, bins=DEFAULT_BINS):
+        """
+        :param high, low, close: (days × stocks) or 1-D arrays, NaN where a stock has no bar
+        :param turn: turnover rate as a fraction (0-1), same shape
+        :return: winner percentage (0-100), NaN where there is no bar
+        """
+        one_d = np.ndim(close) == 1
+        h, l, c, tr = (np.asarray(a, dtype=np.float64).reshape(len(close), -1)
+                       for a in (high, low, close, turn))
+        n, m = c.shape
+        out = np.full((n, m), np.nan)
+        if n == 0 or m == 0:
+            return out[:, 0] if one_d else out
+
+        valid = ~(np.isnan(h) | np.isnan(l) | np.isnan(c))
+        tr = np.clip(np.nan_to_num(tr), 0.0, 1.0)
+
+        # Per-stock price grid
+        with np.errstate(invalid='ignore'):
+            grid_lo = np.nanmin(np.where(valid, l, np.nan), axis=0)
+            grid_hi = np.nanmax(np.where(valid, h, np.nan), axis=0)
+        grid_lo = np.nan_to_num(grid_lo)
+        grid_hi = np.nan_to_num(grid_hi)
+        width = np.maximum(grid_hi - grid_lo, np.maximum(np.abs(grid_hi), 1.0) * 1e-6) / bins
+        edges = grid_lo[:, None] + width[:, None] * np.arange(bins + 1)
+
+        # Days without a bar leave the histogram unchanged (rate 0)
+        l = np.where(valid, l, grid_lo[None, :])
+        h = np.where(valid, h, grid_lo[None, :])
+        c = np.where(valid, c, grid_lo[None, :])
+        out = jit_kernels.chip_winner_pct(h, l, c, tr, valid, edges, width)
+        return out[:, 0] if one_d else out
+
+    @staticmethod
+    def _turn_from(df):
+        if 'turn' in df.columns and df['turn'].notna().any():
+            return df['turn'].to_numpy(dtype=np.float64) / 100
+        return ChipEngine.estimate_turn(df['volume'].to_numpy(dtype=np.float64))
+
+    @staticmethod
+    def add_winner_pct(df, bins=DEFAULT_BINS):
+        """Copy of a single stock's K-line frame with a 'winner_pct' column (0-100)."""
+        df = df.copy()
+        if df.empty:
+            df['winner_pct'] = np.nan
+            return df
+        df['winner_pct'] = ChipEngine.winner_pct(df['high'].to_numpy(dtype=np.float64),
+                                                 df['low'].to_numpy(dtype=np.float64),
+                                                 df['close'].to_numpy(dtype=np.float64),
+                                                 ChipEngine._turn_from(df), bins=bins)
+        return df
+
+    @staticmethod
+    def add_winner_pct_many(frames, bins=DEFAULT_BINS):
+        """
+        Add 'winner_pct' to a batch of frames ({code: df}, e.g. from
+        DataLoader.get_k_data_many) with one date-aligned pass over all of them.
+        """
+        codes = [code for code, df in frames.items() if not df.empty]
+        result = dict(frames)
+        if not codes:
+            return result
+        dates = pd.DatetimeIndex(sorted(set().union(*(frames[c]['date'] for c in codes))))
+
+        def aligned(values_of):
+            arr = np.full((len(dates), len(codes)), np.nan)
+            for j, code in enumerate(codes):
+                rows = dates.get_indexer(frames[code]['date'])
+                arr[rows, j] = values_of(frames[code])
+            return arr
+
+        pct = ChipEngine.winner_pct(aligned(lambda df: df['high'].to_numpy(dtype=np.float64)),
+                                    aligned(lambda df: df['low'].to_numpy(dtype=np.float64)),
+                                    aligned(lambda df: df['close'].to_numpy(dtype=np.float64)),
+                                    aligned(ChipEngine._turn_from), bins=bins)
+        for j, code in enumerate(codes):
+            df = frames[code].copy()
+            df['winner_pct'] = pct[dates.get_indexer(df['date']), j]
+            result[code] = df
+        return result
+
+    @staticmethod
+    def from_view(view, bins=DEFAULT_BINS):
+        """winner_pct (days × stocks) for a market_panel.PanelView."""
+        high, low, close, volume = (np.asarray(view[f], dtype=np.float64).T
+                                    for f in ('high', 'low', 'close', 'volume'))
+        if 'turn' in view.fields:
+            turn = np.asarray(view['turn'], dtype=np.float64).T / 100
+        else:
+            turn = ChipEngine._estimate_turn_panel(volume)
+        return ChipEngine.winner_pct(high, low, close, turn, bins=bins)
+
+    @staticmethod
+    def _estimate_turn_panel(volume):
+        """estimate_turn over each stock's own bars (days without a bar are skipped)."""
+        turn = np.full(volume.shape, np.nan)
+        for j in range(volume.shape[1]):
+            rows = np.flatnonzero(~np.isnan(volume[:, j]))
+            if len(rows):
+                turn[rows, j] = ChipEngine.estimate_turn(volume[rows, j])
+        return turn
+
+
+def _synthetic_market(days, stocks, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.exp(np.cumsum(rng.normal(0, 0.025, (days, stocks)), axis=0)) * rng.uniform(3, 80, stocks)
+    high = close * (1 + np.abs(rng.normal(0, 0.01, (days, stocks))))
+    low = close * (1 - np.abs(rng.normal(0, 0.01, (days, stocks))))
+    turn = rng.uniform(0.005, 0.08, (days, stocks))
+    # Staggered listings and suspensions
+    for j in range(0, stocks, 7):
+        close[:rng.integers(0, days // 2), j] = np.nan
+    close[rng.random((days, stocks)) < 0.01] = np.nan
+    return high, low, close, turn
+
+
+def main():
+    import time
+
+    days, stocks = 600, 5000
+    high, low, close, turn = _synthetic_market(days, stocks)
+    t0 = time.time()
+    pct = ChipEngine.winner_pct(high, low, close, turn)
+    print(f"winner_pct for {stocks} stocks × {days} days in {time.time() - t0:.2f}s")
+
+    # The batch result for a stock must equal running that stock alone
+    worst = 0.0
+    for j in range(0, stocks, 500):
+        rows = np.flatnonzero(~np.isnan(close[:, j]))
+        single = ChipEngine.winner_pct(high[rows, j], low[rows, j], close[rows, j], turn[rows, j])
+        worst = max(worst, float(np.nanmax(np.abs(single - pct[rows, j]))))
+    print(f"Batch vs single-stock max difference: {worst:.2e}")
+    print(f"winner_pct range: {np.nanmin(pct):.1f}% - {np.nanmax(pct):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
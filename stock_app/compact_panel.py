@@ -0,0 +1,246 @@
+"""
+Compact numeric mode for the whole-market panel.
+
+The float64 panel spends 8 bytes on every price, volume and indicator value and
+each worker copies full float64 frames. In compact mode:
+
+- open/high/low/close: int32 ticks of 0.01 yuan (PRICE_NA marks no bar)
+- volume: int64 shares, amount: int64 ticks of 0.01 yuan (VOLUME_NA marks no bar)
+- dates: int32 day numbers (days since 1970-01-01)
+- indicators: computed in float64 stock chunk by stock chunk and stored as
+  float32 (booleans stay bool), so the full float64 result never exists at once
+
+Precision bounds (PRECISION_BOUNDS, measured by ``check_precision``):
+
+- prices: exact for prices quoted in whole fen (all unadjusted A-share quotes);
+  adjusted prices with more decimals are rounded, |error| <= 0.005 yuan.
+  int32 holds up to 21,474,836.47 yuan.
+- volume: exact for whole shares; amount rounded to 0.01 yuan (|error| <= 0.005)
+- dates: exact
+- float32 indicators: relative error <= 2^-24 (~6e-8) of each value from the
+  final rounding, i.e. < 0.0001 yuan below 1,000 yuan. A comparison such as
+  close > MA20 can only flip when the two sides are within that distance
+  (bench: ~1e-4 of bars); compare against close rounded to float32 too
+  (``field('close')``), so that exact ties such as EMA seeded with the
+  first close stay ties.
+  RSI/K/D/J/WR/CCI-style bounded oscillators: |error| < 1e-5 points.
+
+    from compact_panel import CompactPanel
+    compact = CompactPanel.from_view(view)          # or DataLoader().get_panel(compact=True)
+    close = compact.field('close')                  # (stocks × days) float32, NaN = no bar
+    ind = compact.indicators(['MA20', 'RSI2'])      # (days × stocks) float32
+
+    python stock_app/bench_compact.py               # memory / speed / precision report
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+TICKS_PER_YUAN = 100
+PRICE_NA = np.iinfo(np.int32).min
+VOLUME_NA = -1
+
+COMPACT_DIR = "compact"
+META_FILE = "compact_meta.json"
+
+# field/column -> (kind, bound)
+PRECISION_BOUNDS = {
+    'price': ('abs', 0.005),
+    'volume': ('abs', 0.5),
+    'amount': ('abs', 0.005),
+    'indicator': ('rel', 2.0 ** -24),
+}
+
+
+def to_ticks(prices, dtype=np.int32):
+    """Prices in yuan -> integer ticks of 0.01 yuan (NaN -> PRICE_NA)."""
+    arr = np.asarray(prices, dtype=np.float64)
+    valid = ~np.isnan(arr)
+    out = np.full(arr.shape, PRICE_NA, dtype=dtype)
+    out[valid] = np.rint(arr[valid] * TICKS_PER_YUAN)
+    return out
+
+
+def from_ticks(ticks, dtype=np.float32):
+    """Integer ticks -> yuan, PRICE_NA -> NaN."""
+    ticks = np.asarray(ticks)
+    # Division is correctly rounded: 1234 / 100 is the same double as 12.34
+    out = ticks.astype(dtype) / dtype(TICKS_PER_YUAN)
+    out[ticks == PRICE_NA] = np.nan
+    return out
+
+
+def to_day_numbers(dates):
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int32)
+
+
+def from_day_numbers(days):
+    return pd.DatetimeIndex(np.asarray(days, dtype=np.int64).astype('datetime64[D]'))
+
+
+class CompactPanel:
+    """
+    Integer-coded (stocks × days) market panel, same axes as a
+    market_panel.PanelView.
+    """
+
+    def __init__(self, codes, days, arrays):
+        self.codes = list(codes)
+        self.days = np.asarray(days, dtype=np.int32)
+        self.arrays = arrays            # field -> int32 ticks / int64 volume
+        self.fields = [f for f in ('open', 'high', 'low', 'close', 'volume', 'amount') if f in arrays]
+        self._code_pos = {c: i for i, c in enumerate(self.codes)}
+
+    @property
+    def dates(self):
+        return from_day_numbers(self.days)
+
+    @property
+    def shape(self):
+        return (len(self.codes), len(self.days), len(self.fields))
+
+    @property
+    def nbytes(self):
+        return int(self.days.nbytes + sum(a.nbytes for a in self.arrays.values()))
+
+    def __contains__(self, field):
+        return field in self.arrays
+
+    def code_index(self, code):
+        return self._code_pos[code]
+
+    @staticmethod
+    def from_fields(codes, dates, fields):
+        """:param fields: dict field -> (stocks × days) float array, NaN = no bar"""
+        arrays = {}
+        for name, values in fields.items():
+            values = np.asarray(values, dtype=np.float64)
+            if name in PRICE_FIELDS:
+                arrays[name] = to_ticks(values)
+            elif name == 'amount':
+                if np.isnan(values).all():
+                    continue   # Source without amount (Tencent)
+                arrays[name] = to_ticks(values, dtype=np.int64)
+            elif name == 'volume':
+                arr = np.full(values.shape, VOLUME_NA, dtype=np.int64)
+                valid = ~np.isnan(values)
+                arr[valid] = np.rint(values[valid])
+                arrays[name] = arr
+        return CompactPanel(codes, to_day_numbers(dates), arrays)
+
+    @staticmethod
+    def from_view(view):
+        return CompactPanel.from_fields(view.codes, view.dates, {f: view[f] for f in view.fields})
+
+    def field(self, name, dtype=np.float32, rows=slice(None)):
+        """(stocks × days) float array with NaN on days without a bar (``rows``: stock subset)."""
+        arr = np.asarray(self.arrays[name][rows])
+        if name == 'volume':
+            out = arr.astype(dtype)
+            out[arr == VOLUME_NA] = np.nan
+            return out
+        return from_ticks(arr, dtype)
+
+    def view(self, start_date=None, end_date=None, codes=None):
+        """Date/code window (date slices are views, a code subset is a copy)."""
+        d0 = 0 if start_date is None else int(np.searchsorted(self.days, to_day_numbers([start_date])[0], 'left'))
+        d1 = len(self.days) if end_date is None else \
+            int(np.searchsorted(self.days, to_day_numbers([end_date])[0], 'right'))
+        idx = slice(None) if codes is None else [self._code_pos[c] for c in codes if c in self._code_pos]
+        view_codes = self.codes if codes is None else [self.codes[i] for i in idx]
+        return CompactPanel(view_codes, self.days[d0:d1], {f: a[idx, d0:d1] for f, a in self.arrays.items()})
+
+    def to_frame(self, code, dtype=np.float64):
+        """Per-stock DataFrame in the DataLoader.get_k_data layout (days without a bar dropped)."""
+        i = self.code_index(code)
+        df = pd.DataFrame({f: self.field(f, dtype, i) for f in self.fields})
+        df.insert(0, 'date', self.dates)
+        return df[df['close'].notna()].reset_index(drop=True)
+
+    def indicators(self, columns=None, chunk=500, dtype=np.float32):
+        """
+        PanelIndicators columns (days × stocks) stored as ``dtype``, computed in
+        float64 over ``chunk`` stocks at a time.
+        """
+        from panel_indicators import PanelIndicators, BOOL_COLUMNS
+
+        out = None
+        n = len(self.codes)
+        for j0 in range(0, n, chunk):
+            j1 = min(j0 + chunk, n)
+            fields = {f: self.field(f, np.float64, slice(j0, j1)).T for f in self.fields}
+            res = PanelIndicators.compute(fields, columns=columns)
+            if out is None:
+                out = {name: np.empty((len(self.days), n), dtype=bool if name in BOOL_COLUMNS else dtype)
+                       for name in res}
+            for name, arr in res.items():
+                out[name][:, j0:j1] = arr
+        return out or {}
+
+    # --- Persistence: one .npy per field, memory-mapped on load ---
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name, arr in dict(self.arrays, days=self.days).items():
+            tmp = os.path.join(directory, f"{name}.tmp.npy")
+            np.save(tmp, arr)
+            os.replace(tmp, os.path.join(directory, f"{name}.npy"))
+        meta = {"codes": self.codes, "fields": self.fields}
+        tmp_meta = os.path.join(directory, META_FILE + ".tmp")
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_meta, os.path.join(directory, META_FILE))
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, META_FILE))
+
+    @staticmethod
+    def load(directory, mmap=True):
+        with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+                  for name in meta['fields']}
+        days = np.load(os.path.join(directory, "days.npy"))
+        return CompactPanel(meta['codes'], days, arrays)
+
+
+def check_precision(view, compact=None, columns=None, chunk=500):
+    """
+    Measured errors of compact mode against the float64 view / PanelIndicators.
+
+    :return: DataFrame (name, kind, bound, max_error, ok)
+    """
+    from panel_indicators import PanelIndicators, BOOL_COLUMNS
+
+    compact = compact or CompactPanel.from_view(view)
+    rows = []
+    for name in compact.fields:
+        ref = np.asarray(view[name], dtype=np.float64)
+        got = compact.field(name, np.float64)
+        kind, bound = PRECISION_BOUNDS['price' if name in PRICE_FIELDS else name]
+        same_nan = np.array_equal(np.isnan(ref), np.isnan(got))
+        err = float(np.nanmax(np.abs(ref - got))) if same_nan else float('inf')
+        rows.append({'name': name, 'kind': kind, 'bound': bound, 'max_error': err, 'ok': err <= bound + 1e-9})
+
+    # Indicators: float32 storage vs float64 on the same tick-rounded inputs
+    ref = PanelIndicators.compute({f: compact.field(f, np.float64).T for f in compact.fields}, columns=columns)
+    got = compact.indicators(columns, chunk=chunk)
+    kind, bound = PRECISION_BOUNDS['indicator']
+    for name, a in ref.items():
+        if name in BOOL_COLUMNS:
+            continue
+        b = got[name].astype(np.float64)
+        finite = np.isfinite(a) & np.isfinite(b)
+        same_nan = np.array_equal(np.isnan(a), np.isnan(b))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rel = np.abs(a - b)[finite] / np.abs(a[finite])
+        err = float(np.nanmax(rel)) if rel.size else 0.0
+        rows.append({'name': name, 'kind': kind, 'bound': bound, 'max_error': err,
+                     'ok': same_nan and err <= bound})
+    return pd.DataFrame(rows)
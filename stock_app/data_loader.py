@@ -1,57 +1,293 @@
-
 import pandas as pd
 import os
 import datetime
+import threading
+import concurrent.futures
+from collections import OrderedDict
+
+# Frame cache budget for long-lived loaders (the app's st.cache_resource loader)
+APP_CACHE_BYTES = 256 * 1024 * 1024
 
 class DataLoader:
-    def __init__(self, data_dir="stock_app/data/market_data"):
+    def __init__(self, data_dir="stock_app/data/market_data", backend="auto", store_dir=None, panel_dir=None,
+                 cache_bytes=0):
+        """
+        :param backend: 'csv', 'parquet', or 'auto' (use the Parquet store when a
+                        symbol's file exists there and is not older than its CSV)
+        :param store_dir: Parquet store directory, defaults to <data_dir>/../parquet
+        :param panel_dir: memory-mapped panel directory, defaults to <data_dir>/../panel
+        :param cache_bytes: memory budget of the in-process LRU frame cache, 0 (default) disables
+                            it. Only worth it for a long-lived loader (APP_CACHE_BYTES): cached
+                            reads load whole files, bypassing the store's date/column pushdown
+        """
         self.data_dir = data_dir
+        self.backend = backend
+        base_dir = os.path.dirname(os.path.normpath(data_dir))
+        self.store_dir = store_dir or os.path.join(base_dir, "parquet")
+        self.panel_dir = panel_dir or os.path.join(base_dir, "panel")
+        self._store = None
+        self._panel = None
+        self._compact = None
+
+        # LRU cache of full per-stock frames: (code, from_parquet) -> (mtime, df, nbytes)
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_used = 0
+        self._cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
         if not os.path.exists(data_dir):
             print(f"Warning: Data directory {data_dir} does not exist. Please run download_data.py first.")
 
-    def get_stock_list(self, date=None):
-        """Fetch stock list from local warehouse."""
+    def get_stock_list(self, date=None, exclude_dead=False):
+        """
+        Fetch stock list from local warehouse.
+
+        :param exclude_dead: drop symbols the download manifest currently marks as
+                             dead (repeated fetch failures: B-shares, delisted, PT)
+        """
         list_path = os.path.join(self.data_dir, "stock_list.csv")
         if os.path.exists(list_path):
-            return pd.read_csv(list_path, dtype={'code': str})
+            df = pd.read_csv(list_path, dtype={'code': str})
+            if exclude_dead:
+                from symbol_manifest import SymbolManifest
+                dead = SymbolManifest(self.data_dir).dead_codes()
+                if dead:
+                    df = df[~df['code'].isin(dead)].reset_index(drop=True)
+            return df
         else:
             return pd.DataFrame(columns=['code', 'name'])
 
-    def get_k_data(self, code, start_date, end_date):
+    def _get_store(self):
+        """Lazily open the Parquet store (pyarrow is only needed when it is used)."""
+        if self._store is None:
+            from parquet_store import ParquetStore
+            self._store = ParquetStore(self.store_dir)
+        return self._store
+
+    def _use_parquet(self, code, csv_path):
+        if self.backend == "parquet":
+            return True
+        if self.backend != "auto":
+            return False
+        pq_path = os.path.join(self.store_dir, f"{code}.parquet")
+        if not os.path.exists(pq_path):
+            return False
+        # Downloaders only rewrite the CSV, so a newer CSV means the store is stale
+        return not os.path.exists(csv_path) or os.path.getmtime(pq_path) >= os.path.getmtime(csv_path)
+
+    def get_panel(self, start_date=None, end_date=None, fields=None, codes=None, compact=False):
+        """
+        Whole-market window from the prebuilt memory-mapped panel.
+
+        Returns a market_panel.PanelView whose ``view[field]`` is a (stocks × days)
+        view into the memmap, or None if no panel has been built yet.
+        With ``compact=True`` returns a compact_panel.CompactPanel (int ticks,
+        memory-mapped) instead.
+        """
+        from market_panel import MarketPanel
+
+        if compact:
+            return self._get_compact_panel(start_date, end_date, codes)
+
+        if self._panel is None or self._panel.is_stale():
+            if not MarketPanel.exists(self.panel_dir):
+                print(f"[DataLoader] Panel not found in {self.panel_dir}. Run market_panel.py first.")
+                return None
+            self._panel = MarketPanel(self.panel_dir)
+        return self._panel.view(start_date, end_date, fields=fields, codes=codes)
+
+    def _get_compact_panel(self, start_date, end_date, codes):
+        from compact_panel import CompactPanel, COMPACT_DIR, META_FILE
+
+        compact_dir = os.path.join(self.panel_dir, COMPACT_DIR)
+        if not CompactPanel.exists(compact_dir):
+            print(f"[DataLoader] Compact panel not found in {compact_dir}. Run market_panel.py --compact first.")
+            return None
+        mtime = os.path.getmtime(os.path.join(compact_dir, META_FILE))
+        if self._compact is None or self._compact[0] != mtime:
+            self._compact = (mtime, CompactPanel.load(compact_dir))
+        return self._compact[1].view(start_date, end_date, codes=codes)
+
+    def build_panel(self, start_date=None, end_date=None, fields=None, progress_callback=None, compact=False):
+        """(Re)build the memory-mapped panel from this loader's warehouse."""
+        from market_panel import MarketPanel
+
+        self._panel = MarketPanel.build(self, self.panel_dir, start_date, end_date,
+                                        fields=fields, progress_callback=progress_callback, compact=compact)
+        return self._panel
+
+    def cache_info(self):
+        """Hit/miss/eviction counters and current size of the frame cache."""
+        with self._cache_lock:
+            return dict(self._cache_stats, entries=len(self._cache),
+                        bytes=self._cache_used, max_bytes=self.cache_bytes)
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self._cache_used = 0
+
+    def _cache_get(self, key, mtime):
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._cache.move_to_end(key)
+                self._cache_stats['hits'] += 1
+                return entry[1]
+            self._cache_stats['misses'] += 1
+            return None
+
+    def _cache_put(self, key, mtime, df):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.cache_bytes:
+            return
+        with self._cache_lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._cache_used -= old[2]
+            self._cache[key] = (mtime, df, nbytes)
+            self._cache_used += nbytes
+            while self._cache_used > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_used -= evicted[2]
+                self._cache_stats['evictions'] += 1
+
+    def _read_full_frame(self, code, file_path, from_parquet):
+        """Whole file for one stock with parsed dates, or None on failure."""
+        if from_parquet:
+            return self._get_store().read(code)
+
+        df = pd.read_csv(file_path)
+        if 'date' not in df.columns:
+            print(f"[DataLoader] 'date' column missing in {file_path}")
+            return None
+        df['date'] = pd.to_datetime(df['date'])
+        return df
+
+    def _get_k_data_cached(self, code, file_path, from_parquet, start_date, end_date, columns):
+        """Serve a date-range slice from the cached full frame, keyed by source mtime."""
+        src_path = os.path.join(self.store_dir, f"{code}.parquet") if from_parquet else file_path
+        if not os.path.exists(src_path):
+            print(f"[DataLoader] File not found: {src_path}")
+            return pd.DataFrame()
+
+        try:
+            key = (code, from_parquet)
+            mtime = os.path.getmtime(src_path)
+            df = self._cache_get(key, mtime)
+            if df is None:
+                df = self._read_full_frame(code, file_path, from_parquet)
+                if df is None:
+                    return pd.DataFrame()
+                self._cache_put(key, mtime, df)
+
+            start_dt = pd.to_datetime(start_date)
+            end_dt = pd.to_datetime(end_date)
+            mask = (df['date'] >= start_dt) & (df['date'] <= end_dt)
+            if columns is not None:
+                cols = ['date'] + [c for c in columns if c != 'date' and c in df.columns]
+                res = df.loc[mask, cols].copy()
+            else:
+                res = df.loc[mask].copy()
+
+            if res.empty:
+                print(f"[DataLoader] Data empty after filtering. Range: {start_dt} - {end_dt}. File Range: {df['date'].min()} - {df['date'].max()}")
+
+            return res
+
+        except Exception as e:
+            print(f"[DataLoader] Error reading {code}: {e}")
+            return pd.DataFrame()
+
+    def get_k_data(self, code, start_date, end_date, columns=None):
         """
-        Fetch K-line data from local CSV.
+        Fetch K-line data from the local warehouse.
+
+        :param columns: optional list of columns to load ('date' is always included)
         """
         # Ensure code is 6 digits string
         code = str(code).zfill(6)
         file_path = os.path.join(self.data_dir, f"{code}.csv")
-        
+        from_parquet = self._use_parquet(code, file_path)
+
+        if self.cache_bytes > 0:
+            return self._get_k_data_cached(code, file_path, from_parquet, start_date, end_date, columns)
+
+        if from_parquet:
+            try:
+                res = self._get_store().read(code, start_date, end_date, columns=columns)
+                if res.empty:
+                    print(f"[DataLoader] Data empty after filtering. Range: {start_date} - {end_date}. Store: {self.store_dir}")
+                return res
+            except Exception as e:
+                print(f"[DataLoader] Error reading {code} from parquet store: {e}")
+                return pd.DataFrame()
+
         if not os.path.exists(file_path):
             print(f"[DataLoader] File not found: {file_path}")
             return pd.DataFrame()
 
         try:
-            df = pd.read_csv(file_path)
-            
+            if columns is not None:
+                wanted = set(columns) | {'date'}
+                df = pd.read_csv(file_path, usecols=lambda c: c in wanted)
+            else:
+                df = pd.read_csv(file_path)
+
             # Standardize dates
             if 'date' not in df.columns:
                 print(f"[DataLoader] 'date' column missing in {file_path}")
                 return pd.DataFrame()
-            
+
             df['date'] = pd.to_datetime(df['date'])
-            
+
             # Ensure start_date/end_date are pd.Timestamp
             start_dt = pd.to_datetime(start_date)
             end_dt = pd.to_datetime(end_date)
-            
+
             # Filter
             mask = (df['date'] >= start_dt) & (df['date'] <= end_dt)
             res = df.loc[mask].copy()
-            
+
             if res.empty:
                 print(f"[DataLoader] Data empty after filtering. Range: {start_dt} - {end_dt}. File Range: {df['date'].min()} - {df['date'].max()}")
-                
+
             return res
-            
+
         except Exception as e:
             print(f"[DataLoader] Error reading {code}: {e}")
             return pd.DataFrame()
+
+    def get_k_data_many(self, codes, start_date, end_date, columns=None, max_workers=8, long_format=False):
+        """
+        Load many stocks concurrently.
+
+        CSV parsing and Parquet decoding release the GIL for most of their work,
+        so a thread pool overlaps file I/O and date parsing across symbols.
+
+        :param codes: iterable of stock codes
+        :param columns: optional column projection, as in get_k_data
+        :param long_format: return one frame with a 'code' column instead of a dict
+        :return: {code: DataFrame} (empty frame for missing stocks), or a long DataFrame
+        """
+        codes = [str(c).zfill(6) for c in codes]
+        frames = {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.get_k_data, code, start_date, end_date, columns): code
+                       for code in codes}
+            for future in concurrent.futures.as_completed(futures):
+                frames[futures[future]] = future.result()
+
+        if not long_format:
+            return {code: frames[code] for code in codes}
+
+        parts = []
+        for code in codes:
+            df = frames[code]
+            if not df.empty:
+                df.insert(0, 'code', code)
+                parts.append(df)
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
@@ -6,6 +6,8 @@ import os
 import concurrent.futures
 from datetime import datetime
 import time
+from symbol_manifest import SymbolManifest
+from multi_source import HedgedFetcher, AkshareSource, TencentSource, BaostockSource
 
 DATA_DIR = "stock_app/data/market_data"
 if not os.path.exists(DATA_DIR):
@@ -61,11 +63,27 @@ def get_stock_list_baostock():
     print(f"Baostock 获取到 {len(filtered_list)} 只符合条件的股票。")
     return pd.DataFrame(filtered_list)
 
-def download_stock(stock_info):
+def fetch_akshare_with_retry(code, start_date, end_date, retries=3):
+    """Akshare only, with retries. Returns False if every attempt raised."""
+    for i in range(retries):
+        try:
+            return ak.stock_zh_a_hist(symbol=code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
+        except:
+            time.sleep(1)
+    return False
+
+def download_stock(stock_info, manifest=None, fetcher=None):
+    """
+    :param fetcher: optional multi_source.HedgedFetcher; without it only Akshare is used
+    """
     code = stock_info['code']
     name = stock_info['name']
     file_path = os.path.join(DATA_DIR, f"{code}.csv")
     
+    # Negative cache: skip symbols that keep failing (B-shares, delisted, PT)
+    if manifest is not None and manifest.is_dead(code):
+        return f"Skipped {code} (dead)"
+    
     if os.path.exists(file_path):
         try:
             mtime = datetime.fromtimestamp(os.path.getmtime(file_path)).date()
@@ -73,24 +91,29 @@ def download_stock(stock_info):
                 return f"Skipped {code}"
         except: pass
             
-    # Try Akshare for data (faster), fallback to Baostock if Akshare fails?
-    # Let's try Akshare first.
     try:
         start_date = "20240101" 
         end_date = datetime.now().strftime("%Y%m%d")
         
-        # Retry loop inside
-        for i in range(3):
+        if fetcher is not None:
+            # Hedged multi-source fetch, already normalized to the warehouse schema
             try:
-                df = ak.stock_zh_a_hist(symbol=code, period="daily", start_date=start_date, end_date=end_date, adjust="qfq")
-                break
-            except:
-                time.sleep(1)
+                df, _ = fetcher.fetch(code, start_date, end_date)
+            except IOError as e:
+                if manifest is not None:
+                    manifest.record_error(code, str(e))
+                return f"Error {code}: {e}"
         else:
-            # If Akshare fails 3 times, return error (don't fallback to Baostock per row for now, too slow)
-            return f"Error {code}: Akshare fetch failed"
+            df = fetch_akshare_with_retry(code, start_date, end_date)
+            if df is False:
+                # If Akshare fails 3 times, return error (don't fallback to Baostock per row for now, too slow)
+                if manifest is not None:
+                    manifest.record_error(code, "Akshare fetch failed")
+                return f"Error {code}: Akshare fetch failed"
             
         if df is None or df.empty:
+            if manifest is not None:
+                manifest.record_failure(code, "Empty")
             return f"Warning {code}: Empty"
             
         rename_map = {
@@ -102,9 +125,13 @@ def download_stock(stock_info):
         df = df[[c for c in cols if c in df.columns]]
         
         df.to_csv(file_path, index=False)
+        if manifest is not None:
+            manifest.record_success(code, df['date'].max())
         return f"Success {code}"
         
     except Exception as e:
+        if manifest is not None:
+            manifest.record_error(code, str(e))
         return f"Error {code}: {str(e)}"
 
 def main():
@@ -119,24 +146,31 @@ def main():
         return
 
     stock_infos = stocks.to_dict('records')
+    manifest = SymbolManifest(DATA_DIR)
+    # Akshare first, hedged to Tencent / Baostock on slow or failed requests
+    fetcher = HedgedFetcher([AkshareSource(), TencentSource(), BaostockSource()])
     
     # 2. Parallel Download
     max_workers = 5
-    print(f"启动 {max_workers} 线程下载 {len(stocks)} 只股票数据 (AkShare Source)...")
+    print(f"启动 {max_workers} 线程下载 {len(stocks)} 只股票数据 (Hedged Multi-Source)...")
     
     done = 0
     total = len(stocks)
     
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(download_stock, info): info for info in stock_infos}
+        futures = {executor.submit(download_stock, info, manifest, fetcher): info for info in stock_infos}
         
         for future in concurrent.futures.as_completed(futures):
             res = future.result()
             done += 1
             if done % 100 == 0:
                 print(f"Progress: {done}/{total}")
+    
+    manifest.save()
+    fetcher.close()
 
-    print(f"\n下载完成。")
+    print(f"\n下载完成。 Source stats: {fetcher.stats}")
+    print(f"Source health: {fetcher.health_report()}")
 
 if __name__ == "__main__":
     main()
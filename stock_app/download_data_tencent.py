@@ -1,10 +1,14 @@
 import requests
+import asyncio
 import pandas as pd
 import os
 import concurrent.futures
 import time
 import json
 import random
+import numpy as np
+from datetime import datetime, timedelta
+from symbol_manifest import SymbolManifest
 
 DATA_DIR = "stock_app/data/market_data"
 if not os.path.exists(DATA_DIR):
@@ -27,105 +31,302 @@ def get_stock_list_local():
         # For now assume it exists as per previous steps.
         return pd.DataFrame()
 
-def download_stock_tencent(stock_info):
-    code = stock_info['code']
-    name = stock_info['name']
-    
-    # Determine prefix (sh/sz/bj)
-    # 6xx -> sh, 0xx/3xx -> sz, 8xx/4xx -> bj (Tencent might not support BJ well, or uses different prefix)
-    # Tencent mostly strictly sh/sz.
-    # 60, 68 -> sh
-    # 00, 30 -> sz
-    
+KLINE_URL = "http://web.ifzq.gtimg.cn/appstock/app/fqkline/get"
+
+# Full history request size (bars). User needs ~400 days of history.
+FULL_BARS = 600
+# Bars re-requested before the last stored date in incremental mode,
+# used to detect forward-adjustment (qfq) changes after ex-dividend days.
+OVERLAP_BARS = 3
+PRICE_COLS = ['open', 'close', 'high', 'low']
+
+
+def get_tencent_symbol(code):
+    """
+    Map a 6-digit code to a Tencent symbol (sh/sz), None if unsupported.
+
+    60, 68 -> sh; 00, 30 -> sz.
+    Beijing exchange (8xx/4xx) is not reliably served by web.ifzq.gtimg.cn, skip it.
+    """
     if code.startswith('6'):
-        symbol = f"sh{code}"
+        return f"sh{code}"
     elif code.startswith('0') or code.startswith('3'):
-        symbol = f"sz{code}"
+        return f"sz{code}"
     elif code.startswith('8') or code.startswith('4'):
-        # Beijing exchange might accept 'bj' or might not be fully supported by this endpoint.
-        # Let's try 'bj' or skip. Detailed check needed. 
-        # Usually web.ifzq.gtimg.cn supports sh/sz mainly.
-        # Let's skip BJ for now to ensure stability or try to map.
-        return f"Skipped {code} (BSE/Other)"
+        return None
     else:
-        symbol = f"sz{code}" # Default fallback
+        return f"sz{code}" # Default fallback
+
+
+def build_kline_url(symbol, count=FULL_BARS):
+    # qfq = forward adjusted
+    # Param format: code,day,,,320,qfq  (320 bars)
+    return f"{KLINE_URL}?_var=kline_dayqfq&param={symbol},day,,,{count},qfq"
+
+
+def parse_kline_payload(content, symbol):
+    """
+    Parse a Tencent fqkline response into a DataFrame.
+
+    Tencent K-line format: [date, open, close, high, low, volume, ...]
+    :return: DataFrame with columns date, open, close, high, low, volume (empty if no data)
+    """
+    # content format: kline_dayqfq={"code":0,"msg":"","data":{...}}
+    # stripping variable assignment
+    if "=" in content:
+        json_str = content.split("=", 1)[1]
+    else:
+        json_str = content
+        
+    data = json.loads(json_str)
+    stock_data = data.get('data', {}).get(symbol, {})
+    
+    # Priority: qfqday > day
+    kline_list = stock_data.get('qfqday', [])
+    if not kline_list:
+         kline_list = stock_data.get('day', [])
+    
+    records = []
+    for item in kline_list:
+        # item is a list
+        if len(item) < 6: continue
+        records.append({
+            'date': item[0],
+            'open': float(item[1]),
+            'close': float(item[2]),
+            'high': float(item[3]),
+            'low': float(item[4]),
+            'volume': float(item[5])
+        })
+        # Tencent doesn't provide amount in this simple list, strategies mostly use OHLCV.
+    
+    return pd.DataFrame(records, columns=['date', 'open', 'close', 'high', 'low', 'volume'])
+
+
+def fetch_kline_tencent(symbol, count=FULL_BARS, timeout=5):
+    """Fetch the latest ``count`` daily qfq bars. Raises on HTTP errors."""
+    resp = requests.get(build_kline_url(symbol, count), headers=HEADERS, timeout=timeout)
+    if resp.status_code != 200:
+        raise IOError(f"HTTP {resp.status_code}")
+    return parse_kline_payload(resp.text, symbol)
+
+
+def bars_to_request(last_date, today=None):
+    """Number of bars to ask for so that every day after ``last_date`` is covered, plus overlap."""
+    today = today or datetime.now().date()
+    missing = int(np.busday_count(pd.Timestamp(last_date).date() + timedelta(days=1), today + timedelta(days=1)))
+    return max(missing, 0) + OVERLAP_BARS
+
+
+def merge_incremental(file_path, existing, fetched):
+    """
+    Merge freshly fetched bars into an existing CSV.
+
+    :return: 'appended' / 'rewritten' / 'unchanged' when merged locally,
+             'refetch' when the overlapping history no longer matches (qfq changed)
+             or does not overlap at all
+    """
+    existing_dates = pd.to_datetime(existing['date'])
+    fetched = fetched.copy()
+    fetched_dates = pd.to_datetime(fetched['date'])
+    last_date = existing_dates.max()
+    
+    overlap = fetched[fetched_dates <= last_date]
+    if overlap.empty:
+        # Gap between stored history and the fetched window
+        return 'refetch'
+    
+    stored = existing.assign(date=existing_dates.dt.strftime('%Y-%m-%d')).set_index('date')
+    overlap = overlap.assign(date=pd.to_datetime(overlap['date']).dt.strftime('%Y-%m-%d')).set_index('date')
+    common = overlap.index.intersection(stored.index)
+    if len(common) == 0:
+        return 'refetch'
+    
+    cols = [c for c in PRICE_COLS if c in stored.columns]
+    same = np.isclose(stored.loc[common, cols].astype(float).values,
+                      overlap.loc[common, cols].astype(float).values, rtol=0, atol=1e-6).all(axis=1)
+    last_key = last_date.strftime('%Y-%m-%d')
+    older_same = same[common != last_key].all()
+    if not older_same:
+        # Older adjusted prices moved: forward adjustment changed, need full history
+        return 'refetch'
+    
+    new_rows = fetched[fetched_dates > last_date].reindex(columns=existing.columns)
+    last_same = True
+    if last_key in common:
+        last_same = same[common == last_key].all() and \
+            np.isclose(float(stored.loc[last_key, 'volume']), float(overlap.loc[last_key, 'volume']))
+    
+    if last_same:
+        if new_rows.empty:
+            return 'unchanged'
+        new_rows.to_csv(file_path, mode='a', header=False, index=False)
+        return 'appended'
+    
+    # The last stored bar was partial (saved intraday): replace it locally
+    keep = existing[existing_dates < last_date]
+    fresh = fetched[fetched_dates >= last_date].reindex(columns=existing.columns)
+    pd.concat([keep, fresh], ignore_index=True).to_csv(file_path, index=False)
+    return 'rewritten'
+
+
+def _plan_update(stock_info, incremental):
+    """
+    Decide what to request for one stock.
+
+    :return: (symbol, file_path, existing_df or None, bar_count), or a status string
+             when nothing needs to be fetched
+    """
+    code = stock_info['code']
+    symbol = get_tencent_symbol(code)
+    if symbol is None:
+        return f"Skipped {code} (BSE/Other)"
     
     # Target file
     file_path = os.path.join(DATA_DIR, f"{code}.csv")
     
-    # Check if already downloaded today? (Optional, skipping for full refresh request)
+    if incremental and os.path.exists(file_path):
+        existing = pd.read_csv(file_path)
+        if not existing.empty and 'date' in existing.columns:
+            return symbol, file_path, existing, bars_to_request(pd.to_datetime(existing['date']).max())
+    return symbol, file_path, None, FULL_BARS
+
+
+def _apply_update(code, file_path, existing, fetched):
+    """Write fetched bars. Returns a status string, or None if a full refetch is needed."""
+    if fetched.empty:
+        return f"Warning {code}: No Data found"
     
-    # Tencent API
-    # qfq = forward adjusted
-    # 640 points approx 2-3 years. User needs ~400 days.
-    # Param format: code,day,,,320,qfq  (320 bars)
-    # To be safe, let's get 600 bars.
-    api_url = f"http://web.ifzq.gtimg.cn/appstock/app/fqkline/get?_var=kline_dayqfq&param={symbol},day,,,600,qfq"
+    if existing is None:
+        fetched.to_csv(file_path, index=False)
+        return f"Success {code}"
     
+    outcome = merge_incremental(file_path, existing, fetched)
+    if outcome == 'unchanged':
+        return f"Skipped {code} (up to date)"
+    if outcome == 'refetch':
+        # qfq change or gap: caller falls back to full refetch
+        return None
+    return f"Success {code} ({outcome})"
+
+
+def _record_outcome(manifest, code, status, fetched=None):
+    """Feed a download result into the symbol manifest (negative cache)."""
+    if manifest is None:
+        return
+    if status.startswith("Success") or "(up to date)" in status:
+        last_date = fetched['date'].max() if fetched is not None and not fetched.empty else None
+        manifest.record_success(code, last_date)
+    elif status.startswith("Warning"):
+        # The source answered with no bars: a dead-symbol strike
+        manifest.record_failure(code, status)
+    elif status.startswith("Error"):
+        # Timeout / connection / HTTP error: says nothing about the symbol
+        manifest.record_error(code, status)
+
+
+def download_stock_tencent(stock_info, incremental=False, manifest=None):
+    """
+    Download (or update) one stock's daily qfq bars into DATA_DIR/<code>.csv.
+
+    :param incremental: request only the bars after the last stored date and append
+                        them; fall back to a full refetch when the overlap differs
+    :param manifest: optional SymbolManifest; known-dead symbols are skipped and
+                     every outcome is recorded
+    """
+    code = stock_info['code']
+    if manifest is not None and manifest.is_dead(code):
+        return f"Skipped {code} (dead)"
+    
+    fetched = None
     try:
-        resp = requests.get(api_url, headers=HEADERS, timeout=5)
-        if resp.status_code != 200:
-            return f"Error {code}: HTTP {resp.status_code}"
-            
-        content = resp.text
-        # content format: kline_dayqfq={"code":0,"msg":"","data":{...}}
-        # stripping variable assignment
-        if "=" in content:
-            json_str = content.split("=", 1)[1]
-        else:
-            json_str = content
-            
-        data = json.loads(json_str)
-        
-        # Parse logic
-        # data['data'][symbol]['day'] (legacy) or data['data'][symbol]['qfqday'] (adjusted)
-        # The param requested qfq, so look for qfqday or day.
-        
-        stock_data = data.get('data', {}).get(symbol, {})
+        plan = _plan_update(stock_info, incremental)
+        if isinstance(plan, str):
+            return plan
+        symbol, file_path, existing, count = plan
         
-        # Tencent K-line format: [date, open, close, high, low, volume, ...]
-        # date: "2023-01-01"
+        fetched = fetch_kline_tencent(symbol, count)
+        status = _apply_update(code, file_path, existing, fetched)
+        if status is None:
+            fetched = fetch_kline_tencent(symbol, FULL_BARS)
+            status = _apply_update(code, file_path, None, fetched)
         
-        # Priority: qfqday > day
-        kline_list = stock_data.get('qfqday', [])
-        if not kline_list:
-             kline_list = stock_data.get('day', [])
-             
-        if not kline_list:
-            return f"Warning {code}: No Data found"
-            
-        # Convert to DataFrame
-        # Standard columns: date, open, close, high, low, volume
-        # Note: Tencent order is Date, Open, Close, High, Low, Volume
-        cols = ['date', 'open', 'close', 'high', 'low', 'volume']
+    except Exception as e:
+        status = f"Error {code}: {str(e)}"
+    
+    _record_outcome(manifest, code, status, fetched)
+    return status
+
+
+async def download_stock_tencent_async(engine, stock_info, incremental=False, manifest=None):
+    """Same as download_stock_tencent, fetching through an AsyncFetchEngine."""
+    code = stock_info['code']
+    if manifest is not None and manifest.is_dead(code):
+        return f"Skipped {code} (dead)"
+    
+    fetched = None
+    try:
+        # CSV reads/writes run in worker threads so the event loop keeps issuing requests
+        plan = await asyncio.to_thread(_plan_update, stock_info, incremental)
+        if isinstance(plan, str):
+            return plan
+        symbol, file_path, existing, count = plan
         
-        records = []
-        for item in kline_list:
-            # item is a list
-            if len(item) < 6: continue
-            record = {
-                'date': item[0],
-                'open': float(item[1]),
-                'close': float(item[2]),
-                'high': float(item[3]),
-                'low': float(item[4]),
-                'volume': float(item[5])
-            }
-            # Calculate amount/turnover if needed? Tencent doesn't provide amount directly in this simple list sometimes.
-            # We can approximate or ignore. Strategies mostly use OHLCV.
-            records.append(record)
-            
-        if not records:
-            return f"Warning {code}: Parsed Empty"
-            
-        df = pd.DataFrame(records)
-        df.to_csv(file_path, index=False)
-        return f"Success {code}"
+        fetched = parse_kline_payload(await engine.fetch_text(build_kline_url(symbol, count)), symbol)
+        status = await asyncio.to_thread(_apply_update, code, file_path, existing, fetched)
+        if status is None:
+            fetched = parse_kline_payload(await engine.fetch_text(build_kline_url(symbol, FULL_BARS)), symbol)
+            status = await asyncio.to_thread(_apply_update, code, file_path, None, fetched)
         
     except Exception as e:
-        return f"Error {code}: {str(e)}"
+        status = f"Error {code}: {str(e)}"
+    
+    _record_outcome(manifest, code, status, fetched)
+    return status
+
+
+async def download_all_async(stock_infos, incremental=True, progress_callback=None, engine=None, manifest=None):
+    """
+    Download many stocks over one pooled, adaptively-limited asyncio session.
+
+    :param progress_callback: callback(done, total, result_message)
+    :param engine: optional preconfigured AsyncFetchEngine (e.g. for a stub server)
+    :param manifest: optional SymbolManifest, saved when the run finishes
+    :return: (list of result messages, engine metrics summary)
+    """
+    from async_fetch import AsyncFetchEngine
+    
+    engine = engine or AsyncFetchEngine(headers=HEADERS, timeout=5)
+    results = []
+    total = len(stock_infos)
+    
+    async with engine:
+        tasks = [asyncio.create_task(download_stock_tencent_async(engine, info, incremental, manifest))
+                 for info in stock_infos]
+        for coro in asyncio.as_completed(tasks):
+            res = await coro
+            results.append(res)
+            if progress_callback:
+                progress_callback(len(results), total, res)
+    
+    if manifest is not None:
+        manifest.save()
+    return results, engine.summary()
+
+def _report(res, done, total, start_time):
+    # Optional: print errors
+    if "Error" in res or "Warning" in res:
+         # Print only genuine errors, ignore warnings to reduce noise if many
+         if "No Data" not in res and "Skipped" not in res:
+             print(res)
+    
+    if done % 100 == 0:
+        elapsed = time.time() - start_time
+        speed = done / elapsed if elapsed > 0 else 0
+        print(f"Progress: {done}/{total} | Speed: {speed:.1f}/s")
 
-def main():
+
+def main(incremental=True, use_async=True):
     print(">>> 启动腾讯财经数据下载 (Tencent API) <<<")
     
     # 1. Load Local List
@@ -137,31 +338,45 @@ def main():
     stock_infos = stocks.to_dict('records')
     print(f"加载股票列表: {len(stocks)} 只。")
     
-    # 2. Parallel Download
-    # Tencent API is robust, can handle higher concurrency.
-    max_workers = 10
-    
     start_time = time.time()
-    done = 0
     total = len(stocks)
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(download_stock_tencent, info): info for info in stock_infos}
+    # Negative cache: symbols that keep failing are skipped for a few days
+    manifest = SymbolManifest(DATA_DIR)
+    dead = sum(1 for info in stock_infos if manifest.is_dead(info['code']))
+    if dead:
+        print(f"跳过 {dead} 只近期持续失败的股票 (B股/退市/PT)。")
+    
+    if use_async:
+        try:
+            import aiohttp
+        except ImportError:
+            print("aiohttp 未安装，回退到线程池下载。")
+            use_async = False
+    
+    if use_async:
+        # 2. Asyncio download: pooled keep-alive session, adaptive concurrency, retries
+        def progress(done, total, res):
+            _report(res, done, total, start_time)
         
-        for future in concurrent.futures.as_completed(futures):
-            res = future.result()
-            # Optional: print errors
-            if "Error" in res or "Warning" in res:
-                 # Print only genuine errors, ignore warnings to reduce noise if many
-                 if "No Data" not in res and "Skipped" not in res:
-                     print(res)
+        _, summary = asyncio.run(download_all_async(stock_infos, incremental, progress_callback=progress,
+                                                    manifest=manifest))
+        print(f"请求统计: {summary}")
+    else:
+        # 2. Parallel Download
+        # Tencent API is robust, can handle higher concurrency.
+        max_workers = 10
+        done = 0
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(download_stock_tencent, info, incremental, manifest): info
+                       for info in stock_infos}
             
-            done += 1
-            if done % 100 == 0:
-                elapsed = time.time() - start_time
-                speed = done / elapsed if elapsed > 0 else 0
-                print(f"Progress: {done}/{total} | Speed: {speed:.1f}/s")
-                
+            for future in concurrent.futures.as_completed(futures):
+                done += 1
+                _report(future.result(), done, total, start_time)
+        manifest.save()
+        
     print(f"\n全部下载完成! 数据存储于: {DATA_DIR}")
 
 if __name__ == "__main__":
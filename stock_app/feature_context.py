@@ -0,0 +1,97 @@
+"""
+Per-frame memoized feature store shared by StrongStrategies and WeakStrategies.
+
+Several strategies need the same intermediate series (MACD, MA20/Std20, the
+20-day volume MA, rolling highs). A FeatureContext wraps one stock's frame and
+computes each of them once; every strategy then reads the cached Series
+instead of copying the frame and recomputing it.
+
+    ctx = FeatureContext(df)
+    strong = StrongStrategies.check_all_strong_strategies(df, index_df, ctx=ctx)
+    weak = WeakStrategies.check_all_weak_strategies(df, ctx=ctx)
+
+Features whose definition is identical to an Indicators column (MA20, Std20,
+Vol_MA20, DIF/DEA/MACD_Hist, EMA15, EMA200) are taken from the frame when
+Indicators has already added them.
+
+Cached Series are shared between callers and must not be modified in place.
+"""
+
+import kernels
+
+# Cache key -> Indicators column holding the same values
+INDICATOR_COLUMNS = {
+    ('ma', 20): 'MA20',
+    ('std', 20): 'Std20',
+    ('vol_ma', 20): 'Vol_MA20',
+    ('ema', 'close', 15): 'EMA15',
+    ('ema', 'close', 200): 'EMA200',
+}
+
+
+class FeatureContext:
+    """Lazily computed, memoized features of one stock's K-line frame."""
+
+    def __init__(self, df):
+        self.df = df
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, column):
+        """Raw column of the frame (no copy)."""
+        return self.df[column]
+
+    def memo(self, key, fn):
+        """Return the cached value for ``key``, computing it with ``fn()`` on first use."""
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        column = INDICATOR_COLUMNS.get(key)
+        if column is not None and column in self.df.columns:
+            value = self.df[column]
+        else:
+            value = fn()
+        self._cache[key] = value
+        return value
+
+    def close_stats(self):
+        """Prefix sums of close, shared by every MA/Std window."""
+        return self.memo(('close_stats',), lambda: kernels.PrefixStats(self.df['close']))
+
+    def ma(self, window):
+        return self.memo(('ma', window), lambda: self.close_stats().mean(window))
+
+    def std(self, window):
+        return self.memo(('std', window), lambda: self.close_stats().std(window))
+
+    def vol_ma(self, window):
+        return self.memo(('vol_ma', window), lambda: kernels.rolling_mean(self.df['volume'], window))
+
+    def ema(self, span, column='close'):
+        return self.memo(('ema', column, span),
+                         lambda: self.df[column].ewm(span=span, adjust=False).mean())
+
+    def macd(self):
+        """(DIF, DEA, MACD_Hist) with the standard (12, 26, 9) parameters."""
+        def compute():
+            if {'DIF', 'DEA', 'MACD_Hist'}.issubset(self.df.columns):
+                return self.df['DIF'], self.df['DEA'], self.df['MACD_Hist']
+            dif = self.ema(12) - self.ema(26)
+            dea = dif.ewm(span=9, adjust=False).mean()
+            return dif, dea, 2 * (dif - dea)
+        return self.memo(('macd',), compute)
+
+    def macd_hist(self):
+        return self.macd()[2]
+
+    def rolling_max(self, column, window):
+        return self.memo(('max', column, window), lambda: kernels.rolling_max(self.df[column], window))
+
+    def rolling_min(self, column, window):
+        return self.memo(('min', column, window), lambda: kernels.rolling_min(self.df[column], window))
+
+    def prev(self, column, n=1):
+        """``column`` shifted down ``n`` bars."""
+        return self.memo(('shift', column, n), lambda: self.df[column].shift(n))
@@ -0,0 +1,474 @@
+"""
+Streaming (one bar at a time) version of Indicators.add_all_indicators.
+
+The daily refresh only needs today's indicator values. Instead of recomputing
+400+ days of history, each stock keeps a small recurrence state:
+
+- EWM levels: EMA12/EMA26/DEA (MACD), EMA15, EMA_High_15, EMA200, KDJ K/D
+- trailing buffers for the rolling windows (close/high/volume: 250 bars, the
+  longest window; shorter buffers for amount, RSI gains/losses, CCI typical
+  price, RKing range and MACD_Hist)
+- cumulative amount / volume totals for CYC_Inf
+- the previous bar and RKing band for the cross signals, and the last RKing_State
+
+``update`` advances all of it by one bar. Its cost depends only on the window
+lengths, not on the length of the history.
+
+    state = Indicators.init_state(df)          # once, from the full history
+    row = Indicators.update(state, new_bar)    # every new bar
+    IndicatorStateStore().save(code, state)
+
+The refresh paths keep the saved states current through IndicatorStateStore.sync:
+refresh_pipeline after each download, realtime_quotes.update_from_quotes after
+each appended quote bar (one update() from the last two stored rows).
+
+    python stock_app/indicator_state.py        # parity check against add_all_indicators
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+STATE_VERSION = 1
+
+# Trailing bars kept per buffer (the longest window that reads it)
+BUFFER_LENGTHS = {
+    'close': 250,      # MA250, Std120, Ret_20
+    'high': 250,       # High_52, KDJ/WR highs
+    'low': 20,         # Low_20, KDJ/WR lows
+    'volume': 250,     # Max_Vol_250, Vol_MA20
+    'amount': 13,      # CYC_13
+    'vol_s': 13,       # CYC_13 (volume with 0 -> NaN)
+    'gain': 6,         # RSI2/RSI6
+    'loss': 6,
+    'tp': 14,          # CCI
+    'xrange': 8,       # RKing_Vol
+    'hist': 5,         # MACD_Hist_MA5
+}
+
+# EWM level name -> alpha
+EWM_ALPHAS = {
+    'ema12': 2 / 13, 'ema26': 2 / 27, 'dea': 2 / 10,
+    'ema15': 2 / 16, 'ema_high15': 2 / 16, 'ema200': 2 / 201,
+    'k': 1 / 3, 'd': 1 / 3,
+}
+
+NAN = float('nan')
+
+
+def _f(x):
+    """Scalar as np.float64 (division by zero gives inf/NaN like the pandas path)."""
+    return np.float64(NAN if x is None else x)
+
+
+def _push(buf, x, maxlen):
+    buf.append(float(x))
+    if len(buf) > maxlen:
+        del buf[:-maxlen]
+
+
+def _window(buf, window):
+    """Last ``window`` values, or None while the window is incomplete or contains NaN."""
+    if len(buf) < window:
+        return None
+    vals = np.asarray(buf[-window:], dtype=np.float64)
+    if np.isnan(vals).any():
+        return None
+    return vals
+
+
+def _mean(buf, window):
+    vals = _window(buf, window)
+    if vals is None:
+        return NAN
+    # Same exactness rules as kernels.PrefixStats
+    if (vals == vals[0]).all():
+        return vals[0]
+    out = vals.sum() / window
+    if (vals >= 0).all():
+        out = max(out, 0.0)
+    elif (vals < 0).all():
+        out = min(out, 0.0)
+    return out
+
+
+def _sum(buf, window):
+    vals = _window(buf, window)
+    return NAN if vals is None else vals.sum()
+
+
+def _std(buf, window):
+    vals = _window(buf, window)
+    if vals is None:
+        return NAN
+    if (vals == vals[0]).all():
+        return 0.0
+    return vals.std(ddof=1)
+
+
+def _max(buf, window):
+    vals = _window(buf, window)
+    return NAN if vals is None else vals.max()
+
+
+def _min(buf, window):
+    vals = _window(buf, window)
+    return NAN if vals is None else vals.min()
+
+
+def _mad(buf, window):
+    vals = _window(buf, window)
+    return NAN if vals is None else np.mean(np.abs(vals - np.mean(vals)))
+
+
+def _ewm_step(level, cur, alpha):
+    """
+    One step of ``ewm(alpha, adjust=False).mean()`` (ignore_na=False), same
+    recurrence as kernels.ewm_mean. ``level`` is [value, old_weight].
+    """
+    weighted, old_wt = level
+    if math.isnan(weighted):
+        if not math.isnan(cur):
+            weighted = cur
+    else:
+        old_wt *= 1 - alpha
+        if not math.isnan(cur):
+            if weighted != cur:
+                weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            old_wt = 1.0
+    level[0], level[1] = float(weighted), float(old_wt)
+    return weighted
+
+
+def _ewm_seed(inputs, outputs, alpha):
+    """[value, old_weight] after running the EWM over ``inputs`` (``outputs`` is its result)."""
+    inputs = np.asarray(inputs, dtype=np.float64)
+    observed = np.flatnonzero(~np.isnan(inputs))
+    if len(observed) == 0:
+        return [NAN, 1.0]
+    trailing_missing = len(inputs) - 1 - observed[-1]
+    return [float(np.asarray(outputs, dtype=np.float64)[-1]), (1 - alpha) ** trailing_missing]
+
+
+def _tail(values, n):
+    return [float(v) for v in np.asarray(values, dtype=np.float64)[-n:]]
+
+
+def init_state(df):
+    """
+    Recurrence state after the last bar of ``df`` (date-sorted K-line frame),
+    built from one full vectorized computation.
+    """
+    from indicators import Indicators
+
+    ind = Indicators.compute(df)
+    close = df['close'].astype(float)
+    has_amount = 'amount' in df.columns and 'volume' in df.columns
+    vol_s = df['volume'].replace(0, np.nan)
+    delta = close.diff()
+    tp = (df['high'] + df['low'] + df['close']) / 3
+    ema12 = close.ewm(span=12, adjust=False).mean()
+    ema26 = close.ewm(span=26, adjust=False).mean()
+    low9 = df['low'].rolling(9).min()
+    high9 = df['high'].rolling(9).max()
+    rsv = (close - low9) / (high9 - low9) * 100
+
+    buffers = {
+        'close': close, 'high': df['high'], 'low': df['low'], 'volume': df['volume'],
+        'amount': df['amount'] if has_amount else pd.Series(np.nan, index=df.index),
+        'vol_s': vol_s,
+        'gain': delta.where(delta > 0, 0), 'loss': -delta.where(delta < 0, 0),
+        'tp': tp, 'xrange': ind['XHigh'] - ind['XLow'], 'hist': ind['MACD_Hist'],
+    }
+    with np.errstate(invalid='ignore', divide='ignore'):
+        state = {
+            'version': STATE_VERSION,
+            'bars': int(len(df)),
+            'last_date': str(df['date'].iloc[-1])[:10] if 'date' in df.columns and len(df) else None,
+            'has_amount': bool(has_amount),
+            'buffers': {name: _tail(values, BUFFER_LENGTHS[name]) for name, values in buffers.items()},
+            'ewm': {
+                'ema12': _ewm_seed(close, ema12, EWM_ALPHAS['ema12']),
+                'ema26': _ewm_seed(close, ema26, EWM_ALPHAS['ema26']),
+                'dea': _ewm_seed(ema12 - ema26, ind['DEA'], EWM_ALPHAS['dea']),
+                'ema15': _ewm_seed(close, ind['EMA15'], EWM_ALPHAS['ema15']),
+                'ema_high15': _ewm_seed(df['high'], ind['EMA_High_15'], EWM_ALPHAS['ema_high15']),
+                'ema200': _ewm_seed(close, ind['EMA200'], EWM_ALPHAS['ema200']),
+                'k': _ewm_seed(rsv, ind['K'], EWM_ALPHAS['k']),
+                'd': _ewm_seed(ind['K'], ind['D'], EWM_ALPHAS['d']),
+            },
+            'cum_amount': float(np.nansum(df['amount'])) if has_amount else NAN,
+            'cum_volume': float(np.nansum(vol_s)),
+            'prev': {
+                'open': float(df['open'].iloc[-1]) if len(df) else NAN,
+                'close': float(close.iloc[-1]) if len(df) else NAN,
+                'upper': float(ind['RKing_Upper'].iloc[-1]) if len(df) else NAN,
+                'lower': float(ind['RKing_Lower'].iloc[-1]) if len(df) else NAN,
+            },
+            'rking_state': float(ind['RKing_State'].iloc[-1]) if len(df) else 0.0,
+        }
+    return state
+
+
+def update(state, bar):
+    """
+    Advance ``state`` by one bar and return that bar's indicator values.
+
+    :param bar: mapping with open/high/low/close/volume (and amount, date if available)
+    :return: dict with the add_all_indicators columns for the new bar
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _update(state, bar)
+
+
+def _update(state, bar):
+    buf, ewm, prev = state['buffers'], state['ewm'], state['prev']
+    o, h, l, c, v = (_f(bar.get(k)) for k in ('open', 'high', 'low', 'close', 'volume'))
+    amount = _f(bar.get('amount')) if state['has_amount'] else _f(NAN)
+    vol_s = _f(NAN) if v == 0 else v
+    delta = c - prev['close'] if not math.isnan(prev['close']) else _f(NAN)
+    tp = (h + l + c) / 3
+
+    for name, value in (('close', c), ('high', h), ('low', l), ('volume', v), ('amount', amount),
+                        ('vol_s', vol_s), ('gain', delta if delta > 0 else 0.0),
+                        ('loss', -delta if delta < 0 else 0.0), ('tp', tp)):
+        _push(buf[name], value, BUFFER_LENGTHS[name])
+
+    row = {}
+    row['MA5'] = _mean(buf['close'], 5)
+    row['MA20'] = _mean(buf['close'], 20)
+    row['MA250'] = _mean(buf['close'], 250)
+    row['Vol_MA20'] = _mean(buf['volume'], 20)
+
+    # MACD
+    dif = _f(_ewm_step(ewm['ema12'], c, EWM_ALPHAS['ema12'])) - _ewm_step(ewm['ema26'], c, EWM_ALPHAS['ema26'])
+    row['DIF'] = dif
+    row['DEA'] = _ewm_step(ewm['dea'], dif, EWM_ALPHAS['dea'])
+    row['MACD_Hist'] = 2 * (dif - row['DEA'])
+    _push(buf['hist'], row['MACD_Hist'], BUFFER_LENGTHS['hist'])
+
+    std20 = _std(buf['close'], 20)
+    row['Boll_Mid'] = row['MA20']
+    row['Boll_Upper'] = row['MA20'] + 2 * std20
+    row['Boll_Lower'] = row['MA20'] - 2 * std20
+
+    for period in (2, 6):
+        row[f'RSI{period}'] = 100 - (100 / (1 + _f(_mean(buf['gain'], period)) / _mean(buf['loss'], period)))
+
+    # CYC (Series.cumsum skips NaN but keeps it in place)
+    if state['has_amount']:
+        row['CYC_13'] = _f(_sum(buf['amount'], 13)) / _sum(buf['vol_s'], 13)
+        if not math.isnan(amount):
+            state['cum_amount'] = (0.0 if math.isnan(state['cum_amount']) else state['cum_amount']) + float(amount)
+        if not math.isnan(vol_s):
+            state['cum_volume'] += float(vol_s)
+        cum_a = _f(NAN) if math.isnan(amount) else _f(state['cum_amount'])
+        cum_v = _f(NAN) if math.isnan(vol_s) else _f(state['cum_volume'])
+        row['CYC_Inf'] = cum_a / cum_v
+    else:
+        row['CYC_13'] = NAN
+        row['CYC_Inf'] = NAN
+
+    row['Ret_20'] = c / buf['close'][-21] - 1 if len(buf['close']) > 20 else NAN
+    row['High_52'] = _max(buf['high'], 250)
+    row['Max_Vol_250'] = _max(buf['volume'], 250)
+    row['Low_20'] = _min(buf['low'], 20)
+
+    # RKing
+    row['Ref_Open'] = prev['open']
+    row['Ref_Close'] = prev['close']
+    xopen = (_f(prev['open']) + prev['close']) / 2
+    row['XOpen'] = xopen
+    row['XClose'] = c
+    row['XHigh'] = np.fmax(h, xopen)
+    row['XLow'] = np.fmin(l, xopen)
+    _push(buf['xrange'], row['XHigh'] - row['XLow'], BUFFER_LENGTHS['xrange'])
+    row['RKing_Vol'] = _mean(buf['xrange'], 8)
+    upper = row['MA5'] + _f(row['RKing_Vol']) / 2
+    lower = row['MA5'] - _f(row['RKing_Vol']) / 2
+    row['RKing_Upper'] = upper
+    row['RKing_Lower'] = lower
+    row['RKing_BU'] = bool((c > upper) and (prev['close'] <= prev['upper']))
+    row['RKing_SEL'] = bool((lower > c) and (prev['lower'] <= prev['close']))
+    if row['RKing_BU']:
+        row['Signal_State'] = 1.0
+    elif row['RKing_SEL']:
+        row['Signal_State'] = -1.0
+    else:
+        row['Signal_State'] = NAN
+    if not math.isnan(row['Signal_State']):
+        state['rking_state'] = row['Signal_State']
+    row['RKing_State'] = state['rking_state']
+
+    row['EMA15'] = _ewm_step(ewm['ema15'], c, EWM_ALPHAS['ema15'])
+    row['EMA_High_15'] = _ewm_step(ewm['ema_high15'], h, EWM_ALPHAS['ema_high15'])
+    row['EMA200'] = _ewm_step(ewm['ema200'], c, EWM_ALPHAS['ema200'])
+    row['MACD_Hist_MA5'] = _mean(buf['hist'], 5)
+
+    row['Std20'] = std20
+    row['Std60'] = _std(buf['close'], 60)
+    row['Std120'] = _std(buf['close'], 120)
+
+    row['Body'] = abs(o - c)
+    row['Upper_Shadow'] = h - np.fmax(o, c)
+    row['Lower_Shadow'] = np.fmin(o, c) - l
+    row['Range'] = h - l
+
+    # KDJ (9,3,3)
+    low9, high9 = _min(buf['low'], 9), _max(buf['high'], 9)
+    rsv = (c - low9) / (_f(high9) - low9) * 100
+    row['K'] = _ewm_step(ewm['k'], rsv, EWM_ALPHAS['k'])
+    row['D'] = _ewm_step(ewm['d'], row['K'], EWM_ALPHAS['d'])
+    row['J'] = 3 * row['K'] - 2 * row['D']
+
+    low14, high14 = _min(buf['low'], 14), _max(buf['high'], 14)
+    row['WR'] = (_f(high14) - c) / (_f(high14) - low14) * -100
+    row['CCI'] = (tp - _mean(buf['tp'], 14)) / (0.015 * _f(_mad(buf['tp'], 14)))
+
+    prev.update(open=float(o), close=float(c), upper=float(upper), lower=float(lower))
+    state['bars'] += 1
+    if bar.get('date') is not None:
+        state['last_date'] = str(bar.get('date'))[:10]
+    return {name: (value if isinstance(value, bool) else float(value)) for name, value in row.items()}
+
+
+class IndicatorStateStore:
+    """Per-stock indicator states persisted as ``<state_dir>/<code>.json``."""
+
+    def __init__(self, state_dir="stock_app/data/indicator_state"):
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _path(self, code):
+        return os.path.join(self.state_dir, f"{str(code).zfill(6)}.json")
+
+    def load(self, code):
+        """Saved state of ``code``, or None if missing / unreadable / from another version."""
+        path = self._path(code)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"[IndicatorStateStore] {code} 状态读取失败: {e}")
+            return None
+        return state if state.get('version') == STATE_VERSION else None
+
+    def sync(self, code, bars, history=None):
+        """
+        Bring the saved state of ``code`` up to the last row of ``bars`` and save it.
+
+        Rows of ``bars`` after the state's last bar are streamed through update().
+        Without a state, or when the state's last bar is not in ``bars`` or its close
+        no longer matches (missed days, re-adjusted qfq history), the state is rebuilt
+        from ``history()`` (the full stored frame), or from ``bars`` itself.
+
+        :param bars: date-sorted K-line rows ending with the newest stored bar
+        :param history: optional callable returning the full stored frame, only called for a rebuild
+        :return: indicator values of the newest bar, or None when there are too few bars
+        """
+        if bars is None or bars.empty:
+            return None
+        dates = pd.to_datetime(bars['date']).dt.strftime('%Y-%m-%d')
+        state = self.load(code)
+        if state is not None:
+            at = np.flatnonzero(dates.to_numpy() == state.get('last_date'))
+            if len(at) and math.isclose(float(bars['close'].iloc[at[-1]]), state['prev']['close'], abs_tol=1e-6):
+                row = state.get('row')
+                for bar in bars.iloc[at[-1] + 1:].to_dict('records'):
+                    row = update(state, bar)
+                if row is not None:
+                    state['row'] = row
+                    self.save(code, state)
+                    return row
+
+        df = history() if history is not None else bars
+        if df is None or len(df) < 2:
+            return None
+        # init on all but the newest bar, so its values come from the same update() path
+        state = init_state(df.iloc[:-1])
+        state['row'] = update(state, df.iloc[-1].to_dict())
+        self.save(code, state)
+        return state['row']
+
+    def save(self, code, state):
+        path = self._path(code)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+
+def compare_with_full(df, warmup, rtol=1e-8, atol=1e-10):
+    """
+    Stream ``df`` after its first ``warmup`` rows through ``update`` and compare
+    every row with add_all_indicators on the whole frame.
+
+    :return: {column: mismatched row count}, empty when equivalent
+    """
+    from indicators import Indicators
+
+    full = Indicators.add_all_indicators(df)
+    state = json.loads(json.dumps(init_state(df.iloc[:warmup])))  # through a save/load round trip
+    mismatches = {}
+    for i in range(warmup, len(df)):
+        row = update(state, df.iloc[i].to_dict())
+        for name, got in row.items():
+            expected = float(full[name].iloc[i])
+            got = float(got)
+            same = (expected == got) or (math.isnan(expected) and math.isnan(got)) or \
+                (math.isfinite(expected) and math.isfinite(got) and math.isclose(expected, got, rel_tol=rtol, abs_tol=atol))
+            if not same:
+                mismatches[name] = mismatches.get(name, 0) + 1
+    return mismatches
+
+
+def _synthetic_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    c = np.round(np.exp(np.cumsum(rng.normal(0, 0.025, n))) * rng.uniform(3, 80), 2)
+    o = np.round(c * (1 + rng.normal(0, 0.01, n)), 2)
+    h = np.maximum(o, c) + np.round(np.abs(rng.normal(0, 0.1, n)), 2)
+    l = np.minimum(o, c) - np.round(np.abs(rng.normal(0, 0.1, n)), 2)
+    v = rng.integers(1_000, 1_000_000, n).astype(float)
+    # A suspension-like flat stretch and a zero-volume day exercise the edge cases
+    o[100:112] = h[100:112] = l[100:112] = c[100:112] = c[100]
+    v[150] = 0
+    return pd.DataFrame({'date': pd.bdate_range('2021-01-04', periods=n), 'open': o, 'high': h,
+                         'low': l, 'close': c, 'volume': v, 'amount': v * c * 100})
+
+
+def main():
+    import sys
+    import time
+
+    if len(sys.argv) > 1:
+        from data_loader import DataLoader
+        frames = {code: DataLoader().get_k_data(code, "2000-01-01", "2100-01-01") for code in sys.argv[1:]}
+    else:
+        frames = {f"synthetic-{seed}": _synthetic_frame(600, seed) for seed in range(3)}
+
+    for name, df in frames.items():
+        if df.empty or len(df) < 300:
+            print(f"{name}: 数据不足，跳过")
+            continue
+        warmup = len(df) - 60
+        t0 = time.perf_counter()
+        mismatches = compare_with_full(df, warmup)
+        print(f"{name}: {len(df) - warmup} 根增量更新 vs 全量重算:",
+              "OK" if not mismatches else mismatches, f"({time.perf_counter() - t0:.2f}s 含全量)")
+
+    df = next(iter(frames.values()))
+    state = init_state(df)
+    bar = df.iloc[-1].to_dict()
+    t0 = time.perf_counter()
+    for _ in range(200):
+        update(state, bar)
+    print(f"单次 update 平均 {(time.perf_counter() - t0) / 200 * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,105 +2,132 @@
 import pandas as pd
 import numpy as np
 
+import jit_kernels
+import kernels
+
+# Columns that come from the K-line files rather than from a feature
+BASE_COLUMNS = {'date', 'open', 'high', 'low', 'close', 'volume', 'amount', 'turn'}
+
+
+class Feature:
+    """One node of the indicator dependency graph: ``fn(df, ctx)`` adds ``outputs`` from ``inputs``."""
+
+    def __init__(self, name, outputs, inputs, fn):
+        self.name = name
+        self.outputs = outputs
+        self.inputs = inputs
+        self.fn = fn
+
+
+# Optional TA-Lib backend (talib_backend module) set by Indicators.set_backend;
+# None means the pandas/numpy reference implementation
+_talib = None
+
+# Registration order is a valid topological order and matches the column
+# order of add_all_indicators
+FEATURES = []
+FEATURE_BY_OUTPUT = {}
+
+
+def feature(outputs, inputs):
+    """Register ``fn(df, ctx)`` as the producer of ``outputs``."""
+    def register(fn):
+        node = Feature(fn.__name__, list(outputs), list(inputs), fn)
+        FEATURES.append(node)
+        for col in node.outputs:
+            FEATURE_BY_OUTPUT[col] = node
+        return fn
+    return register
+
+
 class Indicators:
     @staticmethod
     def add_all_indicators(df):
         """Add all necessary indicators to the dataframe inplace."""
-        df = df.copy()
-        
-        # Basic MAs
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
-        df['MA250'] = df['close'].rolling(window=250).mean()
-        
-        # Volume MAs
-        df['Vol_MA20'] = df['volume'].rolling(window=20).mean()
-        
-        # MACD
-        # EMA12, EMA26
-        ema12 = df['close'].ewm(span=12, adjust=False).mean()
-        ema26 = df['close'].ewm(span=26, adjust=False).mean()
-        df['DIF'] = ema12 - ema26
-        df['DEA'] = df['DIF'].ewm(span=9, adjust=False).mean()
-        df['MACD_Hist'] = 2 * (df['DIF'] - df['DEA'])
-        
-        # Bollinger Bands (N=20, k=2)
-        std20 = df['close'].rolling(window=20).std()
-        df['Boll_Mid'] = df['MA20']
-        df['Boll_Upper'] = df['Boll_Mid'] + 2 * std20
-        df['Boll_Lower'] = df['Boll_Mid'] - 2 * std20
-        
-        # RSI (N=2 for spec strategies, N=6 standard)
-        df['RSI2'] = Indicators.calculate_rsi(df['close'], 2)
-        df['RSI6'] = Indicators.calculate_rsi(df['close'], 6)
-        
-        # CYC (Cost Moving Average)
-        # CYC_Short (13 days) -> Sum(Amount, 13) / Sum(Volume, 13)
-        # CYC_Infinite -> CumSum(Amount) / CumSum(Volume)
-        # Using Amount(turnover) and Volume
-        if 'amount' in df.columns and 'volume' in df.columns:
-            # Avoid division by zero
-            vol_s = df['volume'].replace(0, np.nan)
-            
-            # Short CYC (13) - approx using rolling sum
-            df['CYC_13'] = df['amount'].rolling(window=13).sum() / vol_s.rolling(window=13).sum()
-            
-            # Infinite CYC - from start of data provided
-            df['CYC_Inf'] = df['amount'].cumsum() / vol_s.cumsum()
-        else:
-            df['CYC_13'] = np.nan
-            df['CYC_Inf'] = np.nan
-            
-        # Z-Score (Rank) for 20-day return
-        # Note: Rank usually needs cross-sectional data (across all stocks). 
-        # Here we calculate longitudinal Z-Score of valid price for single stock or 
-        # placeholder for cross-sectional calculation in strategy engine.
-        # For single stock, we can use "Relative Strength" vs Index if passed, 
-        # or simple statistical deviation?
-        # Specification says: Z-Score(Returns_20). We'll calc Returns_20 first.
-        df['Ret_20'] = df['close'].pct_change(periods=20)
-        
-        # Min/Max for strategies
-        df['High_52'] = df['high'].rolling(window=250).max()
-        df['Max_Vol_250'] = df['volume'].rolling(window=250).max()
-        df['Low_20'] = df['low'].rolling(window=20).min()
-        
-        # --- New Indicators for Expanded Strategies ---
-        
-        # RKing
-        df = Indicators.add_rking(df)
-        
-        # EMA for HPS / Trend
-        df['EMA15'] = df['close'].ewm(span=15, adjust=False).mean()
-        df['EMA_High_15'] = df['high'].ewm(span=15, adjust=False).mean() # HPS Channel
-        df['EMA200'] = df['close'].ewm(span=200, adjust=False).mean()
-        
-        # MACD Signal MA for HMC
-        df['MACD_Hist_MA5'] = df['MACD_Hist'].rolling(window=5).mean()
-        
-        # Volatility for ES
-        df['Std20'] = df['close'].rolling(window=20).std()
-        df['Std60'] = df['close'].rolling(window=60).std()
-        df['Std120'] = df['close'].rolling(window=120).std()
-        
-        # Pinbar features
-        df['Body'] = (df['open'] - df['close']).abs()
-        df['Upper_Shadow'] = df['high'] - df[['open', 'close']].max(axis=1)
-        df['Lower_Shadow'] = df[['open', 'close']].min(axis=1) - df['low']
-        df['Range'] = df['high'] - df['low']
-        
-        # --- Analysis Indicators ---
-        # KDJ (9,3,3)
-        df = Indicators.calculate_kdj(df)
-        
-        # Williams %R (14)
-        df = Indicators.calculate_wr(df)
-        
-        # CCI (14)
-        df = Indicators.calculate_cci(df)
+        return Indicators.compute(df)
 
+    @staticmethod
+    def resolve(required):
+        """
+        Features needed for the ``required`` columns, dependencies included,
+        in execution order.
+        """
+        needed = set()
+        stack = list(required)
+        while stack:
+            name = stack.pop()
+            node = FEATURE_BY_OUTPUT.get(name)
+            if node is None:
+                if name not in BASE_COLUMNS:
+                    raise KeyError(f"Unknown indicator column: {name}")
+                continue
+            if node.name in needed:
+                continue
+            needed.add(node.name)
+            stack.extend(node.inputs)
+        return [node for node in FEATURES if node.name in needed]
+
+    @staticmethod
+    def compute(df, required=None):
+        """
+        Compute only the indicator columns in ``required`` (and what they depend on).
+
+        :param required: iterable of column names, None for every registered feature
+        :return: copy of df with the computed columns added
+        """
+        df = df.copy()
+        nodes = FEATURES if required is None else Indicators.resolve(required)
+        # Per-call scratch space shared by features (e.g. prefix sums of close)
+        ctx = {}
+        for node in nodes:
+            node.fn(df, ctx)
         return df
 
+    @staticmethod
+    def set_backend(name='pandas', verify=True):
+        """
+        Select the backend for MA/RSI/BBANDS/WR/CCI: 'pandas' or 'talib'.
+        'talib' is only activated if TA-Lib is installed and (unless verify=False)
+        talib_backend.verify() stays within its documented parity bounds.
+
+        :return: name of the active backend
+        """
+        global _talib
+        if name == 'pandas':
+            _talib = None
+            return 'pandas'
+        if name != 'talib':
+            raise ValueError(f"Unknown indicator backend: {name}")
+        import talib_backend
+        if not talib_backend.available():
+            print("[Indicators] TA-Lib 未安装，继续使用 pandas 后端")
+            return Indicators.get_backend()
+        if verify:
+            _talib = None  # the reference side of the comparison
+            report = talib_backend.verify()
+            if not report['ok'].all():
+                failed = ", ".join(report.loc[~report['ok'], 'column'])
+                print(f"[Indicators] TA-Lib 结果超出一致性范围 ({failed})，继续使用 pandas 后端")
+                return 'pandas'
+        _talib = talib_backend
+        return 'talib'
+
+    @staticmethod
+    def get_backend():
+        return 'pandas' if _talib is None else 'talib'
+
+    @staticmethod
+    def init_state(df):
+        """Streaming recurrence state after the last bar of df (see indicator_state)."""
+        import indicator_state
+        return indicator_state.init_state(df)
+
+    @staticmethod
+    def update(state, new_bar):
+        """Advance ``state`` by one bar in constant time, return the bar's indicator values."""
+        import indicator_state
+        return indicator_state.update(state, new_bar)
+
     @staticmethod
     def add_rking(df):
         """
@@ -132,10 +159,10 @@ class Indicators:
         df['XLow'] = df[['low', 'XOpen']].min(axis=1)
         
         # 4. Volatility (MA 8 of Range)
-        df['RKing_Vol'] = (df['XHigh'] - df['XLow']).rolling(window=8).mean()
+        df['RKing_Vol'] = kernels.rolling_mean(df['XHigh'] - df['XLow'], 8)
         
         # 5. Bands
-        ma5 = df['XClose'].rolling(window=5).mean()
+        ma5 = kernels.rolling_mean(df['XClose'], 5)
         df['RKing_Upper'] = ma5 + df['RKing_Vol'] / 2
         df['RKing_Lower'] = ma5 - df['RKing_Vol'] / 2
         
@@ -167,8 +194,8 @@ class Indicators:
         # Create signal series (NaN where no signal)
         df['Signal_State'] = np.select(conditions, choices, default=np.nan)
         
-        # Forward fill to propagate state
-        df['RKing_State'] = df['Signal_State'].ffill().fillna(0) # 0 = Neutral/Start
+        # Propagate state: the last signal wins (0 = Neutral/Start)
+        df['RKing_State'] = jit_kernels.rking_state(df['RKing_BU'], df['RKing_SEL'])
         
         # Cleanup temp cols if desired, or keep for debug
         # df.drop(columns=['Ref_Open', 'Ref_Close', 'XOpen', ...], inplace=True)
@@ -178,16 +205,16 @@ class Indicators:
     @staticmethod
     def calculate_rsi(series, period):
         delta = series.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+        gain = kernels.rolling_mean(delta.where(delta > 0, 0), period)
+        loss = kernels.rolling_mean(-delta.where(delta < 0, 0), period)
         
         rs = gain / loss
         return 100 - (100 / (1 + rs))
 
     @staticmethod
     def calculate_kdj(df, n=9, m1=3, m2=3):
-        low_list = df['low'].rolling(window=n, min_periods=n).min()
-        high_list = df['high'].rolling(window=n, min_periods=n).max()
+        low_list = kernels.rolling_min(df['low'], n)
+        high_list = kernels.rolling_max(df['high'], n)
         rsv = (df['close'] - low_list) / (high_list - low_list) * 100
         df['K'] = rsv.ewm(com=m1-1, adjust=False).mean()
         df['D'] = df['K'].ewm(com=m2-1, adjust=False).mean()
@@ -196,8 +223,8 @@ class Indicators:
 
     @staticmethod
     def calculate_wr(df, n=14):
-        low_list = df['low'].rolling(window=n, min_periods=n).min()
-        high_list = df['high'].rolling(window=n, min_periods=n).max()
+        low_list = kernels.rolling_min(df['low'], n)
+        high_list = kernels.rolling_max(df['high'], n)
         # Williams %R = (High_n - Close) / (High_n - Low_n) * -100
         df['WR'] = (high_list - df['close']) / (high_list - low_list) * -100
         return df
@@ -205,61 +232,211 @@ class Indicators:
     @staticmethod
     def calculate_cci(df, n=14):
         tp = (df['high'] + df['low'] + df['close']) / 3
-        ma = tp.rolling(window=n).mean()
-        md = tp.rolling(window=n).apply(lambda x: np.mean(np.abs(x - np.mean(x))))
+        ma = kernels.rolling_mean(tp, n)
+        md = kernels.rolling_mad(tp, n)
         df['CCI'] = (tp - ma) / (0.015 * md)
         return df
 
-# Chip Distribution Approximation (HLP3)
-# To calculate "Profit Ratio" (Winner Ratio), we need a distribution model.
-# Simplified model: 
-# Assume turnover implies chip exchange.
-# We hold a histogram of costs: {price_bin: volume_share}
-# Update daily: decay old chips by turn_rate, add new chips at current price.
+
+def _close_stats(df, ctx):
+    """One set of prefix sums of close serves every MA/Std window."""
+    if 'close_stats' not in ctx:
+        ctx['close_stats'] = kernels.PrefixStats(df['close'])
+    return ctx['close_stats']
+
+
+# Basic MAs
+@feature(['MA5'], ['close'])
+def ma5(df, ctx):
+    df['MA5'] = _talib.sma(df['close'], 5) if _talib else _close_stats(df, ctx).mean(5)
+
+
+@feature(['MA20'], ['close'])
+def ma20(df, ctx):
+    df['MA20'] = _talib.sma(df['close'], 20) if _talib else _close_stats(df, ctx).mean(20)
+
+
+@feature(['MA250'], ['close'])
+def ma250(df, ctx):
+    df['MA250'] = _talib.sma(df['close'], 250) if _talib else _close_stats(df, ctx).mean(250)
+
+
+# Volume MAs
+@feature(['Vol_MA20'], ['volume'])
+def vol_ma20(df, ctx):
+    df['Vol_MA20'] = _talib.sma(df['volume'], 20) if _talib else kernels.rolling_mean(df['volume'], 20)
+
+
+@feature(['DIF', 'DEA', 'MACD_Hist'], ['close'])
+def macd(df, ctx):
+    # EMA12, EMA26
+    ema12 = df['close'].ewm(span=12, adjust=False).mean()
+    ema26 = df['close'].ewm(span=26, adjust=False).mean()
+    df['DIF'] = ema12 - ema26
+    df['DEA'] = df['DIF'].ewm(span=9, adjust=False).mean()
+    df['MACD_Hist'] = 2 * (df['DIF'] - df['DEA'])
+
+
+@feature(['Boll_Mid', 'Boll_Upper', 'Boll_Lower'], ['MA20', 'close'])
+def bollinger(df, ctx):
+    # Bollinger Bands (N=20, k=2)
+    if _talib:
+        df['Boll_Mid'], df['Boll_Upper'], df['Boll_Lower'] = _talib.bbands(df['close'])
+        return
+    std20 = _close_stats(df, ctx).std(20)
+    df['Boll_Mid'] = df['MA20']
+    df['Boll_Upper'] = df['Boll_Mid'] + 2 * std20
+    df['Boll_Lower'] = df['Boll_Mid'] - 2 * std20
+
+
+# RSI (N=2 for spec strategies, N=6 standard)
+@feature(['RSI2'], ['close'])
+def rsi2(df, ctx):
+    df['RSI2'] = _talib.rsi(df['close'], 2) if _talib else Indicators.calculate_rsi(df['close'], 2)
+
+
+@feature(['RSI6'], ['close'])
+def rsi6(df, ctx):
+    df['RSI6'] = _talib.rsi(df['close'], 6) if _talib else Indicators.calculate_rsi(df['close'], 6)
+
+
+@feature(['CYC_13', 'CYC_Inf'], ['volume', 'amount'])
+def cyc(df, ctx):
+    # CYC (Cost Moving Average)
+    # CYC_Short (13 days) -> Sum(Amount, 13) / Sum(Volume, 13)
+    # CYC_Infinite -> CumSum(Amount) / CumSum(Volume)
+    # Using Amount(turnover) and Volume; NaN when the source has no amount
+    if 'amount' in df.columns and 'volume' in df.columns:
+        # Avoid division by zero
+        vol_s = df['volume'].replace(0, np.nan)
+
+        # Short CYC (13) - approx using rolling sum
+        df['CYC_13'] = kernels.rolling_sum(df['amount'], 13) / kernels.rolling_sum(vol_s, 13)
+
+        # Infinite CYC - from start of data provided
+        df['CYC_Inf'] = df['amount'].cumsum() / vol_s.cumsum()
+    else:
+        df['CYC_13'] = np.nan
+        df['CYC_Inf'] = np.nan
+
+
+@feature(['Ret_20'], ['close'])
+def ret_20(df, ctx):
+    # Z-Score (Rank) for 20-day return
+    # Note: Rank usually needs cross-sectional data (across all stocks).
+    # Here we calculate longitudinal Z-Score of valid price for single stock or
+    # placeholder for cross-sectional calculation in strategy engine.
+    # Specification says: Z-Score(Returns_20). We'll calc Returns_20 first.
+    df['Ret_20'] = df['close'].pct_change(periods=20)
+
+
+# Min/Max for strategies
+@feature(['High_52'], ['high'])
+def high_52(df, ctx):
+    df['High_52'] = kernels.rolling_max(df['high'], 250)
+
+
+@feature(['Max_Vol_250'], ['volume'])
+def max_vol_250(df, ctx):
+    df['Max_Vol_250'] = kernels.rolling_max(df['volume'], 250)
+
+
+@feature(['Low_20'], ['low'])
+def low_20(df, ctx):
+    df['Low_20'] = kernels.rolling_min(df['low'], 20)
+
+
+# --- New Indicators for Expanded Strategies ---
+@feature(['Ref_Open', 'Ref_Close', 'XOpen', 'XClose', 'XHigh', 'XLow', 'RKing_Vol',
+          'RKing_Upper', 'RKing_Lower', 'RKing_BU', 'RKing_SEL', 'Signal_State', 'RKing_State'],
+         ['open', 'high', 'low', 'close'])
+def rking(df, ctx):
+    Indicators.add_rking(df)
+
+
+# EMA for HPS / Trend
+@feature(['EMA15'], ['close'])
+def ema15(df, ctx):
+    df['EMA15'] = df['close'].ewm(span=15, adjust=False).mean()
+
+
+@feature(['EMA_High_15'], ['high'])
+def ema_high_15(df, ctx):
+    df['EMA_High_15'] = df['high'].ewm(span=15, adjust=False).mean() # HPS Channel
+
+
+@feature(['EMA200'], ['close'])
+def ema200(df, ctx):
+    df['EMA200'] = df['close'].ewm(span=200, adjust=False).mean()
+
+
+# MACD Signal MA for HMC
+@feature(['MACD_Hist_MA5'], ['MACD_Hist'])
+def macd_hist_ma5(df, ctx):
+    df['MACD_Hist_MA5'] = kernels.rolling_mean(df['MACD_Hist'], 5)
+
+
+# Volatility for ES
+@feature(['Std20'], ['close'])
+def std20(df, ctx):
+    df['Std20'] = _close_stats(df, ctx).std(20)
+
+
+@feature(['Std60'], ['close'])
+def std60(df, ctx):
+    df['Std60'] = _close_stats(df, ctx).std(60)
+
+
+@feature(['Std120'], ['close'])
+def std120(df, ctx):
+    df['Std120'] = _close_stats(df, ctx).std(120)
+
+
+@feature(['Body', 'Upper_Shadow', 'Lower_Shadow', 'Range'], ['open', 'high', 'low', 'close'])
+def pinbar_parts(df, ctx):
+    # Pinbar features
+    df['Body'] = (df['open'] - df['close']).abs()
+    df['Upper_Shadow'] = df['high'] - df[['open', 'close']].max(axis=1)
+    df['Lower_Shadow'] = df[['open', 'close']].min(axis=1) - df['low']
+    df['Range'] = df['high'] - df['low']
+
+
+# --- Analysis Indicators ---
+@feature(['K', 'D', 'J'], ['high', 'low', 'close'])
+def kdj(df, ctx):
+    # KDJ (9,3,3)
+    Indicators.calculate_kdj(df)
+
+
+@feature(['WR'], ['high', 'low', 'close'])
+def wr(df, ctx):
+    # Williams %R (14)
+    if _talib:
+        df['WR'] = _talib.willr(df['high'], df['low'], df['close'])
+    else:
+        Indicators.calculate_wr(df)
+
+
+@feature(['CCI'], ['high', 'low', 'close'])
+def cci(df, ctx):
+    # CCI (14)
+    if _talib:
+        df['CCI'] = _talib.cci(df['high'], df['low'], df['close'])
+    else:
+        Indicators.calculate_cci(df)
+
+
+# Chip Distribution (HLP3)
+# Turnover-decay cost histogram, see chip_engine:
+# chips[t] = chips[t-1] * (1 - turn) + new_chips(low..high) * turn
 def calculate_chip_distribution(df):
     """
     Calculate Winner Ratio (Profit Proportion).
     Returns Series of winner_ratio (0-1).
-    This is computationally expensive, so optimized with simplified decay.
+    Uses the 'turn' column (%) when present, otherwise a volume-based turnover estimate.
     """
-    winner_ratios = []
-    # Simplified: 
-    # Current Chip Cost Distribution ~ EMA(Price, Volume_Weights)? No.
-    # We simulate: 
-    # Chips[t] = Chips[t-1] * (1 - turn) + NewChips(Price[t]) * turn
-    # Calculate % of Chips < Close[t]
-    
-    # We need to simulate day by day.
-    # To be fast, we can use a discrete price grid or just verify logic.
-    # Using a 60-day window estimation is faster:
-    # Most chips are exchanged in last 60-120 days.
-    # We can estimate "Average Cost" roughly or implement the decay loop.
-    
-    # Implementing a fast decay loop
-    # cost_dist = {price: weight}
-    # But prices are continuous. We use 100 bins?
-    # Or just simpler: Winner Ratio ~ (Close - Cost_Avg) / Volatility? No.
-    
-    # Correct approach for HLP3 (Winner Ratio):
-    # Iterate data.
-    prices = df['close'].values
-    turns = df['turn'].values / 100.0 if 'turn' in df.columns else np.zeros(len(df))
-    # If turn is missing, guess 1-3%?
-    
-    # Full simulation is too slow for python loop on large datasets without numba.
-    # We will use value `(Close - MA60) / Std60` as a proxy for profit ratio for now?
-    # Or strict definition:
-    # "Winner Ratio" is provided by data providers usually. 
-    # Without it, we use: Close > CYC_Inf is >50% winner likely.
-    # Close > CYC_13 is short term profit.
-    # Let's use a placeholder or simplified proxy:
-    # Proxy: sigmoid((Close - MA60)/Std60) scaled to 0-100%?
-    # Strategy spec said: "Yesterday < 1%, Today > 35%". 
-    # This implies we literally need the ratio.
-    
-    # We will skip complex simulation in this iteration and return NaN or use a proxy.
-    # User might verify this. I will put a basic proxy. 
-    # Proxy: Percentile of (Close - Low_120)/(High_120 - Low_120) * 100 ?
-    pass 
-    return pd.Series(np.nan, index=df.index)
+    from chip_engine import ChipEngine
+    if df.empty:
+        return pd.Series(np.nan, index=df.index)
+    return ChipEngine.add_winner_pct(df)['winner_pct'] / 100
 
@@ -0,0 +1,387 @@
+"""
+Path-dependent kernels with an optional Numba backend (``pip install numba``).
+
+Some signals are sequential by nature: each bar's state depends on the
+previous bar's state, not only on a trailing window.
+
+- rking_state: RKing long/short state (last BU / SEL signal)
+- ua_target_high: high of the latest 250-day max-volume bar (UA), tracked with
+  a monotonic deque
+- double_volume_hold: 倍量不破 — arm on a double-volume bar, disarm when the
+  close breaks its low, fire on the first re-ignition (volume above Vol_MA20 on
+  an up bar) while still holding, then wait for the next double-volume bar
+- chip_winner_pct: turnover-decay chip histogram (ChipEngine)
+
+Each kernel has a Numba loop (per stock, one pass over the bars) and a
+pure-numpy fallback (ffill / segment-cumsum formulations, or a day loop
+vectorized over stocks for the chip histogram). Both give the same results:
+bit-identical for the state machines, within float summation order (< 1e-9)
+for chip_winner_pct.
+
+The Numba backend is used automatically when numba is installed; compiled code
+is cached on disk (``cache=True``).
+
+    import jit_kernels
+    jit_kernels.set_backend('numpy')        # force the fallback
+    state = jit_kernels.rking_state(bu, sel)
+
+    python stock_app/jit_kernels.py     # numba/numpy parity + timing
+"""
+
+import numpy as np
+
+import kernels
+
+try:
+    import numba
+    prange = numba.prange
+except ImportError:
+    numba = None
+    prange = range
+
+_backend = 'numba' if numba is not None else 'numpy'
+
+
+def available():
+    return numba is not None
+
+
+def set_backend(name):
+    """'numba' (if installed) or 'numpy'."""
+    global _backend
+    if name == 'numba' and numba is None:
+        print("[jit_kernels] numba 未安装 (pip install numba)，使用 numpy 实现")
+        name = 'numpy'
+    if name not in ('numba', 'numpy'):
+        raise ValueError(f"Unknown backend: {name}")
+    _backend = name
+
+
+def get_backend():
+    return _backend
+
+
+def _jit(fn, parallel=False):
+    """Compile with Numba when installed; the plain-Python loop otherwise (slow, parity checks only)."""
+    if numba is None:
+        return fn
+    return numba.njit(cache=True, nogil=True, parallel=parallel)(fn)
+
+
+def _mask_2d(x):
+    arr, restore = kernels._as_2d(x)
+    return np.nan_to_num(arr) != 0, restore
+
+
+# ---------- RKing state ----------
+
+def _rking_state_loop(bu, sel, out):
+    n, m = bu.shape
+    for j in range(m):
+        state = 0.0
+        for t in range(n):
+            if bu[t, j]:
+                state = 1.0
+            elif sel[t, j]:
+                state = -1.0
+            out[t, j] = state
+
+
+_rking_state_jit = _jit(_rking_state_loop)
+
+
+def rking_state(bu, sel):
+    """1 after a BU signal, -1 after a SEL signal (BU wins on the same bar), 0 before any."""
+    bu, restore = _mask_2d(bu)
+    sel, _ = _mask_2d(sel)
+    if _backend == 'numba':
+        out = np.empty(bu.shape)
+        _rking_state_jit(bu, sel, out)
+        return restore(out)
+    state = kernels.ffill(np.select([bu, sel], [1.0, -1.0], default=np.nan))
+    return restore(np.where(np.isnan(state), 0.0, state))
+
+
+# ---------- UA: high of the latest max-volume bar ----------
+
+def _ua_target_loop(volume, high, window, is_max, target):
+    n, m = volume.shape
+    dq = np.empty(n, dtype=np.int64)
+    for j in range(m):
+        head = 0
+        tail = 0
+        last_nan = -1
+        level = np.nan
+        for t in range(n):
+            v = volume[t, j]
+            if np.isnan(v):
+                last_nan = t
+            else:
+                # Monotonic deque of candidate maxima (decreasing volume)
+                while tail > head and volume[dq[tail - 1], j] <= v:
+                    tail -= 1
+                dq[tail] = t
+                tail += 1
+            while tail > head and dq[head] <= t - window:
+                head += 1
+            # pandas rolling(window).max(): NaN until a full window without NaN
+            full = t >= window - 1 and t - last_nan >= window
+            hit = full and tail > head and volume[dq[head], j] == v
+            is_max[t, j] = hit
+            if hit and not np.isnan(high[t, j]):
+                level = high[t, j]
+            target[t, j] = level
+
+
+_ua_target_jit = _jit(_ua_target_loop)
+
+
+def ua_target_high(volume, high, window=250):
+    """
+    :return: (is_max, target): is_max marks bars whose volume equals the
+             ``window``-bar max volume, target is the high of the latest such bar
+    """
+    vol, restore = kernels._as_2d(volume)
+    hi, _ = kernels._as_2d(high)
+    if _backend == 'numba':
+        is_max = np.empty(vol.shape, dtype=bool)
+        target = np.empty(vol.shape)
+        _ua_target_jit(vol, hi, window, is_max, target)
+    else:
+        is_max = vol == kernels.rolling_max(vol, window)
+        target = kernels.ffill(np.where(is_max, hi, np.nan))
+    return restore(is_max), restore(target)
+
+
+# ---------- 倍量不破 (Double Volume Hold) ----------
+
+def _double_volume_loop(open_, close, low, volume, vol_ma, level_out, holding, signal):
+    n, m = close.shape
+    for j in range(m):
+        level = np.nan
+        armed = False
+        for t in range(n):
+            double_vol = t > 0 and volume[t, j] > volume[t - 1, j] * 2
+            if double_vol:
+                armed = True
+                if not np.isnan(low[t, j]):
+                    level = low[t, j]
+            level_out[t, j] = level
+            if armed and not close[t, j] > level:
+                armed = False
+            holding[t, j] = armed
+            fire = armed and not double_vol and volume[t, j] > vol_ma[t, j] and close[t, j] > open_[t, j]
+            signal[t, j] = fire
+            if fire:
+                armed = False
+
+
+_double_volume_jit = _jit(_double_volume_loop)
+
+
+def _count_in_segment(event, start):
+    """Events so far inside the segment that began at the latest ``start`` row (0 before any start)."""
+    cs = np.cumsum(event, axis=0)
+    before = cs - event
+    base = kernels.ffill(np.where(start, before, np.nan))
+    return np.where(np.isnan(base), 0.0, cs - base)
+
+
+def double_volume_hold(open_, close, low, volume, vol_ma):
+    """
+    :return: (level, holding, signal):
+             level — low of the latest double-volume bar (volume > 2 × previous),
+             holding — armed and the close has stayed above ``level`` since that bar,
+             signal — first later bar with volume > ``vol_ma`` and close > open while holding
+    """
+    o, restore = kernels._as_2d(open_)
+    c, _ = kernels._as_2d(close)
+    lo, _ = kernels._as_2d(low)
+    v, _ = kernels._as_2d(volume)
+    vma, _ = kernels._as_2d(vol_ma)
+    if _backend == 'numba':
+        level = np.empty(c.shape)
+        holding = np.empty(c.shape, dtype=bool)
+        signal = np.empty(c.shape, dtype=bool)
+        _double_volume_jit(o, c, lo, v, vma, level, holding, signal)
+        return restore(level), restore(holding), restore(signal)
+
+    with np.errstate(invalid='ignore'):
+        double_vol = np.zeros(c.shape, dtype=bool)
+        double_vol[1:] = v[1:] > v[:-1] * 2
+        level = kernels.ffill(np.where(double_vol, lo, np.nan))
+        started = np.maximum.accumulate(double_vol, axis=0)
+        # A break disarms until the next double-volume bar; so does the first ignition
+        breaks = started & ~(c > level)
+        intact = _count_in_segment(breaks, double_vol) == 0
+        ignition = ~double_vol & (v > vma) & (c > o)
+        armed_ignition = started & intact & ignition
+        prior_fires = _count_in_segment(armed_ignition, double_vol) - armed_ignition
+        holding = started & intact & (prior_fires == 0)
+        signal = holding & ignition
+    return restore(level), restore(holding), restore(signal)
+
+
+# ---------- Chip distribution ----------
+
+def _chip_loop(h, l, c, tr, valid, edges, width, out):
+    n, m = c.shape
+    bins = edges.shape[1] - 1
+    # Stocks are independent: spread them over cores
+    for j in prange(m):
+        chips = np.zeros(bins)
+        started = False
+        for t in range(n):
+            if not valid[t, j]:
+                continue
+            lo = l[t, j]
+            span = max(h[t, j] - lo, 1e-12)
+            rate = tr[t, j] if started else 1.0
+            started = True
+            total = 0.0
+            below = 0.0
+            prev = min(max((edges[j, 0] - lo) / span, 0.0), 1.0)
+            for b in range(bins):
+                cdf = min(max((edges[j, b + 1] - lo) / span, 0.0), 1.0)
+                chips[b] = chips[b] * (1.0 - rate) + (cdf - prev) * rate
+                prev = cdf
+                total += chips[b]
+                below += min(max((c[t, j] - edges[j, b]) / width[j], 0.0), 1.0) * chips[b]
+            out[t, j] = below / total * 100 if total > 0 else np.nan
+
+
+_chip_jit = _jit(_chip_loop, parallel=True)
+
+
+def _chip_numpy(h, l, c, tr, valid, edges, width, out):
+    """Day loop vectorized over stocks × bins (days without a bar use rate 0)."""
+    m, bins = edges.shape[0], edges.shape[1] - 1
+    bin_lo = edges[:, :-1]
+    chips = np.zeros((m, bins))
+    started = np.zeros(m, dtype=bool)
+    # Scratch buffers reused every day
+    cdf = np.empty((m, bins + 1))
+    new = np.empty((m, bins))
+    below = np.empty((m, bins))
+    for t in range(c.shape[0]):
+        v = valid[t]
+        if not v.any():
+            continue
+        lo, hi, close_t = l[t], h[t], c[t]
+        # Uniform volume over [low, high]; a one-price day becomes a step
+        span = np.maximum(hi - lo, 1e-12)
+        np.subtract(edges, lo[:, None], out=cdf)
+        cdf /= span[:, None]
+        np.clip(cdf, 0.0, 1.0, out=cdf)
+        np.subtract(cdf[:, 1:], cdf[:, :-1], out=new)
+
+        # The first bar of a stock sets its whole distribution
+        rate = np.where(v, np.where(started, tr[t], 1.0), 0.0)[:, None]
+        chips *= 1.0 - rate
+        new *= rate
+        chips += new
+        started |= v
+
+        np.subtract(close_t[:, None], bin_lo, out=below)
+        below /= width[:, None]
+        np.clip(below, 0.0, 1.0, out=below)
+        below *= chips
+        total = chips.sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[t] = np.where(v & (total > 0), below.sum(axis=1) / total * 100, np.nan)
+
+
+def chip_winner_pct(h, l, c, tr, valid, edges, width):
+    """
+    winner_pct recurrence of ChipEngine.winner_pct on prepared (days × stocks)
+    arrays: per-stock bin ``edges`` (stocks × bins+1) and bin ``width``.
+    """
+    out = np.full(c.shape, np.nan)
+    if _backend == 'numba':
+        _chip_jit(h, l, c, tr, valid, edges, width, out)
+    else:
+        _chip_numpy(h, l, c, tr, valid, edges, width, out)
+    return out
+
+
+def warm_up():
+    """Run every kernel once on a tiny input so numba compiles (or loads its cache) now, not mid-scan."""
+    o, h, l, c, v = _synthetic(30, 2)
+    rking_state(c > o, c < o)
+    ua_target_high(v, h, 5)
+    double_volume_hold(o, c, l, v, v)
+    from chip_engine import ChipEngine
+    ChipEngine.winner_pct(h, l, c, np.full(c.shape, 0.05))
+
+
+# ---------- Parity / timing ----------
+
+def _synthetic(days, stocks, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(np.exp(np.cumsum(rng.normal(0, 0.02, (days, stocks)), axis=0)) * 20, 2)
+    open_ = np.round(close * (1 + rng.normal(0, 0.01, close.shape)), 2)
+    high = np.maximum(open_, close) + 0.05
+    low = np.minimum(open_, close) - 0.05
+    volume = np.round(rng.lognormal(12, 0.8, close.shape))
+    volume[rng.random(close.shape) < 0.002] = np.nan
+    return open_, high, low, close, volume
+
+
+def _same(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return np.array_equal(np.isnan(a), np.isnan(b)) and np.array_equal(a[~np.isnan(a)], b[~np.isnan(b)])
+
+
+def compare_backends(days=600, stocks=2000):
+    """Run every kernel on both backends; {kernel: (numba s, numpy s, max abs diff)}."""
+    import time
+    from chip_engine import ChipEngine
+
+    o, h, l, c, v = _synthetic(days, stocks)
+    vma = kernels.rolling_mean(v, 20)
+    rng = np.random.default_rng(1)
+    bu, sel = rng.random(c.shape) < 0.03, rng.random(c.shape) < 0.03
+    turn = rng.uniform(0.005, 0.08, c.shape)
+    cases = {
+        'rking_state': lambda: (rking_state(bu, sel),),
+        'ua_target_high': lambda: ua_target_high(v, h, 250),
+        'double_volume_hold': lambda: double_volume_hold(o, c, l, v, vma),
+        'chip_winner_pct': lambda: (ChipEngine.winner_pct(h, l, c, turn),),
+    }
+    report = {}
+    previous = _backend
+    try:
+        for name, fn in cases.items():
+            timings, results = [], []
+            for backend in ('numba', 'numpy'):
+                set_backend(backend)
+                fn()  # warm-up (JIT compile / cache load)
+                t0 = time.perf_counter()
+                results.append(fn())
+                timings.append(time.perf_counter() - t0)
+            diff = 0.0
+            for a, b in zip(*results):
+                a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+                if not np.array_equal(np.isnan(a), np.isnan(b)):
+                    diff = float('inf')
+                elif not _same(a, b):
+                    diff = max(diff, float(np.nanmax(np.abs(a - b))))
+            report[name] = (timings[0], timings[1], diff)
+    finally:
+        set_backend(previous)
+    return report
+
+
+def main():
+    # Go through the importable module: chip_engine switches backends on it, not on __main__
+    import jit_kernels
+
+    if not jit_kernels.available():
+        print("numba 未安装 (pip install numba)：只有 numpy 实现可用")
+        return
+    for name, (t_jit, t_np, diff) in jit_kernels.compare_backends().items():
+        print(f"{name:20s} numba {t_jit * 1e3:8.1f}ms  numpy {t_np * 1e3:8.1f}ms  max diff {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
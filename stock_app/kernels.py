@@ -0,0 +1,288 @@
+"""
+O(n) sliding-window kernels shared by Indicators, StrongStrategies,
+WeakStrategies and PanelIndicators.
+
+Every kernel works along axis 0 of a 1-D series or a 2-D (days × stocks)
+array, and accepts a pandas Series (the result is then a Series on the same
+index). Windows follow pandas ``rolling(window)`` semantics (min_periods =
+window, so a window that contains NaN is NaN), and the prefix-sum kernels keep
+pandas' exactness rules:
+- a window of identical values returns exactly that value (variance exactly 0)
+- the mean of an all non-negative / all negative window keeps its sign
+
+Kernels:
+- PrefixStats: prefix sums of x and x², shared by the means/variances of any
+  number of window lengths
+- rolling_max / rolling_min: van Herk / Gil-Werman block scan (block prefix and
+  suffix extrema), the vectorized equivalent of the monotonic-deque algorithm,
+  ~3 comparisons per element independent of the window length
+- rolling_argmax: same scan on a (rank, position) key
+- rolling_mad: mean absolute deviation from one strided window view (no
+  Python callback per bar as with rolling().apply)
+
+    python stock_app/bench_kernels.py      # speedup vs pandas
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _as_2d(x):
+    """(2-D float array, restore function) for an ndarray or Series input."""
+    index = x.index if isinstance(x, pd.Series) else None
+    arr = np.asarray(x, dtype=np.float64)
+    one_d = arr.ndim == 1
+    if one_d:
+        arr = arr[:, None]
+
+    def restore(out):
+        if one_d:
+            out = out[:, 0]
+        if index is not None:
+            return pd.Series(out, index=index)
+        return out
+
+    return arr, restore
+
+
+def _window_counts(mask, window):
+    """Number of True values in each trailing window (rows before the first full window are 0)."""
+    cs = np.vstack([np.zeros((1, mask.shape[1])), np.cumsum(mask, axis=0)])
+    out = np.zeros(mask.shape)
+    if window <= mask.shape[0]:
+        out[window - 1:] = cs[window:] - cs[:-window]
+    return out
+
+
+def _same_value_run(x):
+    """Length of the run of identical consecutive values ending at each row."""
+    rows = np.arange(x.shape[0])[:, None]
+    change = np.ones(x.shape, dtype=bool)
+    change[1:] = x[1:] != x[:-1]
+    last_change = np.where(change, rows, 0)
+    np.maximum.accumulate(last_change, axis=0, out=last_change)
+    return rows - last_change + 1
+
+
+def _window_diff(cs, window, n):
+    out = np.full((n, cs.shape[1]), np.nan)
+    if window <= n:
+        out[window - 1:] = cs[window:] - cs[:-window]
+    return out
+
+
+class PrefixStats:
+    """
+    Prefix sums of one series, reused for rolling sums/means/variances of
+    several window lengths (e.g. MA5/MA20/MA250 and Std20/60/120 of close).
+
+    Variances use prefix sums of the column-centered data, which keeps the
+    cancellation error of sum(x²) - sum(x)²/n small.
+    """
+
+    def __init__(self, x):
+        arr, self._restore = _as_2d(x)
+        self.x = arr
+        self.n = arr.shape[0]
+        valid = ~np.isnan(arr)
+        zeros = np.zeros((1, arr.shape[1]))
+        filled = np.where(valid, arr, 0.0)
+        # Most series have no gaps: every window past the warm-up is then full
+        self._has_nan = not valid.all()
+        self._cnt = np.vstack([zeros, np.cumsum(valid, axis=0)]) if self._has_nan else None
+        self._cs = np.vstack([zeros, np.cumsum(filled, axis=0)])
+        self._any_neg = bool((arr < 0).any())
+
+        cnt = valid.sum(axis=0)
+        center = np.where(cnt > 0, filled.sum(axis=0) / np.maximum(cnt, 1), 0.0)
+        d = np.where(valid, arr - center, 0.0)
+        self._cs_d = np.vstack([zeros, np.cumsum(d, axis=0)])
+        self._cs_d2 = np.vstack([zeros, np.cumsum(d * d, axis=0)])
+        self._run = None
+        self._neg = None
+
+    def _full(self, window):
+        return _window_diff(self._cnt, window, self.n) == window
+
+    def _same_run(self):
+        if self._run is None:
+            self._run = _same_value_run(self.x)
+        return self._run
+
+    def _sum(self, window):
+        out = _window_diff(self._cs, window, self.n)
+        if self._has_nan:
+            out = np.where(self._full(window), out, np.nan)
+        return out
+
+    def sum(self, window):
+        return self._restore(self._sum(window))
+
+    def mean(self, window):
+        out = self._sum(window) / window
+        if window <= self.n:
+            if not self._any_neg:
+                out = np.maximum(out, 0.0)
+            else:
+                if self._neg is None:
+                    self._neg = np.vstack([np.zeros((1, self.x.shape[1])), np.cumsum(self.x < 0, axis=0)])
+                neg = _window_diff(self._neg, window, self.n)
+                out = np.where(neg == 0, np.maximum(out, 0.0), out)
+                out = np.where(neg == window, np.minimum(out, 0.0), out)
+            out = np.where(self._same_run() >= window, self.x, out)
+        return self._restore(out)
+
+    def var(self, window, ddof=1):
+        s1 = _window_diff(self._cs_d, window, self.n)
+        s2 = _window_diff(self._cs_d2, window, self.n)
+        var = np.maximum((s2 - s1 * s1 / window) / (window - ddof), 0.0)
+        if self._has_nan:
+            var = np.where(self._full(window), var, np.nan)
+        if window <= self.n:
+            var = np.where(self._same_run() >= window, 0.0, var)
+        return self._restore(var)
+
+    def std(self, window, ddof=1):
+        return np.sqrt(self.var(window, ddof))
+
+
+def rolling_sum(x, window):
+    return PrefixStats(x).sum(window)
+
+
+def rolling_mean(x, window):
+    return PrefixStats(x).mean(window)
+
+
+def rolling_std(x, window, ddof=1):
+    return PrefixStats(x).std(window, ddof)
+
+
+def _block_scan(arr, window, op):
+    """
+    van Herk / Gil-Werman: split rows into blocks of ``window``; a window ending
+    at row i is covered by the suffix of one block (from i-window+1) and the
+    prefix of the next (up to i). ``op`` propagates NaN.
+    """
+    n, m = arr.shape
+    out = np.full((n, m), np.nan)
+    if window > n:
+        return out
+    if window == 1:
+        return arr.copy()
+    blocks = -(-n // window)
+    padded = np.full((blocks * window, m), np.nan)
+    padded[:n] = arr
+    b = padded.reshape(blocks, window, m)
+    prefix = op.accumulate(b, axis=1).reshape(-1, m)
+    suffix = op.accumulate(b[:, ::-1], axis=1)[:, ::-1].reshape(-1, m)
+    out[window - 1:] = op(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+
+def rolling_max(x, window):
+    arr, restore = _as_2d(x)
+    return restore(_block_scan(arr, window, np.maximum))
+
+
+def rolling_min(x, window):
+    arr, restore = _as_2d(x)
+    return restore(_block_scan(arr, window, np.minimum))
+
+
+def rolling_argmax(x, window):
+    """
+    Position of the maximum inside each window, like
+    ``rolling(window).apply(np.argmax)``: 0 is the oldest bar, window-1 today,
+    ties resolve to the oldest bar. ``window - 1 - result`` is bars since the high.
+    """
+    arr, restore = _as_2d(x)
+    n, m = arr.shape
+    valid = ~np.isnan(arr)
+    rows = np.arange(n)[:, None]
+
+    # Dense rank of each value within its column (equal values share a rank)
+    filled = np.where(valid, arr, -np.inf)
+    order = np.argsort(filled, axis=0, kind='stable')
+    sorted_vals = np.take_along_axis(filled, order, axis=0)
+    dense = np.zeros((n, m), dtype=np.int64)
+    dense[1:] = np.cumsum(sorted_vals[1:] != sorted_vals[:-1], axis=0)
+    rank = np.empty_like(dense)
+    np.put_along_axis(rank, order, dense, axis=0)
+
+    # Key = rank * n + (n - 1 - row): the larger value wins, then the earlier row
+    key = (rank * n + (n - 1 - rows)).astype(np.float64)
+    best = _block_scan(key, window, np.maximum)
+    best_row = (n - 1) - np.mod(np.nan_to_num(best), n)
+    full = _window_counts(valid, window) == window
+    return restore(np.where(full, best_row - (rows - window + 1), np.nan))
+
+
+def rolling_mad(x, window, chunk=512):
+    """
+    Rolling mean absolute deviation, same as
+    ``rolling(window).apply(lambda w: np.mean(np.abs(w - np.mean(w))))``.
+
+    Windows are made contiguous (in column chunks to bound memory), so each
+    mean uses the same summation as np.mean on a 1-D window.
+    """
+    arr, restore = _as_2d(x)
+    out = np.full_like(arr, np.nan)
+    if window <= arr.shape[0]:
+        for j in range(0, arr.shape[1], chunk):
+            win = np.ascontiguousarray(
+                np.lib.stride_tricks.sliding_window_view(arr[:, j:j + chunk], window, axis=0))
+            mean = win.mean(axis=-1, keepdims=True)
+            out[window - 1:, j:j + chunk] = np.abs(win - mean).mean(axis=-1)
+    return restore(out)
+
+
+def ewm_mean(x, alpha):
+    """
+    EWM mean matching pandas ``ewm(alpha=..., adjust=False).mean()`` including
+    its NaN handling (ignore_na=False): the weight of the last value keeps
+    decaying across missing rows and NaN input rows repeat the last value.
+    Loops over rows, vectorized across columns.
+    """
+    arr, restore = _as_2d(x)
+    n, m = arr.shape
+    out = np.empty_like(arr)
+    if n == 0:
+        return restore(out)
+    weighted = arr[0].copy()
+    old_wt = np.ones(m)
+    out[0] = weighted
+    with np.errstate(invalid='ignore'):
+        for i in range(1, n):
+            cur = arr[i]
+            obs = ~np.isnan(cur)
+            started = ~np.isnan(weighted)
+            old_wt = np.where(started, old_wt * (1 - alpha), old_wt)
+            update = started & obs & (weighted != cur)
+            new = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            weighted = np.where(update, new, weighted)
+            old_wt = np.where(started & obs, 1.0, old_wt)
+            weighted = np.where(~started & obs, cur, weighted)
+            out[i] = weighted
+    return restore(out)
+
+
+def span_alpha(span):
+    return 2.0 / (span + 1.0)
+
+
+def shift(x, n=1):
+    """Shift down by n rows (NaN-filled), like Series.shift(n)."""
+    arr, restore = _as_2d(x)
+    out = np.full_like(arr, np.nan)
+    if n < arr.shape[0]:
+        out[n:] = arr[:-n]
+    return restore(out)
+
+
+def ffill(x):
+    """Forward fill of NaN along axis 0."""
+    arr, restore = _as_2d(x)
+    idx = np.where(~np.isnan(arr), np.arange(arr.shape[0])[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return restore(np.take_along_axis(arr, idx, axis=0))
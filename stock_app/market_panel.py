@@ -0,0 +1,265 @@
+"""
+Memory-mapped whole-market OHLCV panel.
+
+The panel is a single date-aligned array of shape (stocks × trading days × fields)
+stored as a raw ``np.memmap`` file next to a small JSON metadata file:
+
+    stock_app/data/panel/panel-<build id>.dat
+    stock_app/data/panel/panel_meta.json
+
+Every build writes a new data file and records its name in the metadata, so a
+rebuild is published by swapping the metadata file alone: a reader either sees
+the old metadata with the old data file or the new pair, never a mix. The
+previous build's data file is kept for readers that are just opening it.
+
+Days on which a stock has no bar (not yet listed, suspended, delisted) hold NaN.
+Reading the whole universe is one ``mmap`` instead of thousands of file opens,
+and every process that opens the panel read-only shares the same pages through
+the OS page cache.
+
+Build (or rebuild after a download) with:
+
+    python stock_app/market_panel.py [--compact]
+
+``--compact`` also writes the int-tick copy used by DataLoader.get_panel(compact=True).
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PANEL_DIR = "stock_app/data/panel"
+PANEL_FIELDS = ['open', 'high', 'low', 'close', 'volume', 'amount']
+
+DATA_FILE = "panel.dat"          # data file of panels built before versioned names
+DATA_PREFIX = "panel-"
+META_FILE = "panel_meta.json"
+
+
+class PanelView:
+    """
+    A date/field window onto a MarketPanel.
+
+    ``view[field]`` returns a (stocks × days) array that is a view into the
+    memmap, not a copy.
+    """
+
+    def __init__(self, data, codes, dates, fields):
+        self._data = data          # (stocks, days, all_fields) slice of the memmap
+        self.codes = codes
+        self.dates = dates         # pd.DatetimeIndex
+        self.fields = fields
+        self._field_pos = {f: i for i, f in enumerate(fields)}
+
+    def __getitem__(self, field):
+        return self._data[:, :, self._field_pos[field]]
+
+    def __contains__(self, field):
+        return field in self._field_pos
+
+    @property
+    def shape(self):
+        return (len(self.codes), len(self.dates), len(self.fields))
+
+    def code_index(self, code):
+        return self.codes.index(code)
+
+    def to_frame(self, code):
+        """Per-stock DataFrame in the same layout as DataLoader.get_k_data (NaN days dropped)."""
+        return self.frame(self.code_index(code))
+
+    def frame(self, i):
+        """to_frame() of the stock at row ``i``."""
+        df = pd.DataFrame({f: self[f][i] for f in self.fields})
+        df.insert(0, 'date', self.dates)
+        if 'close' in df.columns:
+            df = df[df['close'].notna()]
+        # Fields the source never provided (e.g. Tencent has no amount) stay absent
+        df = df.dropna(axis=1, how='all')
+        return df.reset_index(drop=True)
+
+
+class MarketPanel:
+    """Read-only handle on a prebuilt panel."""
+
+    def __init__(self, panel_dir=DEFAULT_PANEL_DIR):
+        self.panel_dir = panel_dir
+        meta_path = os.path.join(panel_dir, META_FILE)
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+        self.codes = self.meta['codes']
+        self.fields = self.meta['fields']
+        self.dates = pd.DatetimeIndex(pd.to_datetime(self.meta['dates']))
+        data_path = os.path.join(panel_dir, self.meta.get('data_file', DATA_FILE))
+        shape = tuple(self.meta['shape'])
+        dtype = np.dtype(self.meta['dtype'])
+        # A data file that does not match the metadata would map stocks and days onto the wrong cells
+        expected = int(np.prod(shape)) * dtype.itemsize
+        if os.path.getsize(data_path) != expected:
+            raise ValueError(f"Panel data file {data_path} has {os.path.getsize(data_path)} bytes, "
+                             f"metadata expects {expected}; rebuild the panel.")
+        self.data = np.memmap(data_path, dtype=dtype, mode='r', shape=shape)
+        self.mtime = os.path.getmtime(meta_path)
+        self._code_pos = {c: i for i, c in enumerate(self.codes)}
+
+    @staticmethod
+    def exists(panel_dir=DEFAULT_PANEL_DIR):
+        meta_path = os.path.join(panel_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            return False
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                data_file = json.load(f).get('data_file', DATA_FILE)
+        except (OSError, ValueError):
+            return False
+        return os.path.exists(os.path.join(panel_dir, data_file))
+
+    def is_stale(self):
+        """True if the panel was rebuilt on disk since this handle was opened."""
+        meta_path = os.path.join(self.panel_dir, META_FILE)
+        return not os.path.exists(meta_path) or os.path.getmtime(meta_path) != self.mtime
+
+    def view(self, start_date=None, end_date=None, fields=None, codes=None):
+        """
+        Window onto the panel.
+
+        :param fields: restrict the field lookup; data stays a view of the full field axis
+        :param codes: optional subset of codes (this makes a copy, the stock axis is fancy-indexed)
+        """
+        d0 = 0 if start_date is None else int(self.dates.searchsorted(pd.Timestamp(start_date), side='left'))
+        d1 = len(self.dates) if end_date is None else int(self.dates.searchsorted(pd.Timestamp(end_date), side='right'))
+
+        data = self.data[:, d0:d1, :]
+        view_codes = list(self.codes)
+        if codes is not None:
+            idx = [self._code_pos[c] for c in codes if c in self._code_pos]
+            data = data[idx]
+            view_codes = [self.codes[i] for i in idx]
+
+        view = PanelView(data, view_codes, self.dates[d0:d1], self.fields)
+        if fields is not None:
+            missing = [f for f in fields if f not in view]
+            if missing:
+                raise KeyError(f"Fields not in panel: {missing}")
+        return view
+
+    @staticmethod
+    def build(loader, panel_dir=DEFAULT_PANEL_DIR, start_date=None, end_date=None,
+              fields=None, codes=None, progress_callback=None, compact=False):
+        """
+        Build the panel from the per-stock warehouse.
+
+        :param loader: DataLoader used to read each stock
+        :param start_date: first day to include (default: 600 calendar days ago)
+        :param end_date: last day to include (default: today)
+        :param codes: stock codes (default: the loader's stock list)
+        :param progress_callback: callback(current, total, code)
+        :param compact: also write the integer-coded copy (compact_panel) to <panel_dir>/compact
+        :return: MarketPanel opened on the new files
+        """
+        fields = list(fields or PANEL_FIELDS)
+        if end_date is None:
+            end_date = datetime.now().strftime("%Y-%m-%d")
+        if start_date is None:
+            start_date = (datetime.now() - pd.Timedelta(days=600)).strftime("%Y-%m-%d")
+        if codes is None:
+            codes = loader.get_stock_list()['code'].astype(str).tolist()
+
+        # 1. Load every stock once and collect the trading calendar
+        frames = {}
+        total = len(codes)
+        for idx, code in enumerate(codes):
+            if progress_callback:
+                progress_callback(idx + 1, total, code)
+            df = loader.get_k_data(code, start_date, end_date)
+            if df.empty:
+                continue
+            frames[code] = df.drop_duplicates('date').set_index('date')
+
+        if not frames:
+            raise ValueError(f"No K-line data found for {start_date} - {end_date}")
+        all_dates = pd.DatetimeIndex(sorted(set().union(*[f.index for f in frames.values()])))
+        panel_codes = [c for c in codes if c in frames]
+
+        # 2. Fill a fresh memmap under this build's own name
+        os.makedirs(panel_dir, exist_ok=True)
+        shape = (len(panel_codes), len(all_dates), len(fields))
+        data_file = f"{DATA_PREFIX}{time.time_ns()}.dat"
+        tmp_data = os.path.join(panel_dir, data_file + ".tmp")
+        data = np.memmap(tmp_data, dtype='float64', mode='w+', shape=shape)
+
+        for i, code in enumerate(panel_codes):
+            df = frames[code].reindex(all_dates)
+            for j, field in enumerate(fields):
+                if field in df.columns:
+                    data[i, :, j] = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype='float64')
+                else:
+                    data[i, :, j] = np.nan
+        data.flush()
+        del data
+        os.replace(tmp_data, os.path.join(panel_dir, data_file))
+
+        # 3. Publish: the metadata swap is the only step readers can observe
+        previous = None
+        if MarketPanel.exists(panel_dir):
+            with open(os.path.join(panel_dir, META_FILE), 'r', encoding='utf-8') as f:
+                previous = json.load(f).get('data_file', DATA_FILE)
+        meta = {
+            "panel_version": "1.1",
+            "build_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "data_file": data_file,
+            "dtype": "float64",
+            "shape": list(shape),
+            "codes": panel_codes,
+            "dates": [d.strftime("%Y-%m-%d") for d in all_dates],
+            "fields": fields,
+        }
+        tmp_meta = os.path.join(panel_dir, META_FILE + ".tmp")
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_meta, os.path.join(panel_dir, META_FILE))
+        MarketPanel._remove_old_data(panel_dir, keep={data_file, previous})
+
+        panel = MarketPanel(panel_dir)
+        if compact:
+            from compact_panel import CompactPanel, COMPACT_DIR
+            CompactPanel.from_view(panel.view()).save(os.path.join(panel_dir, COMPACT_DIR))
+        return panel
+
+
+    @staticmethod
+    def _remove_old_data(panel_dir, keep):
+        """Delete data files of builds before ``keep`` (open memmaps of them stay valid on POSIX)."""
+        for name in os.listdir(panel_dir):
+            if name in keep or not (name == DATA_FILE or (name.startswith(DATA_PREFIX) and name.endswith(".dat"))):
+                continue
+            try:
+                os.remove(os.path.join(panel_dir, name))
+            except OSError:
+                # Still mapped by a reader on Windows: removed by a later build
+                pass
+
+
+def main():
+    from data_loader import DataLoader
+
+    print(">>> 构建全市场内存映射面板 (Market Panel) <<<")
+    start_time = time.time()
+
+    def progress(current, total, code):
+        if current % 500 == 0 or current == total:
+            print(f"Progress: {current}/{total}")
+
+    panel = MarketPanel.build(DataLoader(), progress_callback=progress, compact='--compact' in sys.argv)
+    print(f"完成: {len(panel.codes)} 只股票 × {len(panel.dates)} 个交易日 × {len(panel.fields)} 个字段 "
+          f"(耗时 {time.time() - start_time:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Unified, hedged K-line fetch layer over several data sources.
+
+Every source returns bars in the same schema (BAR_SCHEMA, volume in lots/手,
+amount in 元, forward-adjusted prices). Each source keeps a health record of
+recent latencies and an error-rate EWMA. A fetch goes to the healthiest source
+first; if it has not answered within that source's latency percentile
+(``hedge_percentile``), or fails, the same request is sent to the next source
+and the first good answer wins. This trims the slow tail that dominates a
+full-market refresh.
+
+An empty answer is "no data" (suspended, delisted, not yet listed), not a
+source failure: it leaves the source's health alone and is returned as an
+empty frame unless a request already in flight brings bars.
+
+A source is any object with a ``name`` attribute and a
+``fetch(code, start_date, end_date) -> DataFrame`` method, so local stub
+sources can be plugged in for testing.
+"""
+
+import concurrent.futures
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+BAR_SCHEMA = ['date', 'open', 'high', 'low', 'close', 'volume', 'amount', 'turn']
+
+
+def normalize_bars(df, start_date=None, end_date=None):
+    """Coerce a source frame to BAR_SCHEMA, sorted by date and clipped to the range."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=BAR_SCHEMA)
+    df = df.reindex(columns=BAR_SCHEMA).copy()
+    df['date'] = pd.to_datetime(df['date'])
+    for col in BAR_SCHEMA[1:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.dropna(subset=['close']).drop_duplicates('date').sort_values('date')
+    if start_date is not None:
+        df = df[df['date'] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        df = df[df['date'] <= pd.Timestamp(end_date)]
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    return df.reset_index(drop=True)
+
+
+class TencentSource:
+    """web.ifzq.gtimg.cn fqkline (no amount/turn)."""
+
+    name = "tencent"
+
+    def fetch(self, code, start_date, end_date):
+        from download_data_tencent import get_tencent_symbol, fetch_kline_tencent
+
+        symbol = get_tencent_symbol(code)
+        if symbol is None:
+            raise ValueError(f"{code} not supported by Tencent")
+        count = int(np.busday_count(pd.Timestamp(start_date).date(), pd.Timestamp.now().date())) + 5
+        return normalize_bars(fetch_kline_tencent(symbol, max(count, 1)), start_date, end_date)
+
+
+class AkshareSource:
+    """akshare stock_zh_a_hist (Eastmoney), qfq."""
+
+    name = "akshare"
+
+    RENAME = {
+        "日期": "date", "开盘": "open", "最高": "high", "最低": "low", "收盘": "close",
+        "成交量": "volume", "成交额": "amount", "换手率": "turn"
+    }
+
+    def fetch(self, code, start_date, end_date):
+        import akshare as ak
+
+        df = ak.stock_zh_a_hist(symbol=code, period="daily",
+                                start_date=pd.Timestamp(start_date).strftime("%Y%m%d"),
+                                end_date=pd.Timestamp(end_date).strftime("%Y%m%d"), adjust="qfq")
+        return normalize_bars(df.rename(columns=self.RENAME), start_date, end_date)
+
+
+class BaostockSource:
+    """Baostock query_history_k_data_plus, qfq (adjustflag=2). Volume is converted from 股 to 手."""
+
+    name = "baostock"
+
+    # Baostock keeps one socket per process, calls must not interleave
+    _lock = threading.Lock()
+    _logged_in = False
+
+    def fetch(self, code, start_date, end_date):
+        import baostock as bs
+
+        prefix = "sh" if code.startswith('6') else "sz"
+        with BaostockSource._lock:
+            if not BaostockSource._logged_in:
+                lg = bs.login()
+                if lg.error_code != '0':
+                    raise IOError(f"Baostock login failed: {lg.error_msg}")
+                BaostockSource._logged_in = True
+            rs = bs.query_history_k_data_plus(
+                f"{prefix}.{code}", "date,open,high,low,close,volume,amount,turn",
+                start_date=pd.Timestamp(start_date).strftime("%Y-%m-%d"),
+                end_date=pd.Timestamp(end_date).strftime("%Y-%m-%d"),
+                frequency="d", adjustflag="2")
+            if rs.error_code != '0':
+                raise IOError(f"Baostock query failed: {rs.error_msg}")
+            rows = []
+            while rs.next():
+                rows.append(rs.get_row_data())
+
+        df = normalize_bars(pd.DataFrame(rows, columns=rs.fields), start_date, end_date)
+        df['volume'] = df['volume'] / 100
+        return df
+
+
+class SourceHealth:
+    """Rolling latency samples and error-rate EWMA for one source."""
+
+    def __init__(self, window=100, decay=0.1):
+        self.latencies = deque(maxlen=window)
+        self.error_rate = 0.0
+        self.decay = decay
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            if ok:
+                self.latencies.append(latency)
+            self.error_rate = (1 - self.decay) * self.error_rate + self.decay * (0.0 if ok else 1.0)
+
+    def percentile(self, p, default=1.0):
+        with self._lock:
+            if not self.latencies:
+                return default
+            return float(np.percentile(self.latencies, p * 100))
+
+    def score(self):
+        """Lower is better: median latency inflated by the error rate."""
+        return self.percentile(0.5) * (1 + 5 * self.error_rate)
+
+
+class HedgedFetcher:
+    """Send each request to the best source, hedge to the next one on slowness or failure."""
+
+    def __init__(self, sources, hedge_percentile=0.9, min_hedge_delay=0.2, max_workers=16):
+        self.sources = list(sources)
+        self.health = {s.name: SourceHealth() for s in self.sources}
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.stats = {'requests': 0, 'hedged': 0, 'failed': 0, 'no_data': 0, 'wins': {s.name: 0 for s in self.sources}}
+
+    def ranked_sources(self):
+        return sorted(self.sources, key=lambda s: self.health[s.name].score())
+
+    def _timed_fetch(self, source, code, start_date, end_date):
+        t0 = time.monotonic()
+        try:
+            df = source.fetch(code, start_date, end_date)
+        except Exception:
+            # Transport failures and timeouts are what health tracks
+            self.health[source.name].record(time.monotonic() - t0, False)
+            raise
+        # The source answered; an empty frame is the symbol's problem, not the source's
+        self.health[source.name].record(time.monotonic() - t0, True)
+        return df if df is not None else pd.DataFrame(columns=BAR_SCHEMA)
+
+    def fetch(self, code, start_date, end_date):
+        """
+        Fetch bars for ``code`` from whichever source answers first.
+
+        :return: (DataFrame in BAR_SCHEMA, source name); the frame is empty when the
+                 sources answered with no data
+        :raises IOError: if every source failed
+        """
+        self.stats['requests'] += 1
+        queue = self.ranked_sources()
+        pending = {}
+        errors = []
+        no_data = None
+
+        def launch():
+            source = queue.pop(0)
+            future = self._executor.submit(self._timed_fetch, source, code, start_date, end_date)
+            pending[future] = source
+            return source
+
+        primary = launch()
+        hedge_delay = max(self.min_hedge_delay, self.health[primary.name].percentile(self.hedge_percentile))
+
+        while pending:
+            timeout = hedge_delay if queue else None
+            done, _ = concurrent.futures.wait(pending, timeout=timeout,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                # Slow tail: hedge with the next source, keep the first one running
+                self.stats['hedged'] += 1
+                launch()
+                continue
+
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    df = future.result()
+                except Exception as e:
+                    errors.append(f"{source.name}: {e}")
+                    if queue and not pending:
+                        launch()
+                    continue
+                if df.empty:
+                    # No data: only wait for requests already in flight, don't launch more
+                    no_data = no_data or source.name
+                    queue = []
+                    continue
+                self.stats['wins'][source.name] += 1
+                return normalize_bars(df, start_date, end_date), source.name
+
+        if no_data is not None:
+            self.stats['no_data'] += 1
+            return normalize_bars(None), no_data
+        self.stats['failed'] += 1
+        raise IOError(f"All sources failed for {code}: {'; '.join(errors)}")
+
+    def health_report(self):
+        return {name: {'p50': h.percentile(0.5), 'p90': h.percentile(0.9),
+                       'error_rate': round(h.error_rate, 3), 'samples': len(h.latencies)}
+                for name, h in self.health.items()}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,261 @@
+"""
+Cross-sectional indicator engine over 2-D (days × stocks) arrays.
+
+Computes the Indicators.add_all_indicators column set for the whole market in
+one pass of column-wise numpy kernels, instead of ~50 small pandas operations
+per stock.
+
+Each stock's valid bars (close not NaN) are first compacted to the bottom of its
+column, so rolling windows and EWMs run over that stock's own trading bars
+exactly like the per-stock DataFrame path (suspension days are absent rows
+there, not NaN rows). Results are scattered back to the panel dates; days on
+which a stock has no bar are NaN (False for the boolean columns).
+
+The screening signals of panel_strategies.PanelStrategies are built on these
+columns, so every screening scan on the panel (scan_engine.scan_cube) runs
+through this engine.
+
+    from data_loader import DataLoader
+    from panel_indicators import PanelIndicators
+
+    view = DataLoader().get_panel(start_date="2023-01-01")
+    ind = PanelIndicators.from_view(view)
+    ind['MA20']            # (days × stocks)
+
+    python stock_app/panel_indicators.py      # parity check against add_all_indicators
+"""
+
+import numpy as np
+import pandas as pd
+
+import jit_kernels
+from kernels import PrefixStats, rolling_sum, rolling_mean, rolling_max, rolling_min, rolling_mad, \
+    ewm_mean, span_alpha, shift
+
+BOOL_COLUMNS = ('RKing_BU', 'RKing_SEL')
+
+
+class PanelIndicators:
+    """Whole-market (days × stocks) version of Indicators.add_all_indicators."""
+
+    @staticmethod
+    def from_view(view, columns=None):
+        """Compute indicators from a market_panel.PanelView (stocks × days per field)."""
+        fields = {f: np.asarray(view[f], dtype=np.float64).T for f in view.fields}
+        return PanelIndicators.compute(fields, columns=columns)
+
+    @staticmethod
+    def compute(fields, columns=None):
+        """
+        :param fields: dict of (days × stocks) arrays with at least open/high/low/close/volume,
+                       optionally amount; NaN marks days without a bar
+        :param columns: optional subset of indicator names to return (every column for the
+                        whole market is ~60 days × stocks float64 arrays)
+        :return: dict column name -> (days × stocks) array, same columns as add_all_indicators
+        """
+        order, valid, compacted = PanelIndicators.compact(fields)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            res = PanelIndicators._compute_compact(compacted)
+        if columns is not None:
+            res = {name: res[name] for name in columns}
+        return {name: PanelIndicators.scatter(arr, order, valid) for name, arr in res.items()}
+
+    @staticmethod
+    def compact(fields):
+        """
+        Move each stock's valid bars (close not NaN) to the bottom of its column.
+
+        :return: (order, valid, compacted fields); ``order`` feeds scatter()
+        """
+        close = np.asarray(fields['close'], dtype=np.float64)
+        valid = ~np.isnan(close)
+        # Valid rows last, original order kept: each column becomes [padding..., bars...]
+        order = np.argsort(valid, axis=0, kind='stable')
+
+        def compact(a):
+            return np.take_along_axis(np.asarray(a, dtype=np.float64), order, axis=0)
+
+        return order, valid, {f: compact(fields[f]) for f in fields}
+
+    @staticmethod
+    def scatter(arr, order, valid):
+        """Back from compact rows to panel dates: NaN (False for booleans) where there is no bar."""
+        scattered = np.empty_like(arr)
+        np.put_along_axis(scattered, order, arr, axis=0)
+        if scattered.dtype == bool:
+            return scattered & valid
+        return np.where(valid, scattered, np.nan)
+
+    @staticmethod
+    def _compute_compact(f):
+        o, h, l, c, v = f['open'], f['high'], f['low'], f['close'], f['volume']
+        res = {}
+
+        # Basic MAs (one set of prefix sums of close serves every MA/Std window)
+        close_stats = PrefixStats(c)
+        res['MA5'] = close_stats.mean(5)
+        res['MA20'] = close_stats.mean(20)
+        res['MA250'] = close_stats.mean(250)
+        res['Vol_MA20'] = rolling_mean(v, 20)
+
+        # MACD
+        dif = ewm_mean(c, span_alpha(12)) - ewm_mean(c, span_alpha(26))
+        res['DIF'] = dif
+        res['DEA'] = ewm_mean(dif, span_alpha(9))
+        res['MACD_Hist'] = 2 * (dif - res['DEA'])
+
+        # Bollinger Bands (N=20, k=2)
+        std20 = close_stats.std(20)
+        res['Boll_Mid'] = res['MA20']
+        res['Boll_Upper'] = res['MA20'] + 2 * std20
+        res['Boll_Lower'] = res['MA20'] - 2 * std20
+
+        # RSI
+        res['RSI2'] = PanelIndicators.rsi(c, 2)
+        res['RSI6'] = PanelIndicators.rsi(c, 6)
+
+        # CYC
+        if 'amount' in f:
+            a = f['amount']
+            vol_s = np.where(v == 0, np.nan, v)
+            res['CYC_13'] = rolling_sum(a, 13) / rolling_sum(vol_s, 13)
+            # Series.cumsum skips NaN but keeps it in place
+            cum_a = np.where(np.isnan(a), np.nan, np.nancumsum(a, axis=0))
+            cum_v = np.where(np.isnan(vol_s), np.nan, np.nancumsum(vol_s, axis=0))
+            res['CYC_Inf'] = cum_a / cum_v
+        else:
+            res['CYC_13'] = np.full_like(c, np.nan)
+            res['CYC_Inf'] = np.full_like(c, np.nan)
+
+        res['Ret_20'] = c / shift(c, 20) - 1
+
+        # Min/Max for strategies
+        res['High_52'] = rolling_max(h, 250)
+        res['Max_Vol_250'] = rolling_max(v, 250)
+        res['Low_20'] = rolling_min(l, 20)
+
+        res.update(PanelIndicators.rking(o, h, l, c))
+
+        # EMA for HPS / Trend
+        res['EMA15'] = ewm_mean(c, span_alpha(15))
+        res['EMA_High_15'] = ewm_mean(h, span_alpha(15))
+        res['EMA200'] = ewm_mean(c, span_alpha(200))
+
+        res['MACD_Hist_MA5'] = rolling_mean(res['MACD_Hist'], 5)
+
+        # Volatility for ES
+        res['Std20'] = std20
+        res['Std60'] = close_stats.std(60)
+        res['Std120'] = close_stats.std(120)
+
+        # Pinbar features (DataFrame.max/min(axis=1) skip NaN)
+        res['Body'] = np.abs(o - c)
+        res['Upper_Shadow'] = h - np.fmax(o, c)
+        res['Lower_Shadow'] = np.fmin(o, c) - l
+        res['Range'] = h - l
+
+        # KDJ (9,3,3)
+        low9, high9 = rolling_min(l, 9), rolling_max(h, 9)
+        rsv = (c - low9) / (high9 - low9) * 100
+        res['K'] = ewm_mean(rsv, 1.0 / 3)
+        res['D'] = ewm_mean(res['K'], 1.0 / 3)
+        res['J'] = 3 * res['K'] - 2 * res['D']
+
+        # Williams %R (14)
+        low14, high14 = rolling_min(l, 14), rolling_max(h, 14)
+        res['WR'] = (high14 - c) / (high14 - low14) * -100
+
+        # CCI (14)
+        tp = (h + l + c) / 3
+        res['CCI'] = (tp - rolling_mean(tp, 14)) / (0.015 * rolling_mad(tp, 14))
+
+        return res
+
+    @staticmethod
+    def rsi(c, period):
+        delta = c - shift(c)
+        # Series.where(cond, 0) turns the first (NaN) delta into 0; compaction padding stays NaN
+        pad = np.isnan(c)
+        gain = rolling_mean(np.where(pad, np.nan, np.where(delta > 0, delta, 0.0)), period)
+        loss = rolling_mean(np.where(pad, np.nan, np.where(delta < 0, -delta, 0.0)), period)
+        return 100 - (100 / (1 + gain / loss))
+
+    @staticmethod
+    def rking(o, h, l, c):
+        res = {}
+        res['Ref_Open'] = shift(o)
+        res['Ref_Close'] = shift(c)
+        xopen = (res['Ref_Open'] + res['Ref_Close']) / 2
+        res['XOpen'] = xopen
+        res['XClose'] = c
+        res['XHigh'] = np.fmax(h, xopen)
+        res['XLow'] = np.fmin(l, xopen)
+        res['RKing_Vol'] = rolling_mean(res['XHigh'] - res['XLow'], 8)
+
+        ma5 = rolling_mean(c, 5)
+        upper = ma5 + res['RKing_Vol'] / 2
+        lower = ma5 - res['RKing_Vol'] / 2
+        res['RKing_Upper'] = upper
+        res['RKing_Lower'] = lower
+
+        prev_close, prev_upper, prev_lower = shift(c), shift(upper), shift(lower)
+        bu = (c > upper) & (prev_close <= prev_upper)
+        sel = (lower > c) & (prev_lower <= prev_close)
+        res['RKing_BU'] = bu
+        res['RKing_SEL'] = sel
+        res['Signal_State'] = np.select([bu, sel], [1.0, -1.0], default=np.nan)
+        res['RKing_State'] = jit_kernels.rking_state(bu, sel)
+        return res
+
+    @staticmethod
+    def to_frame(result, dates, j):
+        """Indicator columns of stock ``j`` as a DataFrame (rows without a bar dropped)."""
+        df = pd.DataFrame({name: arr[:, j] for name, arr in result.items()})
+        df.insert(0, 'date', pd.DatetimeIndex(dates))
+        return df[~np.isnan(result['XClose'][:, j])].reset_index(drop=True)
+
+
+def compare_with_frames(view, result, codes=None, rtol=1e-8, atol=1e-8):
+    """
+    Rows per column where the panel result differs from Indicators.add_all_indicators
+    run on each stock's own frame (NaN/inf positions must match exactly).
+
+    :return: {column: mismatched row count}, empty when equivalent
+    """
+    from indicators import Indicators
+
+    codes = codes or view.codes[:50]
+    mismatches = {}
+    for code in codes:
+        ref = Indicators.add_all_indicators(view.to_frame(code))
+        got = PanelIndicators.to_frame(result, view.dates, view.code_index(code))
+        for name in result:
+            if name not in ref.columns:
+                continue
+            a = ref[name].to_numpy(dtype=np.float64)
+            b = got[name].to_numpy(dtype=np.float64)
+            same = (a == b) | (np.isnan(a) & np.isnan(b))
+            with np.errstate(invalid='ignore'):
+                same |= np.isfinite(a) & np.isfinite(b) & np.isclose(a, b, rtol=rtol, atol=atol)
+            if not same.all():
+                mismatches[name] = mismatches.get(name, 0) + int((~same).sum())
+    return mismatches
+
+
+def main():
+    import time
+    from data_loader import DataLoader
+
+    view = DataLoader().get_panel()
+    if view is None:
+        return
+    t0 = time.time()
+    result = PanelIndicators.from_view(view)
+    print(f"{len(result)} indicators for {len(view.codes)} stocks × {len(view.dates)} days "
+          f"in {time.time() - t0:.2f}s")
+    mismatches = compare_with_frames(view, result)
+    print("Parity with add_all_indicators:", "OK" if not mismatches else mismatches)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Whole-market evaluation of Strategies.check_all into a bit-packed signal cube.
+
+PanelStrategies evaluates the screening signals for every stock in one pass of
+2-D (days × stocks) numpy operations on top of PanelIndicators, instead of one
+pandas check_all per stock. Rolling windows and shifts run on each stock's own
+compacted bars (see PanelIndicators.compact), so results match the per-stock
+DataFrame path exactly.
+
+The result is a SignalCube: (signals × days × stocks) booleans packed with
+np.packbits along the stock axis (8 stocks per byte, 1/8 of a bool array).
+AND/OR combinations over a scan window are then a few bitwise reductions over
+the whole market:
+
+    from data_loader import DataLoader
+    from panel_strategies import SignalCube
+
+    view = DataLoader().get_panel(start_date="2023-01-01")
+    cube = SignalCube.from_view(view)
+    hits = cube.hits(['Signal_Limit', 'Signal_Pinbar'], start="2024-05-01")   # (stocks,) bool
+    rows = cube.scan(['Signal_Limit', 'Signal_Pinbar'], start="2024-05-01", close=view['close'])
+
+    python stock_app/panel_strategies.py      # parity check against Strategies.check_all
+"""
+
+import numpy as np
+import pandas as pd
+
+import strategy_registry
+from kernels import rolling_sum, rolling_max, rolling_min, shift
+from panel_indicators import PanelIndicators
+
+SIGNALS = [spec.signal for spec in strategy_registry.for_family('screen')]
+
+
+def _prev(cond):
+    """Boolean shift(1): False on a stock's first bar, like ``bool_series.shift(1) & ...``."""
+    return shift(cond.astype(np.float64)) == 1
+
+
+def _count(cond, pad, window):
+    """rolling(window).sum() of a boolean column; NaN until the stock has ``window`` bars."""
+    return rolling_sum(np.where(pad, np.nan, cond), window)
+
+
+class PanelStrategies:
+    """Whole-market (days × stocks) version of Strategies.check_all."""
+
+    @staticmethod
+    def compute(fields, dates, selected=None):
+        """
+        :param fields: dict of (days × stocks) arrays (open/high/low/close/volume[/amount]),
+                       NaN marks days without a bar
+        :param dates: panel dates (days,)
+        :param selected: optional list of signal columns, default every check_all signal
+        :return: dict signal -> (days × stocks) bool, False where there is no bar
+        """
+        selected = list(selected or SIGNALS)
+        order, valid, compacted = PanelIndicators.compact(fields)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ind = PanelIndicators._compute_compact(compacted)
+            ind.update(compacted)
+            pad = np.isnan(compacted['close'])
+            res = PanelStrategies._signals(ind, pad, selected)
+        out = {sig: PanelIndicators.scatter(res[sig], order, valid) for sig in selected if sig in res}
+        if 'Signal_TKOS' in selected:
+            # Calendar resample: computed on panel dates, not on compacted rows
+            out['Signal_TKOS'] = PanelStrategies._tkos(fields['close'], dates) & valid
+        return {sig: out[sig] for sig in selected}
+
+    @staticmethod
+    def _signals(d, pad, selected):
+        c, o, h, l, v = d['close'], d['open'], d['high'], d['low'], d['volume']
+        vol_ma20 = d['Vol_MA20']
+        res = {}
+
+        def want(sig):
+            return sig in selected
+
+        if want('Signal_Fighting'):
+            res['Signal_Fighting'] = (d['DIF'] > d['DEA']) & (c >= d['High_52']) & (c > d['MA20'])
+        if want('Signal_UA'):
+            res['Signal_UA'] = (c >= d['High_52']) & (v > vol_ma20 * 1.5)
+        if want('Signal_CYC_MAX'):
+            res['Signal_CYC_MAX'] = (c > d['CYC_Inf']) & (c > d['CYC_13'])
+        if want('Signal_RangeBreak'):
+            res['Signal_RangeBreak'] = c > shift(d['High_52'])
+        if want('Signal_20VMA'):
+            vol_below = _count(v < vol_ma20, pad, 5) >= 4
+            res['Signal_20VMA'] = _prev(vol_below) & (v > vol_ma20) & (c > o)
+        if want('Signal_Limit'):
+            res['Signal_Limit'] = v < (0.5 * vol_ma20)
+        if want('Signal_Boll_Rev'):
+            cross_mid = (c > d['Boll_Mid']) & (shift(c) <= shift(d['Boll_Mid']))
+            res['Signal_Boll_Rev'] = cross_mid & (h >= d['Boll_Upper'])
+        if want('Signal_RSI2_Rev'):
+            rsi_low = (d['RSI2'] < 10) & (shift(d['RSI2']) < 10)
+            res['Signal_RSI2_Rev'] = _prev(rsi_low) & (c > d['MA250'])
+        if want('Signal_2B') or want('Signal_Spring'):
+            prev_low = shift(rolling_min(l, 20))
+            res['Signal_2B'] = (l < prev_low) & (c > prev_low)
+            res['Signal_Spring'] = res['Signal_2B'] & (v < vol_ma20)
+        if want('Signal_HMC'):
+            res['Signal_HMC'] = (d['MACD_Hist'] > d['MACD_Hist_MA5']) & (d['MACD_Hist'] > 0)
+        if want('Signal_HPS'):
+            res['Signal_HPS'] = (c > d['EMA200']) & (c > d['EMA15'])
+        if want('Signal_Wyckoff'):
+            is_accumulation = _count(v < vol_ma20, pad, 60) > (60 * 0.7)
+            res['Signal_Wyckoff'] = is_accumulation & (c > shift(rolling_max(h, 20)))
+        if want('Signal_Pinbar'):
+            ls = d['Lower_Shadow']
+            res['Signal_Pinbar'] = (ls > 3 * d['Body']) & (ls > 0.6 * d['Range'])
+        if want('Signal_ES'):
+            std20 = d['Std20']
+            res['Signal_ES'] = (std20 < d['Std60']) & (std20 < d['Std120']) & (np.abs(d['Ret_20']) < 0.1)
+        if want('Signal_RKing'):
+            res['Signal_RKing'] = d['RKing_State'] == 1
+        return res
+
+    @staticmethod
+    def _tkos(close, dates):
+        # resample().last() skips NaN per column = each stock's last bar of the month,
+        # the same value its own frame's resample gives
+        frame = pd.DataFrame(np.asarray(close, dtype=np.float64), index=pd.DatetimeIndex(dates))
+        monthly_ret = frame.resample('M').last().pct_change()
+        daily = (monthly_ret > 0.50).reindex(frame.index, method='ffill')
+        return daily.fillna(False).to_numpy(dtype=bool)
+
+
+class SignalCube:
+    """
+    (signals × days × stocks) booleans, bit-packed along the stock axis.
+
+    ``packed[s, t]`` holds the signal ``signals[s]`` on ``dates[t]`` for all
+    stocks, 8 per byte (np.packbits big-endian bit order).
+    """
+
+    def __init__(self, packed, signals, codes, dates):
+        self.packed = packed
+        self.signals = list(signals)
+        self.codes = list(codes)
+        self.dates = pd.DatetimeIndex(dates)
+        self._pos = {s: i for i, s in enumerate(self.signals)}
+
+    @staticmethod
+    def from_signals(signals, codes, dates):
+        """:param signals: dict signal -> (days × stocks) bool"""
+        names = list(signals)
+        packed = np.stack([np.packbits(signals[s], axis=1) for s in names])
+        return SignalCube(packed, names, codes, dates)
+
+    @staticmethod
+    def from_fields(fields, codes, dates, selected=None):
+        return SignalCube.from_signals(PanelStrategies.compute(fields, dates, selected), codes, dates)
+
+    @staticmethod
+    def from_view(view, selected=None):
+        """Evaluate a market_panel.PanelView (stocks × days per field)."""
+        fields = {f: np.asarray(view[f], dtype=np.float64).T for f in view.fields}
+        return SignalCube.from_fields(fields, view.codes, view.dates, selected)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def _unpack(self, packed):
+        return np.unpackbits(packed, axis=-1, count=len(self.codes)).astype(bool)
+
+    def mask(self, signal):
+        """(days × stocks) bool of one signal."""
+        return self._unpack(self.packed[self._pos[signal]])
+
+    def _window(self, start, end):
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side='left')
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side='right')
+        return slice(lo, hi)
+
+    def combine(self, signals, how='and', start=None, end=None):
+        """
+        Per-day combination of ``signals`` within [start, end], still packed.
+
+        :param how: 'and' (all signals on the same day) or 'or' (any of them)
+        :return: (days in window × packed stocks) uint8
+        """
+        op = np.bitwise_and if how == 'and' else np.bitwise_or
+        rows = self.packed[[self._pos[s] for s in signals], self._window(start, end)]
+        return op.reduce(rows, axis=0)
+
+    def hits(self, signals, how='and', start=None, end=None):
+        """(stocks,) bool: the combination held on at least one day of the window."""
+        daily = self.combine(signals, how, start, end)
+        return self._unpack(np.bitwise_or.reduce(daily, axis=0))
+
+    def last_hit(self, signals, how='and', start=None, end=None):
+        """(stocks,) index into ``dates`` of the newest day the combination held, -1 if none."""
+        window = self._window(start, end)
+        daily = self._unpack(self.combine(signals, how, start, end))
+        if daily.shape[0] == 0:
+            return np.full(len(self.codes), -1)
+        newest = daily.shape[0] - 1 - np.argmax(daily[::-1], axis=0)
+        return np.where(daily.any(axis=0), window.start + newest, -1)
+
+    def scan(self, signals, how='and', start=None, end=None, close=None, names=None, labels=None):
+        """
+        Result rows in the layout of scanner.scan_single_stock: one per stock whose
+        combination held in the window, dated at its newest hit.
+
+        :param close: optional (stocks × days) close, e.g. view['close'], for the Price column
+        :param names: optional {code: name}
+        :param labels: optional {signal: display name} for the Strategies column
+        """
+        last = self.last_hit(signals, how, start, end)
+        labels = labels or {s: strategy_registry.select_signals('screen', [s])[0].name for s in signals}
+        rows = []
+        for j in np.flatnonzero(last >= 0):
+            t = last[j]
+            triggered = [labels[s] for s in signals if self.packed[self._pos[s], t, j >> 3] >> (7 - (j & 7)) & 1]
+            code = self.codes[j]
+            rows.append({
+                "Code": code,
+                "Name": (names or {}).get(code, code),
+                "Price": float(close[j, t]) if close is not None else np.nan,
+                "Signal Date": self.dates[t].strftime("%Y-%m-%d"),
+                "Strategies": ", ".join(triggered),
+            })
+        return rows
+
+
+def compare_with_frames(view, cube, codes=None):
+    """
+    Rows per signal where the cube differs from Strategies.check_all run on each
+    stock's own frame.
+
+    :return: {signal: mismatched row count}, empty when equivalent
+    """
+    from indicators import Indicators
+    from strategies import Strategies
+
+    codes = codes or view.codes[:50]
+    mismatches = {}
+    for code in codes:
+        df = view.to_frame(code)
+        ref = Strategies.check_all(Indicators.add_all_indicators(df), cube.signals)
+        j = view.code_index(code)
+        rows = view.dates.get_indexer(pd.DatetimeIndex(df['date']))
+        for sig in cube.signals:
+            got = cube.mask(sig)[rows, j]
+            bad = int((ref[sig].to_numpy(dtype=bool) != got).sum())
+            if bad:
+                mismatches[sig] = mismatches.get(sig, 0) + bad
+    return mismatches
+
+
+def main():
+    import time
+    from data_loader import DataLoader
+
+    view = DataLoader().get_panel()
+    if view is None:
+        return
+    t0 = time.time()
+    cube = SignalCube.from_view(view)
+    print(f"{len(cube.signals)} signals for {len(view.codes)} stocks × {len(view.dates)} days "
+          f"in {time.time() - t0:.2f}s ({cube.nbytes / 2 ** 20:.1f} MB packed)")
+    mismatches = compare_with_frames(view, cube)
+    print("Parity with Strategies.check_all:", "OK" if not mismatches else mismatches)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Parameter-sweep indicator computation for strategy tuning.
+
+The strategies hard-code their windows (Z-score 20, Fighting 52, UA 250, RS
+Bollinger 20/2, Wyckoff 60/0.7). Instead of a full rescan per parameter value,
+the sweeps here compute every window length from structures built once:
+
+- means / standard deviations / rolling sums: one kernels.PrefixStats (prefix
+  sums of x and x²), then O(days) per window
+- N-day highs / lows: one sparse table of power-of-two window extrema
+  (log2(max window) levels); any window is the max/min of two overlapping
+  power-of-two windows, O(days) per window
+
+Input follows kernels: a Series, a 1-D array or a 2-D (days × stocks) array.
+Results are stacked as (params × days × stocks) ((params × days) for 1-D input),
+so a parameter grid costs roughly one pass. Memory is params × days × stocks ×
+8 bytes: sweep the whole market in stock chunks.
+
+    from param_sweep import ParamSweep
+    windows = range(5, 251)
+    ma = ParamSweep.mean(close, windows)          # (246 × days × stocks)
+    highs = ParamSweep.rolling_max(high, range(20, 251))
+
+    python stock_app/param_sweep.py      # parity with kernels + timing vs per-window loop
+"""
+
+import numpy as np
+
+import kernels
+
+
+def _as_2d(x):
+    arr = np.asarray(x, dtype=np.float64)
+    one_d = arr.ndim == 1
+    return (arr[:, None] if one_d else arr), one_d
+
+
+def _finish(stack, one_d):
+    return stack[:, :, 0] if one_d else stack
+
+
+class SparseExtrema:
+    """
+    Sparse table of trailing extrema: level k holds op over the 2^k bars ending
+    at each row. Windows of any length reuse the same levels.
+    """
+
+    def __init__(self, x, op, max_window):
+        arr, self._one_d = _as_2d(x)
+        self.n = arr.shape[0]
+        self.op = op
+        self.levels = [arr]
+        span = 1
+        while span * 2 <= max_window:
+            prev = self.levels[-1]
+            cur = np.full_like(prev, np.nan)
+            cur[span:] = op(prev[span:], prev[:-span])
+            self.levels.append(cur)
+            span *= 2
+
+    def window(self, window):
+        """op over the trailing ``window`` bars (NaN while incomplete or if it contains NaN)."""
+        k = int(window).bit_length() - 1
+        level = self.levels[k]
+        span = 1 << k
+        out = np.full_like(level, np.nan)
+        if window <= self.n:
+            # [i-window+1, i] = [i-span+1, i] ∪ [i-window+span, ...] (two power-of-two windows)
+            out[window - 1:] = self.op(level[window - 1:], level[span - 1:self.n - window + span])
+        return out
+
+
+class ParamSweep:
+    """Many window lengths of the same indicator in one pass."""
+
+    @staticmethod
+    def mean(x, windows):
+        arr, one_d = _as_2d(x)
+        stats = kernels.PrefixStats(arr)
+        return _finish(np.stack([stats.mean(w) for w in windows]), one_d)
+
+    @staticmethod
+    def std(x, windows, ddof=1):
+        arr, one_d = _as_2d(x)
+        stats = kernels.PrefixStats(arr)
+        return _finish(np.stack([stats.std(w, ddof) for w in windows]), one_d)
+
+    @staticmethod
+    def sum(x, windows):
+        arr, one_d = _as_2d(x)
+        stats = kernels.PrefixStats(arr)
+        return _finish(np.stack([stats.sum(w) for w in windows]), one_d)
+
+    @staticmethod
+    def rolling_max(x, windows):
+        windows = list(windows)
+        table = SparseExtrema(x, np.maximum, max(windows))
+        return _finish(np.stack([table.window(w) for w in windows]), table._one_d)
+
+    @staticmethod
+    def rolling_min(x, windows):
+        windows = list(windows)
+        table = SparseExtrema(x, np.minimum, max(windows))
+        return _finish(np.stack([table.window(w) for w in windows]), table._one_d)
+
+    # --- Strategy parameters ---
+
+    @staticmethod
+    def z_score(close, windows):
+        """(close - MA_N) / Std_N per window (StrongStrategies.calculate_z_score, period N)."""
+        arr, one_d = _as_2d(close)
+        stats = kernels.PrefixStats(arr)
+        out = []
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for w in windows:
+                std = stats.std(w)
+                out.append((arr - stats.mean(w)) / np.where(std == 0, np.nan, std))
+        return _finish(np.stack(out), one_d)
+
+    @staticmethod
+    def prior_high(high, windows):
+        """Highest high of the previous N bars (Fighting breakout level, period N)."""
+        highs = ParamSweep.rolling_max(high, windows)
+        out = np.full_like(highs, np.nan)
+        out[:, 1:] = highs[:, :-1]
+        return out
+
+    @staticmethod
+    def bollinger_upper(x, windows, ks):
+        """
+        Upper band MA_N + k·Std_N for every (N, k) pair (RS Bollinger 20/2).
+
+        :return: (params, array) with params the list of (N, k) in stacking order
+        """
+        arr, one_d = _as_2d(x)
+        stats = kernels.PrefixStats(arr)
+        params, out = [], []
+        for w in windows:
+            mean, std = stats.mean(w), stats.std(w)
+            for k in ks:
+                params.append((w, k))
+                out.append(mean + k * std)
+        return params, _finish(np.stack(out), one_d)
+
+    @staticmethod
+    def quiet_volume_ratio(volume, windows, vol_ma_window=20):
+        """
+        Share of the last N bars with volume below its ``vol_ma_window`` MA
+        (Wyckoff accumulation uses N=60 against a 0.7 threshold); compare the
+        result with any number of ratios without recomputing.
+        """
+        arr, one_d = _as_2d(volume)
+        with np.errstate(invalid='ignore'):
+            below = (arr < kernels.rolling_mean(arr, vol_ma_window)).astype(np.float64)
+        stats = kernels.PrefixStats(below)
+        return _finish(np.stack([stats.sum(w) / w for w in windows]), one_d)
+
+
+def _same(a, b):
+    return np.array_equal(np.isnan(a), np.isnan(b)) and np.array_equal(a[~np.isnan(a)], b[~np.isnan(b)])
+
+
+def main():
+    import time
+
+    rng = np.random.default_rng(0)
+    days, stocks = 600, 500
+    close = np.exp(np.cumsum(rng.normal(0, 0.02, (days, stocks)), axis=0)) * 20
+    high = close * (1 + np.abs(rng.normal(0, 0.01, (days, stocks))))
+
+    ma_windows = range(5, 251)
+    high_windows = range(20, 251)
+
+    t0 = time.time()
+    ma = ParamSweep.mean(close, ma_windows)
+    sd = ParamSweep.std(close, ma_windows)
+    hi = ParamSweep.rolling_max(high, high_windows)
+    t_sweep = time.time() - t0
+
+    t0 = time.time()
+    ma_ref = [kernels.rolling_mean(close, w) for w in ma_windows]
+    sd_ref = [kernels.rolling_std(close, w) for w in ma_windows]
+    hi_ref = [kernels.rolling_max(high, w) for w in high_windows]
+    t_loop = time.time() - t0
+
+    ok = all(_same(ma[i], r) for i, r in enumerate(ma_ref)) and \
+        all(_same(sd[i], r) for i, r in enumerate(sd_ref)) and \
+        all(_same(hi[i], r) for i, r in enumerate(hi_ref))
+    print(f"{len(ma_windows)} MA/Std windows + {len(high_windows)} high windows, {stocks} stocks × {days} days")
+    print(f"sweep {t_sweep:.2f}s vs per-window kernels {t_loop:.2f}s ({t_loop / t_sweep:.1f}x), "
+          f"identical: {ok}")
+
+
+if __name__ == "__main__":
+    main()
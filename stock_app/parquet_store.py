@@ -0,0 +1,149 @@
+"""
+Columnar market-data store (Parquet).
+
+One file per symbol under ``stock_app/data/parquet/<code>.parquet``, sorted by
+date and written with one row group per calendar year. The per-row-group
+min/max statistics on ``date`` let pyarrow skip whole years when a
+``start_date``/``end_date`` filter is pushed down, and only the requested
+columns are decoded.
+
+Run this module once to convert the existing CSV warehouse:
+
+    python stock_app/parquet_store.py
+"""
+
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_CSV_DIR = "stock_app/data/market_data"
+DEFAULT_STORE_DIR = "stock_app/data/parquet"
+
+# Files in the CSV directory that are not K-line data
+NON_KLINE_FILES = {"stock_list.csv"}
+
+
+class ParquetStore:
+    """Read/write per-symbol Parquet files with date predicate pushdown."""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+
+    def path_for(self, code):
+        return os.path.join(self.store_dir, f"{code}.parquet")
+
+    def exists(self, code):
+        return os.path.exists(self.path_for(code))
+
+    def read(self, code, start_date=None, end_date=None, columns=None):
+        """
+        Read K-line rows for ``code`` within [start_date, end_date].
+
+        :param columns: columns to project (``date`` is always included), None for all
+        :return: DataFrame with ``date`` as datetime64[ns], empty if the file is missing
+        """
+        path = self.path_for(code)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+
+        if columns is not None:
+            available = pq.read_schema(path).names
+            columns = ['date'] + [c for c in columns if c != 'date' and c in available]
+
+        filters = []
+        if start_date is not None:
+            filters.append(('date', '>=', pd.Timestamp(start_date)))
+        if end_date is not None:
+            filters.append(('date', '<=', pd.Timestamp(end_date)))
+
+        table = pq.read_table(path, columns=columns, filters=filters or None)
+        df = table.to_pandas()
+        if 'date' in df.columns:
+            df['date'] = df['date'].astype('datetime64[ns]')
+        return df.reset_index(drop=True)
+
+    def write(self, code, df):
+        """Write a full K-line frame for ``code``, one row group per year."""
+        if df.empty or 'date' not in df.columns:
+            return False
+
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['date']).astype('datetime64[ns]')
+        df = df.sort_values('date').reset_index(drop=True)
+        for col in df.columns:
+            if col != 'date':
+                df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = self.path_for(code)
+        tmp_path = path + ".tmp"
+
+        years = df['date'].dt.year.to_numpy()
+        with pq.ParquetWriter(tmp_path, table.schema, compression='snappy') as writer:
+            start = 0
+            # Rows are sorted, so each year is a contiguous slice
+            for end in list((years[1:] != years[:-1]).nonzero()[0] + 1) + [len(df)]:
+                writer.write_table(table.slice(start, end - start))
+                start = end
+
+        os.replace(tmp_path, path)
+        return True
+
+    def convert_from_csv(self, csv_dir=DEFAULT_CSV_DIR, skip_unchanged=True, progress_callback=None):
+        """
+        One-shot conversion of the CSV warehouse into the Parquet store.
+
+        :param skip_unchanged: skip symbols whose Parquet file is newer than the CSV
+        :param progress_callback: callback(current, total, code)
+        :return: dict with converted/skipped/failed counts
+        """
+        files = sorted(f for f in os.listdir(csv_dir)
+                       if f.endswith('.csv') and f not in NON_KLINE_FILES)
+        stats = {'converted': 0, 'skipped': 0, 'failed': 0}
+        total = len(files)
+
+        for idx, fname in enumerate(files):
+            code = fname[:-4]
+            csv_path = os.path.join(csv_dir, fname)
+            if progress_callback:
+                progress_callback(idx + 1, total, code)
+
+            pq_path = self.path_for(code)
+            if skip_unchanged and os.path.exists(pq_path) and \
+                    os.path.getmtime(pq_path) >= os.path.getmtime(csv_path):
+                stats['skipped'] += 1
+                continue
+
+            try:
+                df = pd.read_csv(csv_path)
+                if self.write(code, df):
+                    stats['converted'] += 1
+                else:
+                    stats['failed'] += 1
+            except Exception as e:
+                print(f"[ParquetStore] Error converting {code}: {e}")
+                stats['failed'] += 1
+
+        return stats
+
+
+def main():
+    print(">>> 转换 CSV 数据仓库为 Parquet 列式存储 <<<")
+    store = ParquetStore()
+    start_time = time.time()
+
+    def progress(current, total, code):
+        if current % 500 == 0 or current == total:
+            print(f"Progress: {current}/{total}")
+
+    stats = store.convert_from_csv(progress_callback=progress)
+    print(f"完成: 转换 {stats['converted']}, 跳过 {stats['skipped']}, 失败 {stats['failed']} "
+          f"(耗时 {time.time() - start_time:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+End-of-day update from the batched Tencent real-time quote endpoint.
+
+``http://qt.gtimg.cn/q=sh600000,sz000001,...`` returns today's quote for
+hundreds of symbols per request, so today's bar for the whole market costs
+tens of requests instead of one 600-bar kline request per stock.
+
+Only today's bar is appended. A stock whose quoted previous close no longer
+matches the last stored close (ex-dividend qfq change, or a missed day) is
+reported as stale so it can go through the incremental kline download instead.
+Quoted-but-suspended stocks have no bar today and are left as they are.
+
+Every stock whose history changed also gets its persisted indicator state
+(indicator_state.IndicatorStateStore) advanced: one O(1) update for an appended
+bar, a rebuild from the file only when the state no longer lines up.
+
+    python stock_app/realtime_quotes.py
+"""
+
+import os
+import time
+import concurrent.futures
+
+import io
+
+import pandas as pd
+import requests
+
+from download_data_tencent import DATA_DIR, HEADERS, get_tencent_symbol, get_stock_list_local, \
+    download_stock_tencent
+from indicator_state import IndicatorStateStore
+from symbol_manifest import SymbolManifest
+
+QUOTE_URL = "http://qt.gtimg.cn/q="
+# Symbols per HTTP request (the endpoint accepts several hundred)
+BATCH_SIZE = 300
+
+# Field positions in the "~"-separated quote string
+F_CODE, F_PRICE, F_PREV_CLOSE, F_OPEN, F_VOLUME = 2, 3, 4, 5, 6
+F_TIME, F_HIGH, F_LOW, F_AMOUNT, F_TURN = 30, 33, 34, 37, 38
+
+
+def parse_quote_payload(text):
+    """
+    Parse a qt.gtimg.cn response.
+
+    Each line looks like: v_sh600000="1~浦发银行~600000~7.50~7.48~7.49~123456~...";
+    Volume is in lots (手) like the kline endpoint; amount is converted from 万元 to 元.
+
+    :return: DataFrame with code, date, open, close, high, low, volume, amount, turn, prev_close,
+             suspended (quoted but not traded today: no bar to append)
+    """
+    records = []
+    for line in text.split(';'):
+        line = line.strip()
+        if '="' not in line:
+            continue
+        body = line.split('="', 1)[1].rstrip('"')
+        fields = body.split('~')
+        if len(fields) <= F_TURN:
+            continue
+        try:
+            open_px = float(fields[F_OPEN])
+            volume = float(fields[F_VOLUME])
+            # Suspended / not traded today
+            if open_px <= 0 or volume <= 0:
+                records.append({'code': fields[F_CODE], 'suspended': True})
+                continue
+            records.append({
+                'code': fields[F_CODE],
+                'date': pd.to_datetime(fields[F_TIME][:8], format='%Y%m%d').strftime('%Y-%m-%d'),
+                'open': open_px,
+                'close': float(fields[F_PRICE]),
+                'high': float(fields[F_HIGH]),
+                'low': float(fields[F_LOW]),
+                'volume': volume,
+                'amount': float(fields[F_AMOUNT]) * 10000,
+                'turn': float(fields[F_TURN]) if fields[F_TURN] else float('nan'),
+                'prev_close': float(fields[F_PREV_CLOSE]),
+                'suspended': False,
+            })
+        except (ValueError, IndexError):
+            continue
+
+    return pd.DataFrame(records, columns=['code', 'date', 'open', 'close', 'high', 'low',
+                                          'volume', 'amount', 'turn', 'prev_close', 'suspended'])
+
+
+def fetch_quotes(codes, batch_size=BATCH_SIZE, timeout=5):
+    """Fetch today's quotes for ``codes`` in batches over one keep-alive session."""
+    symbols = [s for s in (get_tencent_symbol(str(c)) for c in codes) if s]
+    frames = []
+    with requests.Session() as session:
+        session.headers.update(HEADERS)
+        for i in range(0, len(symbols), batch_size):
+            batch = symbols[i:i + batch_size]
+            try:
+                resp = session.get(QUOTE_URL + ",".join(batch), timeout=timeout)
+                if resp.status_code != 200:
+                    print(f"[Quotes] HTTP {resp.status_code} for batch {i // batch_size}")
+                    continue
+                resp.encoding = 'gbk'
+                frames.append(parse_quote_payload(resp.text))
+            except Exception as e:
+                print(f"[Quotes] Error fetching batch {i // batch_size}: {e}")
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_tail(file_path, nbytes=2048):
+    """Header columns and last data row of a CSV without parsing the whole file."""
+    with open(file_path, 'rb') as f:
+        header = f.readline().decode('utf-8').strip().split(',')
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - nbytes))
+        lines = f.read().decode('utf-8', errors='ignore').strip().splitlines()
+    if not lines or lines[-1].split(',') == header:
+        return header, None
+    return header, dict(zip(header, lines[-1].split(',')))
+
+
+def _read_tail_frame(file_path, rows=2, nbytes=4096):
+    """Last ``rows`` bars of a CSV as a DataFrame, without parsing the whole file."""
+    with open(file_path, 'rb') as f:
+        header = f.readline().decode('utf-8')
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - nbytes))
+        lines = f.read().decode('utf-8', errors='ignore').strip().splitlines()[1:]
+    lines = [line for line in lines if line.strip() != header.strip()][-rows:]
+    return pd.read_csv(io.StringIO(header + "\n".join(lines)), parse_dates=['date'])
+
+
+def sync_indicator_state(code, store, data_dir=DATA_DIR):
+    """Advance ``code``'s indicator state to its newest stored bar (see IndicatorStateStore.sync)."""
+    file_path = os.path.join(data_dir, f"{code}.csv")
+    if not os.path.exists(file_path):
+        return None
+    return store.sync(code, _read_tail_frame(file_path),
+                      history=lambda: pd.read_csv(file_path, parse_dates=['date']))
+
+
+def append_quote_bar(quote, data_dir=DATA_DIR):
+    """
+    Append today's bar from one quote row to <data_dir>/<code>.csv.
+
+    :return: 'appended' / 'rewritten' / 'unchanged', 'suspended' if the stock did not
+             trade today, 'missing' if there is no history file yet, 'stale' if the
+             stored history no longer lines up with the quote
+    """
+    if quote.get('suspended'):
+        return 'suspended'
+    file_path = os.path.join(data_dir, f"{quote['code']}.csv")
+    if not os.path.exists(file_path):
+        return 'missing'
+
+    header, last = _read_tail(file_path)
+    if last is None:
+        return 'missing'
+
+    row = pd.DataFrame([{c: quote.get(c, float('nan')) for c in header}], columns=header)
+    last_date = pd.Timestamp(last['date'])
+    quote_date = pd.Timestamp(quote['date'])
+
+    if quote_date < last_date:
+        return 'unchanged'
+
+    if quote_date == last_date:
+        # Bar already stored (maybe an intraday snapshot): replace it if it moved
+        if abs(float(last['close']) - quote['close']) < 1e-6 and \
+                abs(float(last['volume']) - quote['volume']) < 1e-6:
+            return 'unchanged'
+        df = pd.read_csv(file_path)
+        df = pd.concat([df.iloc[:-1], row], ignore_index=True)
+        df.to_csv(file_path, index=False)
+        return 'rewritten'
+
+    # Previous close must be our last stored close, otherwise qfq moved or a day is missing
+    if abs(float(last['close']) - quote['prev_close']) > 0.005:
+        return 'stale'
+
+    row.to_csv(file_path, mode='a', header=False, index=False)
+    return 'appended'
+
+
+def update_from_quotes(codes, refetch_stale=True, max_workers=10, manifest=None, state_store=None):
+    """
+    Build today's bar for every code from batched quotes and append it.
+
+    :param refetch_stale: run the incremental kline download for stocks whose history
+                          the quotes could not extend ('stale' or 'missing'); suspended,
+                          unquoted and failed-batch codes are left for the next full download
+    :param manifest: SymbolManifest for the kline fallback (known-dead symbols are skipped),
+                     default the one in DATA_DIR
+    :param state_store: IndicatorStateStore kept at the newest bar of every changed stock,
+                        default IndicatorStateStore(); False to skip
+    :return: dict outcome -> count
+    """
+    quotes = fetch_quotes(codes)
+    stats = {'requests': (len(codes) + BATCH_SIZE - 1) // BATCH_SIZE}
+    needs_kline = set()
+    changed = set()
+
+    for quote in quotes.to_dict('records'):
+        outcome = append_quote_bar(quote)
+        stats[outcome] = stats.get(outcome, 0) + 1
+        if outcome in ('stale', 'missing'):
+            needs_kline.add(quote['code'])
+        elif outcome in ('appended', 'rewritten'):
+            changed.add(quote['code'])
+    stats['unquoted'] = len(set(str(c) for c in codes) - set(quotes['code'] if not quotes.empty else []))
+
+    if refetch_stale and needs_kline:
+        manifest = manifest or SymbolManifest(DATA_DIR)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda c: download_stock_tencent({'code': c, 'name': ''}, incremental=True,
+                                                               manifest=manifest),
+                              sorted(needs_kline)))
+        manifest.save()
+        stats['kline_fallback'] = len(needs_kline)
+        changed |= needs_kline
+
+    if state_store is not False:
+        store = state_store or IndicatorStateStore()
+        for code in sorted(changed):
+            try:
+                if sync_indicator_state(code, store) is not None:
+                    stats['indicator_states'] = stats.get('indicator_states', 0) + 1
+            except Exception as e:
+                print(f"[Quotes] {code} 指标状态更新失败: {e}")
+
+    return stats
+
+
+def main():
+    print(">>> 批量实时行情更新今日K线 (Tencent Quote API) <<<")
+    stocks = get_stock_list_local()
+    if stocks.empty:
+        return
+
+    start_time = time.time()
+    stats = update_from_quotes(stocks['code'].tolist())
+    print(f"完成: {stats} (耗时 {time.time() - start_time:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Pipelined market refresh: download → indicators → signals.
+
+Instead of downloading every file and only then re-reading all of them in
+SignalCacheBuilder.build_all_signals, each symbol is handed to the signal
+stage as soon as its bars are on disk:
+
+    asyncio downloads ──> bounded queue ──> process pool (indicators + signals)
+
+Network waits and CPU work overlap, so the refresh takes roughly as long as the
+slower of the two stages. The signal stage also brings each stock's persisted
+indicator state (indicator_state) up to its newest bar, so the quote-based
+daily update can advance it one bar at a time. The bounded queue applies backpressure: when the CPU
+stage falls behind, downloads pause instead of piling up work in memory.
+
+    python stock_app/refresh_pipeline.py
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import time
+
+from data_loader import DataLoader
+from indicator_state import IndicatorStateStore
+from download_data_tencent import DATA_DIR, HEADERS, download_stock_tencent_async, get_stock_list_local
+from signal_cache import SignalCacheBuilder, compute_stock_signals, default_date_range
+from symbol_manifest import SymbolManifest
+
+# Per-process state of the signal workers, set once by _init_worker
+_worker_loader = None
+_worker_index = None
+_worker_states = None
+
+
+def _init_worker(data_dir, index_df, state_dir):
+    global _worker_loader, _worker_index, _worker_states
+    # Every file is read exactly once, the frame cache would only cost memory
+    _worker_loader = DataLoader(data_dir, cache_bytes=0)
+    _worker_index = index_df
+    _worker_states = IndicatorStateStore(state_dir) if state_dir else None
+
+
+def _signal_worker(code, name, start_date, end_date):
+    df = _worker_loader.get_k_data(code, start_date, end_date)
+    if _worker_states is not None:
+        try:
+            # Streams the new bars into the saved state, rebuilds it from df if it no longer lines up
+            _worker_states.sync(code, df)
+        except Exception as e:
+            print(f"⚠️ {code} 指标状态更新失败: {e}")
+    return compute_stock_signals(code, name, df, _worker_index)
+
+
+async def refresh_pipeline(stock_infos, data_dir=DATA_DIR, cache_dir="stock_app/data/signal_cache",
+                           incremental=True, workers=None, queue_size=256, progress_callback=None,
+                           engine=None, manifest=None, state_dir="stock_app/data/indicator_state"):
+    """
+    Download ``stock_infos`` and rebuild the signal cache in one overlapped pass.
+
+    :param stock_infos: list of {'code', 'name'} dicts
+    :param data_dir: warehouse the downloader writes to (download_data_tencent.DATA_DIR)
+    :param workers: signal worker processes, defaults to cpu_count - 1
+    :param queue_size: max symbols downloaded but not yet handed to the pool
+    :param progress_callback: callback(stage, done, total, message), stage is 'download' or 'signals'
+    :param engine: optional preconfigured AsyncFetchEngine
+    :param manifest: optional SymbolManifest, saved when the run finishes
+    :param state_dir: IndicatorStateStore directory kept at every stock's newest bar, None to skip
+    :return: stats dict (counts, stage timings, fetch summary)
+    """
+    from async_fetch import AsyncFetchEngine
+
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    engine = engine or AsyncFetchEngine(headers=HEADERS, timeout=5)
+    builder = SignalCacheBuilder(data_dir, cache_dir)
+    start_date, end_date = default_date_range()
+    index_df = builder.load_index()
+
+    total = len(stock_infos)
+    queue = asyncio.Queue(maxsize=queue_size)
+    loop = asyncio.get_running_loop()
+    strong_records, weak_records = [], []
+    stats = {'downloaded': 0, 'queued': 0, 'computed': 0, 'failed': 0}
+    t0 = time.monotonic()
+
+    async def produce(info):
+        code = str(info['code']).zfill(6)
+        res = await download_stock_tencent_async(engine, info, incremental, manifest)
+        stats['downloaded'] += 1
+        if progress_callback:
+            progress_callback('download', stats['downloaded'], total, res)
+        # A failed download still leaves yesterday's file: signals from it beat no signals
+        if '(dead)' not in res and 'BSE' not in res and os.path.exists(os.path.join(data_dir, f"{code}.csv")):
+            stats['queued'] += 1
+            await queue.put((code, info.get('name', '')))
+
+    async def consume(pool):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            code, name = item
+            try:
+                strong, weak = await loop.run_in_executor(pool, _signal_worker, code, name, start_date, end_date)
+                if strong is not None:
+                    strong_records.append(strong)
+                if weak is not None:
+                    weak_records.append(weak)
+            except Exception as e:
+                stats['failed'] += 1
+                print(f"⚠️ {code} 信号计算失败: {e}")
+            stats['computed'] += 1
+            if progress_callback:
+                progress_callback('signals', stats['computed'], stats['queued'], f"{code} - {name}")
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(data_dir, index_df, state_dir)) as pool:
+        # Two consumers per worker keep every process busy while results are merged
+        consumers = [asyncio.create_task(consume(pool)) for _ in range(workers * 2)]
+        async with engine:
+            await asyncio.gather(*(produce(info) for info in stock_infos))
+        stats['download_s'] = time.monotonic() - t0
+
+        for _ in consumers:
+            await queue.put(None)
+        await asyncio.gather(*consumers)
+
+    stats['total_s'] = time.monotonic() - t0
+    stats['fetch'] = engine.summary()
+
+    if manifest is not None:
+        manifest.save()
+    builder.save_signals(strong_records, weak_records, start_date, end_date, total,
+                         extra_metadata={"build_mode": "pipelined"})
+    return stats
+
+
+def main():
+    print(">>> 流水线刷新: 下载 → 指标 → 信号 <<<")
+    stocks = get_stock_list_local()
+    if stocks.empty:
+        return
+
+    def progress(stage, done, total, message):
+        if done % 200 == 0 or done == total:
+            print(f"[{stage}] {done}/{total}")
+
+    stats = asyncio.run(refresh_pipeline(stocks.to_dict('records'), progress_callback=progress,
+                                         manifest=SymbolManifest(DATA_DIR)))
+    print(f"下载阶段 {stats['download_s']:.1f}s, 总耗时 {stats['total_s']:.1f}s, "
+          f"计算 {stats['computed']} 只, 失败 {stats['failed']} 只")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,672 @@
+"""
+One scan engine for the three scan modes (策略选股 / 强势股进攻 / 抄底).
+
+A ScanJob describes what to scan: strategy family, selected keys, load and scan
+windows and the shared inputs (the market index is loaded once by the engine,
+not per stock). The stock list is split into chunks; each chunk's frames are
+loaded together (plus one ChipEngine pass when the chip model is needed) and
+scanned stock by stock. Chunks run on a pluggable
+executor:
+
+- 'serial'  : in the calling thread (debugging, tiny lists)
+- 'thread'  : ThreadPoolExecutor, no pickling, shares the GIL
+- 'process' : ProcessPoolExecutor, job and stock list are sent once per worker (initializer)
+
+    job = ScanJob('weak', ['Limit', 'Pinbar'], scan_start, scan_end)
+    result = ScanEngine('process').run(job, stock_list_df, progress_callback=cb)
+    result.rows, result.cancelled, result.hlp3_skipped
+
+A WarmPool keeps the process workers alive across scans (the app holds one in
+st.cache_resource): ScanEngine('process').run(job, stocks, pool=warm_pool).
+
+Stock data comes from the memory-mapped market panel when it covers the job
+(PanelSource: every worker maps the same file once, tasks carry only a
+(start, stop) range into the stock list) and from the per-stock files
+otherwise (FileSource). Stocks the panel was not built with (listed after
+the last build) are read from their files by the PanelSource.
+
+Screening jobs on the panel skip the per-stock loop entirely: scan_cube
+evaluates the selected signals for blocks of CUBE_BLOCK stocks at once
+(panel_strategies.SignalCube over days × stocks arrays) and the AND over the
+scan window is a bitwise reduction. Only stocks missing from the panel go
+through the executor.
+
+    python stock_app/scan_engine.py [serial|thread|process|warm] [stocks] [auto|panel|files]
+
+Progress is reported as progress_callback(done, total, message) after every
+chunk; setting ``cancel`` (a threading.Event) or raising from the callback
+(Streamlit stops a rerun that way) cancels the pending chunks.
+"""
+
+import atexit
+import concurrent.futures
+import datetime
+import math
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import strategy_registry
+from data_loader import DataLoader
+
+EXECUTORS = ('serial', 'thread', 'process')
+DEFAULT_EXECUTOR = 'process'
+SOURCES = ('auto', 'panel', 'files')
+# Chunks per worker: enough to balance uneven stocks, few enough to amortize loading
+CHUNKS_PER_WORKER = 4
+MAX_CHUNK = 200
+INDEX_CODE = "000001"  # 上证指数
+# Warm pool: seconds a health-check ping may take; jobs a worker keeps unpickled
+HEALTH_TIMEOUT = 10
+JOB_CACHE = 4
+# Stocks per SignalCube block: bounds the (days × stocks) indicator arrays of one pass
+CUBE_BLOCK = 500
+
+
+def _date_str(d):
+    return d if isinstance(d, str) else d.strftime("%Y-%m-%d")
+
+
+class ScanJob:
+    """What to scan; pickled once per process worker."""
+
+    def __init__(self, family, keys, scan_start, scan_end, checks_config=None):
+        """
+        :param family: 'screen', 'strong' or 'weak' (strategy_registry.FAMILIES)
+        :param keys: selected strategy keys (screen: signal columns)
+        :param checks_config: screen only, [(is_checked, signal column, display name)]
+                              for the Strategies column of the result
+        """
+        if family not in strategy_registry.FAMILIES:
+            raise ValueError(f"Unknown strategy family: {family}")
+        self.family = family
+        self.keys = list(keys)
+        self.specs = strategy_registry.select(family, self.keys)
+        self.inputs = strategy_registry.required_inputs(self.specs)
+        self.scan_start = _date_str(scan_start)
+        self.scan_end = _date_str(scan_end)
+        # Load only the warm-up the selected strategies declare
+        self.load_start = strategy_registry.load_start(self.scan_start, self.specs).strftime("%Y-%m-%d")
+        self.load_end = self.scan_end
+        self.checks_config = checks_config or [(True, k, strategy_registry.get(family, k).name) for k in self.keys]
+        self.index_df = None
+
+    def load_inputs(self, loader):
+        """Shared inputs, loaded once for the whole scan."""
+        if 'index' in self.inputs:
+            self.index_df = loader.get_k_data(INDEX_CODE, self.load_start, self.load_end)
+
+
+class ScanResult:
+    def __init__(self):
+        self.rows = []
+        self.done = 0
+        self.total = 0
+        self.cancelled = False
+        self.source = None         # 'panel' or 'files'
+        self.file_fallback = 0     # panel scans: stocks not in the panel, read from files
+        self.vectorized = 0        # screen scans on the panel: stocks evaluated in the signal cube
+        self.hlp3_skipped = 0      # weak: stocks whose HLP3 lacked chip data
+
+    def to_frame(self):
+        """Rows as a DataFrame, newest signal first, then by code (empty frame when nothing matched)."""
+        if not self.rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(self.rows)
+        df['Signal Date'] = pd.to_datetime(df['Signal Date'])
+        df = df.sort_values(by=['Signal Date', 'Code'], ascending=[False, True])
+        df['Signal Date'] = df['Signal Date'].dt.strftime('%Y-%m-%d')
+        return df.reset_index(drop=True)
+
+
+def scan_family_frame(job, code, name, df):
+    """
+    Strong/weak scan of one loaded stock: the newest day in the scan window on
+    which every selected strategy fired.
+
+    :return: (result row or None, HLP3 lacked chip data)
+    """
+    signals = strategy_registry.evaluate(job.family, df, job.keys, index_df=job.index_df, winner_col='winner_pct')
+    hlp3_skipped = 'HLP3_Warning' in signals.columns and bool(signals['HLP3_Warning'].any())
+
+    signal_cols = [f'Signal_{k}' for k in job.keys if f'Signal_{k}' in signals.columns]
+    if not signal_cols:
+        return None, hlp3_skipped
+    in_window = (df['date'] >= job.scan_start) & (df['date'] <= job.scan_end)
+    if not in_window.any():
+        return None, hlp3_skipped
+
+    # AND logic: all selected strategies must be True on the same day
+    combined = signals.loc[in_window, signal_cols].all(axis=1)
+    if not combined.any():
+        return None, hlp3_skipped
+    return {
+        'Code': code,
+        'Name': name,
+        'Signal Date': df.loc[combined[combined].index[-1], 'date'],   # most recent
+        'Close': df.loc[in_window, 'close'].iloc[-1],
+        'Strategies': ', '.join(job.keys),
+    }, hlp3_skipped
+
+
+# Per-process data handles, kept across scans (warm pool workers live for many scans)
+_loaders = {}
+_panels = {}
+
+
+def _process_loader(data_dir):
+    """One DataLoader per data_dir and process (no frame cache: worker memory stays flat)."""
+    if data_dir not in _loaders:
+        _loaders[data_dir] = DataLoader(data_dir=data_dir)
+    return _loaders[data_dir]
+
+
+def _process_panel(panel_dir):
+    """One read-only MarketPanel per process, re-opened when the panel was rebuilt."""
+    from market_panel import MarketPanel
+
+    panel = _panels.get(panel_dir)
+    if panel is None or panel.is_stale():
+        panel = _panels[panel_dir] = MarketPanel(panel_dir)
+    return panel
+
+
+class FileSource:
+    """Per-stock warehouse files, read through DataLoader.get_k_data_many."""
+
+    name = 'files'
+
+    def __init__(self, data_dir, loader=None):
+        self.data_dir = data_dir
+        self._loader = loader
+
+    def __getstate__(self):
+        # Workers build their own loader
+        return {'data_dir': self.data_dir, '_loader': None}
+
+    def frames(self, job, stocks):
+        loader = self._loader or _process_loader(self.data_dir)
+        return loader.get_k_data_many([code for code, _ in stocks], job.load_start, job.load_end)
+
+
+class PanelSource:
+    """
+    The memory-mapped market panel (market_panel). Each process maps the file
+    read-only once and slices frames out of it, so workers share the OS page
+    cache: no CSV parsing, and memory does not grow with the number of workers.
+    Stocks missing from the panel are read through ``fallback`` (a FileSource).
+    """
+
+    name = 'panel'
+
+    def __init__(self, panel_dir, rows, view=None, fallback=None):
+        self.panel_dir = panel_dir
+        self.rows = rows            # {code: panel row}
+        self._view = view
+        self.fallback = fallback
+
+    def __getstate__(self):
+        # The memmap is re-opened in the worker, never pickled
+        return {'panel_dir': self.panel_dir, 'rows': self.rows, '_view': None, 'fallback': self.fallback}
+
+    def missing(self, stocks):
+        """(code, name) pairs the panel does not hold."""
+        return [(code, name) for code, name in stocks if str(code).zfill(6) not in self.rows]
+
+    def frames(self, job, stocks):
+        if self._view is None:
+            self._view = _process_panel(self.panel_dir).view(job.load_start, job.load_end)
+            # Rows of the panel this process opened (it may have been rebuilt since the job was made)
+            self.rows = {code: i for i, code in enumerate(self._view.codes)}
+        codes = [str(code).zfill(6) for code, _ in stocks]
+        frames = {code: self._view.frame(self.rows[code]) for code in codes if code in self.rows}
+        missing = self.missing(stocks)
+        if missing and self.fallback is not None:
+            frames.update(self.fallback.frames(job, missing))
+        return frames
+
+    @staticmethod
+    def open(loader, job):
+        """
+        PanelSource for the job, or None when the panel cannot stand in for the files:
+        not built, starting after the job's warm-up, older than the warehouse (the
+        index file has a newer bar) or lacking the 'turn' column the chip model reads.
+        """
+        from market_panel import MarketPanel
+
+        if not MarketPanel.exists(loader.panel_dir):
+            return None
+        panel = MarketPanel(loader.panel_dir)
+        if panel.dates[0] > pd.Timestamp(job.load_start) + pd.Timedelta(days=strategy_registry.CALENDAR_SLACK_DAYS):
+            return None
+        reference = job.index_df if job.index_df is not None else \
+            loader.get_k_data(INDEX_CODE, job.load_start, job.load_end)
+        if not reference.empty:
+            if reference['date'].iloc[-1] > panel.dates[-1]:
+                return None
+            if 'winner_pct' in job.inputs and 'turn' in reference.columns and 'turn' not in panel.fields:
+                return None
+        view = panel.view(job.load_start, job.load_end)
+        return PanelSource(loader.panel_dir, {code: i for i, code in enumerate(view.codes)}, view,
+                           fallback=FileSource(loader.data_dir, loader))
+
+
+def scan_chunk(job, source, stocks):
+    """
+    Scan a chunk of (code, name) pairs.
+
+    :return: (rows, hlp3_skipped count); stocks that fail are skipped
+    """
+    from scanner import scan_frame
+
+    frames = source.frames(job, stocks)
+    if 'winner_pct' in job.inputs:
+        # Chip distribution (winner_pct) for the whole chunk in one pass
+        from chip_engine import ChipEngine
+        frames = ChipEngine.add_winner_pct_many(frames)
+
+    rows = []
+    hlp3_skipped = 0
+    for code, name in stocks:
+        df = frames.get(str(code).zfill(6), pd.DataFrame())
+        if df.empty:
+            continue
+        try:
+            if job.family == 'screen':
+                row = scan_frame(code, name, df, job.scan_start, job.scan_end, job.checks_config)
+            else:
+                row, skipped = scan_family_frame(job, code, name, df)
+                hlp3_skipped += skipped
+        except Exception:
+            # Skip stocks with errors
+            continue
+        if row:
+            rows.append(row)
+    return rows, hlp3_skipped
+
+
+def scan_cube(job, view, stocks):
+    """
+    Screening of ``stocks`` (all in ``view``) through whole-block signal cubes,
+    the rows scan_frame would give for each of them.
+
+    :param view: market_panel.PanelView over the job's load window
+    :return: rows
+    """
+    from panel_strategies import SignalCube
+    from scanner import MIN_SCAN_BARS
+
+    labels = {col: name for checked, col, name in job.checks_config if checked}
+    signals = list(labels)
+    min_bars = min(strategy_registry.lookback(job.specs), MIN_SCAN_BARS)
+    rows = []
+    for lo in range(0, len(stocks), CUBE_BLOCK):
+        block = stocks[lo:lo + CUBE_BLOCK]
+        idx = [view.code_index(str(code).zfill(6)) for code, _ in block]
+        fields = {f: np.asarray(view[f][idx], dtype=np.float64).T for f in view.fields}
+        cube = SignalCube.from_fields(fields, [code for code, _ in block], view.dates, signals)
+        last = cube.last_hit(signals, 'and', job.scan_start, job.scan_end)
+        bars = (~np.isnan(fields['close'])).sum(axis=0)
+        for k in np.flatnonzero((last >= 0) & (bars >= min_bars)):
+            code, name = block[k]
+            rows.append({
+                "Code": code,
+                "Name": name,
+                "Price": fields['close'][last[k], k],
+                "Signal Date": cube.dates[last[k]].strftime("%Y-%m-%d"),
+                # AND over the selection: every selected strategy fired on that day
+                "Strategies": ", ".join(labels[s] for s in signals),
+            })
+    return rows
+
+
+# --- process workers: job, source and stock list arrive once through the pool
+# initializer; each task is just a (start, stop) range into the stock list ---
+_worker = {}
+
+
+def _init_worker(job, source, stocks):
+    _worker.update(job=job, source=source, stocks=stocks)
+
+
+def _worker_scan(lo, hi):
+    return scan_chunk(_worker['job'], _worker['source'], _worker['stocks'][lo:hi])
+
+
+# --- warm pool workers: started once, serve many scans ---
+_jobs = OrderedDict()      # job file -> (job, source, stocks), most recent last
+
+
+def _init_warm_worker():
+    """Import the scan stack and compile the JIT kernels once per worker process."""
+    import scanner, strong_strategies, weak_strategies, chip_engine  # noqa: F401
+    import jit_kernels
+    jit_kernels.warm_up()
+
+
+def _warm_scan(job_file, lo, hi):
+    # The job is read from disk once per worker, tasks only carry its path and a range
+    state = _jobs.get(job_file)
+    if state is None:
+        with open(job_file, 'rb') as f:
+            state = _jobs[job_file] = pickle.load(f)
+        while len(_jobs) > JOB_CACHE:
+            _jobs.popitem(last=False)
+    job, source, stocks = state
+    return scan_chunk(job, source, stocks[lo:hi])
+
+
+def _ping():
+    return os.getpid()
+
+
+class WarmPool:
+    """
+    Long-lived process pool shared by every scan (and every Streamlit session
+    through st.cache_resource): workers keep the imported modules, compiled
+    kernels, DataLoader and panel memmap between scans.
+
+    acquire() health-checks the workers and restarts the pool when one died or
+    the data changed on disk (see signature()). Every restart, including one
+    asked for with request_restart(), waits until no scan is running on the pool.
+    """
+
+    def __init__(self, data_dir, workers=None, panel_dir=None):
+        self.data_dir = data_dir
+        self.panel_dir = panel_dir or os.path.join(os.path.dirname(os.path.normpath(data_dir)), "panel")
+        self.workers = workers or max(1, multiprocessing.cpu_count() - 1)
+        self.executor = None
+        self.started = None
+        self.restarts = 0
+        self.last_restart_reason = None
+        self._signature = None
+        self._active = 0
+        self._pending_restart = None
+        self._lock = threading.Lock()
+        self._job_dir = tempfile.mkdtemp(prefix="scan_pool_")
+        # Workers and the job directory outlive every scan: clean up when the app exits
+        atexit.register(self.shutdown)
+
+    def signature(self):
+        """mtimes of what the workers cache: stock list, warehouse directory, panel and compact panel metadata."""
+        from market_panel import META_FILE
+        from compact_panel import COMPACT_DIR, META_FILE as COMPACT_META
+
+        paths = [os.path.join(self.data_dir, "stock_list.csv"), self.data_dir,
+                 os.path.join(self.panel_dir, META_FILE), os.path.join(self.panel_dir, COMPACT_DIR, COMPACT_META)]
+        return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in paths)
+
+    def _start(self, reason):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.restarts += 1
+            self.last_restart_reason = reason
+            print(f"[WarmPool] Restarting workers: {reason}")
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers,
+                                                               initializer=_init_warm_worker)
+        self._pending_restart = None
+        self.started = time.time()
+        self._signature = self.signature()
+
+    def healthy(self, timeout=HEALTH_TIMEOUT):
+        """Every worker answers a ping within ``timeout`` seconds."""
+        if self.executor is None:
+            return False
+        try:
+            pings = [self.executor.submit(_ping) for _ in range(self.workers)]
+            for ping in pings:
+                ping.result(timeout=timeout)
+            return True
+        except Exception:
+            # BrokenProcessPool (a worker died), timeout, or a pool that was shut down
+            return False
+
+    def acquire(self):
+        """The executor for one scan, (re)started if needed; pair with release()."""
+        with self._lock:
+            # Pings would queue behind a running scan's chunks: only check an idle pool
+            if self.executor is None:
+                self._start("first use")
+            elif self._active == 0 and self._pending_restart:
+                self._start(self._pending_restart)
+            elif self._active == 0 and not self.healthy():
+                self._start("health check failed")
+            elif self._active == 0 and self.signature() != self._signature:
+                self._start("data files changed")
+            self._active += 1
+            return self.executor
+
+    def publish(self, payload):
+        """Write a scan's (job, source, stocks) once for the workers; returns its path."""
+        fd, path = tempfile.mkstemp(suffix=".pkl", dir=self._job_dir)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def release(self, job_file=None):
+        with self._lock:
+            self._active -= 1
+            if self._active == 0 and self._pending_restart and self.executor is not None:
+                self._start(self._pending_restart)
+        if job_file and os.path.exists(job_file):
+            os.remove(job_file)
+
+    def request_restart(self, reason="manual"):
+        """
+        Restart the workers now if the pool is idle, otherwise once the running
+        scans have released it.
+
+        :return: True if restarted now, False if deferred
+        """
+        with self._lock:
+            if self._active == 0:
+                self._start(reason)
+                return True
+            self._pending_restart = reason
+            return False
+
+    def status(self):
+        return {
+            'workers': self.workers,
+            'running': self.executor is not None,
+            'uptime_s': round(time.time() - self.started) if self.started else 0,
+            'active_scans': self._active,
+            'restarts': self.restarts,
+            'last_restart_reason': self.last_restart_reason,
+            'pending_restart': self._pending_restart,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+        shutil.rmtree(self._job_dir, ignore_errors=True)
+
+
+class ScanEngine:
+    def __init__(self, executor=DEFAULT_EXECUTOR, workers=None, chunk_size=None, source='auto', vectorized=True):
+        """
+        :param executor: 'serial', 'thread' or 'process'
+        :param workers: pool size, default CPU count - 1
+        :param chunk_size: stocks per task, default total / (workers × CHUNKS_PER_WORKER)
+                           capped at MAX_CHUNK
+        :param source: 'panel' (memory-mapped market panel), 'files' (per-stock warehouse)
+                       or 'auto' (the panel when PanelSource.open accepts it)
+        :param vectorized: evaluate screening jobs on the panel with scan_cube
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor} (expected one of {EXECUTORS})")
+        if source not in SOURCES:
+            raise ValueError(f"Unknown source: {source} (expected one of {SOURCES})")
+        self.executor = executor
+        self.workers = 1 if executor == 'serial' else (workers or max(1, multiprocessing.cpu_count() - 1))
+        self.chunk_size = chunk_size
+        self.source = source
+        self.vectorized = vectorized
+
+    def chunks(self, n):
+        """(start, stop) ranges over n stocks."""
+        size = self.chunk_size or max(1, min(MAX_CHUNK, math.ceil(n / (self.workers * CHUNKS_PER_WORKER))))
+        return [(lo, min(lo + size, n)) for lo in range(0, n, size)]
+
+    @staticmethod
+    def stock_pairs(stock_list_df):
+        """[(code, name)] from DataLoader.get_stock_list()."""
+        names = stock_list_df['name'] if 'name' in stock_list_df.columns else stock_list_df['code']
+        return list(zip(stock_list_df['code'].tolist(), names.tolist()))
+
+    def open_source(self, job, loader):
+        """PanelSource (stocks it lacks come from their files) or FileSource."""
+        if self.source != 'files':
+            panel = PanelSource.open(loader, job)
+            if panel is not None:
+                return panel
+            if self.source == 'panel':
+                raise ValueError("Market panel missing or stale for this scan; run market_panel.py first.")
+        return FileSource(loader.data_dir, loader)
+
+    def _cube_scan(self, job, source, stocks, missing, result, progress_callback, cancel):
+        """Screening of the panel's stocks with scan_cube; False when the job is not eligible."""
+        from panel_strategies import SIGNALS
+
+        if not (self.vectorized and job.family == 'screen' and set(job.keys) <= set(SIGNALS)):
+            return False
+        skip = {code for code, _ in missing}
+        covered = [(code, name) for code, name in stocks if code not in skip]
+        for lo in range(0, len(covered), CUBE_BLOCK):
+            if cancel is not None and cancel.is_set():
+                result.cancelled = True
+                break
+            block = covered[lo:lo + CUBE_BLOCK]
+            result.rows.extend(scan_cube(job, source._view, block))
+            result.done += len(block)
+            result.vectorized += len(block)
+            if progress_callback:
+                progress_callback(result.done, result.total, f"向量化扫描中 {result.done}/{result.total}...")
+        return True
+
+    def run(self, job, stocks, progress_callback=None, cancel=None, loader=None, pool=None):
+        """
+        :param stocks: [(code, name)] or a stock list DataFrame (code, name)
+        :param progress_callback: callback(done, total, message), called after every chunk
+        :param cancel: optional threading.Event; pending chunks are dropped once set
+        :param pool: optional WarmPool serving the 'process' executor instead of a fresh pool
+        :return: ScanResult (partial with cancelled=True when cancelled)
+        """
+        if isinstance(stocks, pd.DataFrame):
+            stocks = self.stock_pairs(stocks)
+        if self.executor == 'process' and pool is not None:
+            self.workers = pool.workers
+        loader = loader or DataLoader()
+        job.load_inputs(loader)
+        source = self.open_source(job, loader)
+
+        result = ScanResult()
+        result.source = source.name
+        result.total = len(stocks)
+        if isinstance(source, PanelSource):
+            missing = source.missing(stocks)
+            result.file_fallback = len(missing)
+            if self._cube_scan(job, source, stocks, missing, result, progress_callback, cancel):
+                # The executor only sees what the panel does not hold
+                stocks = missing
+        chunks = self.chunks(len(stocks))
+        if not chunks or result.cancelled:
+            return result
+
+        def collect(chunk, out):
+            rows, skipped = out
+            result.rows.extend(rows)
+            result.hlp3_skipped += skipped
+            result.done += chunk[1] - chunk[0]
+            if progress_callback:
+                progress_callback(result.done, result.total, f"扫描中 {result.done}/{result.total}...")
+
+        if self.executor == 'serial':
+            for lo, hi in chunks:
+                if cancel is not None and cancel.is_set():
+                    result.cancelled = True
+                    break
+                collect((lo, hi), scan_chunk(job, source, stocks[lo:hi]))
+            return result
+
+        warm = self.executor == 'process' and pool is not None
+        job_file = None
+        if warm:
+            executor = pool.acquire()
+            job_file = pool.publish((job, source, stocks))
+            submit = lambda lo, hi: executor.submit(_warm_scan, job_file, lo, hi)
+        elif self.executor == 'thread':
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+            submit = lambda lo, hi: executor.submit(scan_chunk, job, source, stocks[lo:hi])
+        else:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                              initargs=(job, source, stocks))
+            submit = lambda lo, hi: executor.submit(_worker_scan, lo, hi)
+
+        futures = {}
+        finished = False
+        try:
+            futures = {submit(lo, hi): (lo, hi) for lo, hi in chunks}
+            for future in concurrent.futures.as_completed(futures):
+                if cancel is not None and cancel.is_set():
+                    result.cancelled = True
+                    break
+                collect(futures[future], future.result())
+            finished = not result.cancelled
+        finally:
+            # Cancelled, or an exception from the callback: drop what has not started, don't wait
+            if warm:
+                for future in futures:
+                    future.cancel()
+                pool.release(job_file)
+            else:
+                executor.shutdown(wait=finished, cancel_futures=True)
+        return result
+
+
+def main():
+    import sys
+
+    executor = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_EXECUTOR
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    source = sys.argv[3] if len(sys.argv) > 3 else 'auto'
+    loader = DataLoader()
+    stocks = ScanEngine.stock_pairs(loader.get_stock_list(exclude_dead=True))[:limit]
+    if not stocks:
+        print("No stock list; download data first.")
+        return
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=30)
+    jobs = [ScanJob('screen', ['Signal_Limit', 'Signal_Pinbar'], start, end),
+            ScanJob('strong', ['Z_Score'], start, end),
+            ScanJob('weak', ['Limit'], start, end)]
+    # 'warm': the same jobs twice on one WarmPool, the second round shows the warm cost
+    pool = WarmPool(loader.data_dir) if executor == 'warm' else None
+    rounds = 2 if pool else 1
+    try:
+        for r in range(rounds):
+            for job in jobs:
+                t0 = time.time()
+                result = ScanEngine('process' if pool else executor, source=source).run(
+                    job, stocks, cancel=threading.Event(), pool=pool)
+                print(f"{job.family:6s} {executor}/{result.source}: {len(result.rows)} hits / {result.done} stocks "
+                      f"({result.vectorized} vectorized) in {time.time() - t0:.2f}s")
+        if pool:
+            print(pool.status())
+    finally:
+        if pool:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
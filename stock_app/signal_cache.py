@@ -12,11 +12,71 @@ from typing import List, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+from chip_engine import ChipEngine
 from data_loader import DataLoader
+from feature_context import FeatureContext
 from strong_strategies import StrongStrategies
 from weak_strategies import WeakStrategies
 
 
+STRONG_STRATEGY_NAMES = ["Z_Score", "RS", "TKOS", "DTR_Plus", "Fighting", "UA", "HMC"]
+WEAK_STRATEGY_NAMES = ["HLP3", "Limit", "RSI_Rev", "Spring", "Pinbar", "Money_Flow", "UA", "DBL_VOL"]
+
+
+def compute_stock_signals(code, name, df, index_df=None):
+    """
+    计算单只股票的强势/弱势信号（模块级函数，可在子进程中调用）
+    
+    :return: (strong_signals, weak_signals)，数据不足或计算失败时对应项为 None
+    """
+    strong_signals = None
+    weak_signals = None
+    if df is None or df.empty or len(df) < 100:  # 至少需要100天数据
+        return strong_signals, weak_signals
+    
+    # 强势/弱势策略共用同一份特征缓存
+    ctx = FeatureContext(df)
+    
+    # 计算强势策略信号
+    try:
+        strong_signals = StrongStrategies.check_all_strong_strategies(
+            df, index_df=index_df, ctx=ctx
+        )
+        
+        # 添加股票代码和名称
+        strong_signals['code'] = code
+        strong_signals['name'] = name
+        strong_signals['date'] = df['date'].values
+    except Exception as e:
+        strong_signals = None
+        print(f"⚠️ {code} 强势策略计算失败: {e}")
+    
+    # 计算弱势策略信号（HLP3 的获利盘比例由本地筹码模型给出）
+    try:
+        if 'winner_pct' not in df.columns:
+            df = ChipEngine.add_winner_pct(df)
+        weak_signals = WeakStrategies.check_all_weak_strategies(df, ctx=ctx)
+        
+        # 添加股票代码和名称
+        weak_signals['code'] = code
+        weak_signals['name'] = name
+        weak_signals['date'] = df['date'].values
+    except Exception as e:
+        weak_signals = None
+        print(f"⚠️ {code} 弱势策略计算失败: {e}")
+    
+    return strong_signals, weak_signals
+
+
+def default_date_range(start_date=None, end_date=None):
+    """默认从一年半前到今天（确保有足够数据计算指标）"""
+    if not end_date:
+        end_date = datetime.now().strftime("%Y-%m-%d")
+    if not start_date:
+        start_date = (datetime.now() - pd.Timedelta(days=550)).strftime("%Y-%m-%d")
+    return start_date, end_date
+
+
 class SignalCacheBuilder:
     """信号缓存构建器"""
     
@@ -29,6 +89,50 @@ class SignalCacheBuilder:
         if not os.path.exists(self.cache_dir):
             os.makedirs(self.cache_dir)
     
+    def load_index(self) -> Optional[pd.DataFrame]:
+        """加载上证指数数据（用于RS策略），不存在时返回 None"""
+        index_path = os.path.join(self.data_dir, "000001.SH.csv")
+        if os.path.exists(index_path):
+            try:
+                index_df = pd.read_csv(index_path)
+                index_df['date'] = pd.to_datetime(index_df['date'])
+                print("✅ 上证指数数据加载成功")
+                return index_df
+            except:
+                print("⚠️ 上证指数数据加载失败，RS策略将跳过")
+        return None
+    
+    def save_signals(self, strong_records: list, weak_records: list, start_date: str, end_date: str,
+                     total_stocks: int, extra_metadata: dict = None):
+        """合并各股票信号并写出 parquet 缓存与元数据"""
+        if strong_records:
+            strong_df = pd.concat(strong_records, ignore_index=True)
+            strong_path = os.path.join(self.cache_dir, "strong_signals.parquet")
+            strong_df.to_parquet(strong_path, index=False, compression='snappy')
+            print(f"✅ 强势信号缓存已保存: {len(strong_df)} 条记录")
+        
+        if weak_records:
+            weak_df = pd.concat(weak_records, ignore_index=True)
+            weak_path = os.path.join(self.cache_dir, "weak_signals.parquet")
+            weak_df.to_parquet(weak_path, index=False, compression='snappy')
+            print(f"✅ 弱势信号缓存已保存: {len(weak_df)} 条记录")
+        
+        # 保存元数据
+        metadata = {
+            "cache_version": "1.0",
+            "last_build_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "data_date_range": [start_date, end_date],
+            "total_stocks": total_stocks,
+            "strong_strategies": STRONG_STRATEGY_NAMES,
+            "weak_strategies": WEAK_STRATEGY_NAMES
+        }
+        if extra_metadata:
+            metadata.update(extra_metadata)
+        
+        metadata_path = os.path.join(self.cache_dir, "cache_metadata.json")
+        with open(metadata_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+    
     def build_all_signals(self, start_date: str = None, end_date: str = None, 
                          progress_callback=None) -> bool:
         """
@@ -41,7 +145,7 @@ class SignalCacheBuilder:
         """
         try:
             # 1. 获取股票列表
-            stock_list = self.loader.get_stock_list()
+            stock_list = self.loader.get_stock_list(exclude_dead=True)
             if stock_list.empty:
                 print("❌ 股票列表为空，请先下载数据")
                 return False
@@ -50,31 +154,27 @@ class SignalCacheBuilder:
             print(f"📊 开始构建信号缓存，共 {total_stocks} 只股票...")
             
             # 2. 确定日期范围
-            if not end_date:
-                end_date = datetime.now().strftime("%Y-%m-%d")
-            if not start_date:
-                # 默认从一年半前开始（确保有足够数据计算指标）
-                start_date = (datetime.now() - pd.Timedelta(days=550)).strftime("%Y-%m-%d")
+            start_date, end_date = default_date_range(start_date, end_date)
             
             # 3. 加载上证指数数据（用于RS策略）
-            index_df = None
-            index_path = os.path.join(self.data_dir, "000001.SH.csv")
-            if os.path.exists(index_path):
-                try:
-                    index_df = pd.read_csv(index_path)
-                    index_df['date'] = pd.to_datetime(index_df['date'])
-                    print("✅ 上证指数数据加载成功")
-                except:
-                    print("⚠️ 上证指数数据加载失败，RS策略将跳过")
+            index_df = self.load_index()
             
             # 4. 遍历计算
             strong_records = []
             weak_records = []
             
+            # 分批并发读取K线，摊薄文件IO与日期解析开销
+            batch_size = 200
+            all_codes = stock_list['code'].tolist()
+            batch = {}
+            
             for idx, row in stock_list.iterrows():
                 code = row['code']
                 name = row.get('name', '')
                 
+                if idx % batch_size == 0:
+                    batch = self.loader.get_k_data_many(all_codes[idx:idx + batch_size], start_date, end_date)
+                
                 # 进度回调
                 if progress_callback:
                     progress_callback(idx + 1, total_stocks, f"正在处理: {code} - {name}")
@@ -83,64 +183,15 @@ class SignalCacheBuilder:
                     print(f"进度: {idx + 1}/{total_stocks}")
                 
                 # 加载股票数据
-                df = self.loader.get_k_data(code, start_date, end_date)
-                if df.empty or len(df) < 100:  # 至少需要100天数据
-                    continue
-                
-                # 计算强势策略信号
-                try:
-                    strong_signals = StrongStrategies.check_all_strong_strategies(
-                        df, index_df=index_df
-                    )
-                    
-                    # 添加股票代码和名称
-                    strong_signals['code'] = code
-                    strong_signals['name'] = name
-                    strong_signals['date'] = df['date'].values
-                    
+                df = batch.get(str(code).zfill(6), pd.DataFrame())
+                strong_signals, weak_signals = compute_stock_signals(code, name, df, index_df)
+                if strong_signals is not None:
                     strong_records.append(strong_signals)
-                except Exception as e:
-                    print(f"⚠️ {code} 强势策略计算失败: {e}")
-                
-                # 计算弱势策略信号
-                try:
-                    weak_signals = WeakStrategies.check_all_weak_strategies(df)
-                    
-                    # 添加股票代码和名称
-                    weak_signals['code'] = code
-                    weak_signals['name'] = name
-                    weak_signals['date'] = df['date'].values
-                    
+                if weak_signals is not None:
                     weak_records.append(weak_signals)
-                except Exception as e:
-                    print(f"⚠️ {code} 弱势策略计算失败: {e}")
-            
-            # 5. 合并所有数据
-            if strong_records:
-                strong_df = pd.concat(strong_records, ignore_index=True)
-                strong_path = os.path.join(self.cache_dir, "strong_signals.parquet")
-                strong_df.to_parquet(strong_path, index=False, compression='snappy')
-                print(f"✅ 强势信号缓存已保存: {len(strong_df)} 条记录")
-            
-            if weak_records:
-                weak_df = pd.concat(weak_records, ignore_index=True)
-                weak_path = os.path.join(self.cache_dir, "weak_signals.parquet")
-                weak_df.to_parquet(weak_path, index=False, compression='snappy')
-                print(f"✅ 弱势信号缓存已保存: {len(weak_df)} 条记录")
-            
-            # 6. 保存元数据
-            metadata = {
-                "cache_version": "1.0",
-                "last_build_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "data_date_range": [start_date, end_date],
-                "total_stocks": total_stocks,
-                "strong_strategies": ["Z_Score", "RS", "TKOS", "DTR_Plus", "Fighting", "UA", "HMC"],
-                "weak_strategies": ["HLP3", "Limit", "RSI_Rev", "Spring", "Pinbar", "Money_Flow", "UA", "DBL_VOL"]
-            }
             
-            metadata_path = os.path.join(self.cache_dir, "cache_metadata.json")
-            with open(metadata_path, 'w', encoding='utf-8') as f:
-                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            # 5. 合并保存
+            self.save_signals(strong_records, weak_records, start_date, end_date, total_stocks)
             
             print("🎉 信号缓存构建完成！")
             return True
@@ -0,0 +1,195 @@
+"""
+Declarative registry of every strategy the app can scan.
+
+Each strategy declares its family ('screen' = Strategies.check_all, 'strong' =
+StrongStrategies, 'weak' = WeakStrategies), display name, signal column,
+required indicator columns, extra data inputs and warm-up lookback in trading
+bars. Scanners derive the minimal load range and feature set from the
+selection instead of loading a fixed 400 calendar days:
+
+    import strategy_registry as registry
+    specs = registry.select('weak', ['Limit', 'Pinbar'])
+    load_start = registry.load_start(scan_start, specs)     # ~5 weeks before scan_start
+    signals = registry.evaluate('weak', df, ['Limit', 'Pinbar'])
+
+Lookback = bars needed before the first scanned bar so that its signal is fully
+defined. Windowed indicators need their window (+1 for a shift). EMAs seed
+with the first loaded bar and never forget it completely:
+- MACD (EMA26 → DEA9): MACD_WARMUP bars, seed weight below 0.1%
+- EMA200 and cumulative values (CYC_Inf, chip distribution): LEGACY_WARMUP,
+  the ~260 bars the previous fixed 400-calendar-day window gave them
+- UA target high (strong/weak): the max-volume bar must itself have a full
+  250-bar window before it, UA_WARMUP = two windows
+
+    python stock_app/strategy_registry.py      # lookback / load window per strategy
+"""
+
+import datetime
+import math
+
+MACD_WARMUP = 120
+LEGACY_WARMUP = 260
+# UA target: the latest bar that was itself a 250-bar volume max, usually within two windows
+UA_WARMUP = 2 * 250
+# A-share trading days per calendar year, plus slack for holiday clusters (Spring Festival, National Day)
+TRADING_DAYS_PER_YEAR = 242
+CALENDAR_SLACK_DAYS = 10
+
+FAMILIES = ('screen', 'strong', 'weak')
+
+
+class StrategySpec:
+    """One strategy: where it lives and what it needs."""
+
+    def __init__(self, family, key, name, signal, lookback, features=(), inputs=()):
+        self.family = family
+        self.key = key                  # selection key used by the family's check function
+        self.name = name                # display name
+        self.signal = signal            # signal column in the family's result
+        self.lookback = lookback        # warm-up bars
+        self.features = list(features)  # Indicators columns (screen family)
+        self.inputs = list(inputs)      # extra data: 'winner_pct' (chip model), 'index' (market index)
+
+    def __repr__(self):
+        return f"StrategySpec({self.family}/{self.key}, lookback={self.lookback})"
+
+
+STRATEGIES = []
+_BY_KEY = {}
+_BY_SIGNAL = {}
+
+
+def register(family, key, name, lookback, features=(), inputs=(), signal=None):
+    if signal is None:
+        signal = key if family == 'screen' else f'Signal_{key}'
+    spec = StrategySpec(family, key, name, signal, lookback, features, inputs)
+    STRATEGIES.append(spec)
+    _BY_KEY[(family, key)] = spec
+    _BY_SIGNAL[(family, spec.signal)] = spec
+    return spec
+
+
+# --- Screening (Strategies.check_all, keys are the signal columns) ---
+register('screen', 'Signal_Fighting', "Fighting", 250 + 1, ['DIF', 'DEA', 'High_52', 'MA20'])
+register('screen', 'Signal_CYC_MAX', "CYC_MAX", LEGACY_WARMUP, ['CYC_Inf', 'CYC_13'])
+register('screen', 'Signal_RangeBreak', "RangeBreak", 250 + 1, ['High_52'])
+register('screen', 'Signal_20VMA', "20VMA", 20 + 5 + 1, ['Vol_MA20'])
+register('screen', 'Signal_HMC', "HMC", MACD_WARMUP + 5, ['MACD_Hist', 'MACD_Hist_MA5'])
+register('screen', 'Signal_HPS', "HPS", LEGACY_WARMUP, ['EMA200', 'EMA15'])
+# Previous month's return: up to two month ends back
+register('screen', 'Signal_TKOS', "TKOS", 45)
+# Last BU/SEL cross; the state only resets on the next cross
+register('screen', 'Signal_RKing', "RKing", 60, ['RKing_State'])
+register('screen', 'Signal_Limit', "Limit", 20, ['Vol_MA20'])
+register('screen', 'Signal_Boll_Rev', "Boll_Rev", 20 + 1, ['Boll_Mid', 'Boll_Upper'])
+register('screen', 'Signal_RSI2_Rev', "RSI2_Rev", 250, ['RSI2', 'MA250'])
+register('screen', 'Signal_2B', "2B", 20 + 1)
+register('screen', 'Signal_Wyckoff', "Wyckoff", 20 + 60, ['Vol_MA20'])
+register('screen', 'Signal_Spring', "Spring", 20 + 1, ['Vol_MA20'])
+register('screen', 'Signal_Pinbar', "Pinbar", 1, ['Lower_Shadow', 'Body', 'Range'])
+register('screen', 'Signal_ES', "ES", 120, ['Std20', 'Std60', 'Std120', 'Ret_20'])
+register('screen', 'Signal_UA', "UA", 250, ['High_52', 'Vol_MA20'])
+
+# --- Strong attack (StrongStrategies.check_all_strong_strategies) ---
+register('strong', 'Z_Score', "Z-score (标准分)", 20)
+register('strong', 'RS', "RS (相对强弱)", 20 + 1, inputs=['index'])
+register('strong', 'TKOS', "TKOS (股王)", 5 + 1)
+register('strong', 'DTR_Plus', "DTR Plus (共振)", MACD_WARMUP)
+register('strong', 'Fighting', "Fighting (突破)", MACD_WARMUP)
+register('strong', 'UA', "UA (天量)", UA_WARMUP)
+register('strong', 'HMC', "HMC (动量)", LEGACY_WARMUP)
+
+# --- Weak reversal (WeakStrategies.check_all_weak_strategies) ---
+register('weak', 'HLP3', "HLP3 (大慈悲点)", LEGACY_WARMUP, inputs=['winner_pct'])
+register('weak', 'Limit', "Limit (极致缩量)", 20 + 5)
+register('weak', 'RSI_Rev', "RSI 均值回归", LEGACY_WARMUP)
+register('weak', 'Spring', "Spring (弹簧)", 20 + 1)
+register('weak', 'Pinbar', "Pinbar (长钉)", 20)
+register('weak', 'Money_Flow', "Money Flow (资金背离)", 20 + 1)
+register('weak', 'UA', "UA (天量突破)", UA_WARMUP)
+# Double-volume setups are tracked by a state machine; older ones than this are not seen
+register('weak', 'Double_Vol', "倍量不破", 60)
+
+
+def get(family, key):
+    return _BY_KEY[(family, key)]
+
+
+def for_family(family):
+    return [s for s in STRATEGIES if s.family == family]
+
+
+def select(family, keys):
+    """Specs for the selected keys (screen family: keys are signal columns)."""
+    return [_BY_KEY[(family, k)] for k in keys]
+
+
+def select_signals(family, signals):
+    return [_BY_SIGNAL[(family, s)] for s in signals]
+
+
+def required_features(specs):
+    """Indicator columns for Indicators.compute, in first-use order."""
+    required = []
+    for spec in specs:
+        for col in spec.features:
+            if col not in required:
+                required.append(col)
+    return required
+
+
+def required_inputs(specs):
+    return sorted({i for spec in specs for i in spec.inputs})
+
+
+def lookback(specs):
+    """Warm-up bars of the selection (at least one bar)."""
+    return max([1] + [spec.lookback for spec in specs])
+
+
+def bars_to_days(bars):
+    """Calendar days that contain ``bars`` trading bars."""
+    return math.ceil(bars * 365 / TRADING_DAYS_PER_YEAR) + CALENDAR_SLACK_DAYS
+
+
+def load_start(scan_start, specs):
+    """First date to load so every selected signal is defined from ``scan_start`` on."""
+    if isinstance(scan_start, str):
+        scan_start = datetime.datetime.strptime(scan_start, "%Y-%m-%d").date()
+    return scan_start - datetime.timedelta(days=bars_to_days(lookback(specs)))
+
+
+def evaluate(family, df, keys, index_df=None, ctx=None, winner_col='winner_pct'):
+    """
+    Signals of the selected strategies of one family on one stock.
+
+    The screen family adds its required indicators first; strong/weak compute
+    theirs from OHLCV through a shared FeatureContext.
+    """
+    if family == 'screen':
+        from indicators import Indicators
+        from strategies import Strategies
+        df = Indicators.compute(df, required_features(select(family, keys)))
+        return Strategies.check_all(df, list(keys))
+    if family == 'strong':
+        from strong_strategies import StrongStrategies
+        return StrongStrategies.check_all_strong_strategies(df, index_df=index_df, selected_strategies=list(keys),
+                                                            ctx=ctx)
+    if family == 'weak':
+        from weak_strategies import WeakStrategies
+        return WeakStrategies.check_all_weak_strategies(df, selected_strategies=list(keys), winner_col=winner_col,
+                                                        ctx=ctx)
+    raise ValueError(f"Unknown strategy family: {family}")
+
+
+def main():
+    today = datetime.date.today()
+    for family in FAMILIES:
+        print(f"[{family}]")
+        for spec in for_family(family):
+            print(f"  {spec.name:24s} lookback {spec.lookback:4d} bars  "
+                  f"load from {load_start(today, [spec])} ({bars_to_days(spec.lookback)} days)")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,16 @@ Royal 强势股进攻策略模块
 import pandas as pd
 import numpy as np
 
+import jit_kernels
+import kernels
+from feature_context import FeatureContext
+
 
 class StrongStrategies:
     """强势股进攻策略集合"""
     
     @staticmethod
-    def calculate_z_score(df, period=20):
+    def calculate_z_score(df, period=20, ctx=None):
         """
         计算 Z-score 指标
         
@@ -21,25 +25,27 @@ class StrongStrategies:
         
         :param df: 包含 'close' 的 DataFrame
         :param period: 周期，默认为20
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含 Z-score 及其信号的 DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 计算均值和标准差
-        df['MA20'] = df['close'].rolling(window=period).mean()
-        df['STD20'] = df['close'].rolling(window=period).std()
+        out['MA20'] = ctx.ma(period)
+        out['STD20'] = ctx.std(period)
         
         # 计算 Z-score (防止除以0)
-        df['Z_Score'] = (df['close'] - df['MA20']) / df['STD20'].replace(0, np.nan)
+        out['Z_Score'] = (df['close'] - out['MA20']) / out['STD20'].replace(0, np.nan)
         
         # 生成信号
         # 强势信号：1.5 < Z <= 3
-        df['Z_Signal'] = np.where((df['Z_Score'] > 1.5) & (df['Z_Score'] <= 3), True, False)
+        out['Z_Signal'] = np.where((out['Z_Score'] > 1.5) & (out['Z_Score'] <= 3), True, False)
         
         # 过热预警：Z > 3
-        df['Z_Overheat'] = np.where(df['Z_Score'] > 3, True, False)
+        out['Z_Overheat'] = np.where(out['Z_Score'] > 3, True, False)
         
-        return df
+        return out
     
     @staticmethod
     def calculate_rs_strategy(stock_df, index_df, period=20, num_std=2):
@@ -55,13 +61,13 @@ class StrongStrategies:
         :param num_std: 布林带标准差倍数，默认2
         :return: 包含 RS 及其布林带信号的 DataFrame
         """
-        stock_df = stock_df.copy()
+        out = pd.DataFrame(index=stock_df.index)
         
         # 确保两个df都有date列
         if 'date' not in stock_df.columns or 'date' not in index_df.columns:
             # 如果没有date列，返回空信号
-            stock_df['RS_Breakout'] = False
-            return stock_df
+            out['RS_Breakout'] = False
+            return out
         
         # 按日期合并股票和大盘数据
         merged = pd.merge(
@@ -79,8 +85,9 @@ class StrongStrategies:
         merged['RS'] = (merged['close_stock'] / merged['close_index']) * 1000
         
         # 2. 计算 RS 的布林带
-        merged['RS_MA'] = merged['RS'].rolling(window=period).mean()
-        merged['RS_STD'] = merged['RS'].rolling(window=period).std()
+        rs_stats = kernels.PrefixStats(merged['RS'])
+        merged['RS_MA'] = rs_stats.mean(period)
+        merged['RS_STD'] = rs_stats.std(period)
         merged['RS_Upper'] = merged['RS_MA'] + (merged['RS_STD'] * num_std)
         merged['RS_Lower'] = merged['RS_MA'] - (merged['RS_STD'] * num_std)
         
@@ -89,10 +96,10 @@ class StrongStrategies:
         merged['RS_Breakout'] = (merged['RS'] > merged['RS_Upper']) & \
                                 (merged['RS'].shift(1) <= merged['RS_Upper'].shift(1))
         
-        # 将结果合并回原始df
-        stock_df['RS_Breakout'] = merged['RS_Breakout'].values
+        # 将结果对齐回原始df
+        out['RS_Breakout'] = merged['RS_Breakout'].values
         
-        return stock_df
+        return out
     
     @staticmethod
     def calculate_tkos(df):
@@ -105,19 +112,19 @@ class StrongStrategies:
         :param df: 包含 'close' 的 DataFrame
         :return: 包含 TKOS 信号的 DataFrame
         """
-        df = df.copy()
+        out = pd.DataFrame(index=df.index)
         
         # 计算5日累计涨幅 (近似一周)
         # (当前收盘 - 5天前收盘) / 5天前收盘
-        df['Week_Pct_Change'] = df['close'].pct_change(periods=5)
+        out['Week_Pct_Change'] = df['close'].pct_change(periods=5)
         
         # 信号：涨幅 > 50%
-        df['TKOS_Signal'] = df['Week_Pct_Change'] > 0.50
+        out['TKOS_Signal'] = out['Week_Pct_Change'] > 0.50
         
-        return df
+        return out
     
     @staticmethod
-    def calculate_dtr_plus(df, ma_period=20, boll_std=2):
+    def calculate_dtr_plus(df, ma_period=20, boll_std=2, ctx=None):
         """
         计算 DTR Plus 策略（高胜率共振）
         
@@ -127,39 +134,36 @@ class StrongStrategies:
         :param df: 包含 OHLC 和 volume 的 DataFrame
         :param ma_period: MA周期，默认20
         :param boll_std: 布林带标准差倍数，默认2
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含 DTR Plus 信号的 DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
-        # 1. 计算 MACD (12, 26, 9)
-        ema12 = df['close'].ewm(span=12, adjust=False).mean()
-        ema26 = df['close'].ewm(span=26, adjust=False).mean()
-        diff = ema12 - ema26
-        dea = diff.ewm(span=9, adjust=False).mean()
-        df['MACD_Hist'] = 2 * (diff - dea)
+        # 1. MACD (12, 26, 9)
+        out['MACD_Hist'] = ctx.macd_hist()
         
         # DTR翻红信号 (当前红柱，昨日绿柱)
-        df['DTR_Red'] = (df['MACD_Hist'] > 0) & (df['MACD_Hist'].shift(1) <= 0)
+        out['DTR_Red'] = (out['MACD_Hist'] > 0) & (out['MACD_Hist'].shift(1) <= 0)
         
-        # 2. 计算 MA20
-        df['MA20'] = df['close'].rolling(window=ma_period).mean()
+        # 2. MA20
+        out['MA20'] = ctx.ma(ma_period)
         
         # 3. 计算布林上轨
-        std20 = df['close'].rolling(window=ma_period).std()
-        df['Boll_Upper'] = df['MA20'] + (std20 * boll_std)
+        out['Boll_Upper'] = out['MA20'] + (ctx.std(ma_period) * boll_std)
         
         # 4. 综合信号 (三合一)
         # MACD是红柱状态，价格在MA20之上，价格触碰或突破上轨
-        condition1 = df['MACD_Hist'] > 0
-        condition2 = df['close'] > df['MA20']
-        condition3 = df['close'] >= df['Boll_Upper']
+        condition1 = out['MACD_Hist'] > 0
+        condition2 = df['close'] > out['MA20']
+        condition3 = df['close'] >= out['Boll_Upper']
         
-        df['DTR_Plus_Signal'] = condition1 & condition2 & condition3
+        out['DTR_Plus_Signal'] = condition1 & condition2 & condition3
         
-        return df
+        return out
     
     @staticmethod
-    def calculate_fighting_strategy(df, period=52):
+    def calculate_fighting_strategy(df, period=52, ctx=None):
         """
         计算 Fighting 策略 (三合一突破)
         
@@ -167,35 +171,33 @@ class StrongStrategies:
         
         :param df: 包含 OHLC 和 volume 的 DataFrame
         :param period: 新高周期，默认52日
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含 Fighting 信号的 DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 1. MACD DTR
-        ema12 = df['close'].ewm(span=12, adjust=False).mean()
-        ema26 = df['close'].ewm(span=26, adjust=False).mean()
-        diff = ema12 - ema26
-        dea = diff.ewm(span=9, adjust=False).mean()
-        df['MACD_Hist'] = 2 * (diff - dea)
+        out['MACD_Hist'] = ctx.macd_hist()
         
         # DTR 红柱状态
-        is_dtr_red = df['MACD_Hist'] > 0
+        is_dtr_red = out['MACD_Hist'] > 0
         
         # 2. 52日价格新高 (突破前52天的最高价)
-        highest_price_52 = df['high'].rolling(window=period).max().shift(1)
+        highest_price_52 = ctx.rolling_max('high', period).shift(1)
         price_breakout = df['close'] > highest_price_52
         
         # 3. 52日成交量新高
-        highest_vol_52 = df['volume'].rolling(window=period).max().shift(1)
+        highest_vol_52 = ctx.rolling_max('volume', period).shift(1)
         vol_breakout = df['volume'] > highest_vol_52
         
         # 4. Fighting 信号
-        df['Fighting_Signal'] = is_dtr_red & price_breakout & vol_breakout
+        out['Fighting_Signal'] = is_dtr_red & price_breakout & vol_breakout
         
-        return df
+        return out
     
     @staticmethod
-    def calculate_ua_strategy(df, period=250):
+    def calculate_ua_strategy(df, period=250, ctx=None):
         """
         计算 UA 天量策略 (Ultimate Amount)
         
@@ -204,31 +206,30 @@ class StrongStrategies:
         
         :param df: 包含 OHLC 和 volume 的 DataFrame
         :param period: 天量检测周期，默认250日
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含 UA 信号的 DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 1. 定义天量 (250日内最大成交量)
-        df['Rolling_Max_Vol'] = df['volume'].rolling(window=period).max()
-        df['Is_UA'] = df['volume'] == df['Rolling_Max_Vol']
+        out['Rolling_Max_Vol'] = ctx.rolling_max('volume', period)
         
-        # 2. 记录天量日的最高价 (UA_High)
-        # 如果是UA日，记录High，否则NaN，然后向下填充
-        df['UA_Target_Price'] = np.where(df['Is_UA'], df['high'], np.nan)
-        df['UA_Target_Price'] = df['UA_Target_Price'].ffill()
+        # 2. 记录最近一次天量日的最高价 (UA_High)
+        out['Is_UA'], out['UA_Target_Price'] = jit_kernels.ua_target_high(df['volume'], df['high'], period)
         
         # 3. 突破信号
         # 当前收盘价突破最近一次天量的最高价
         # 且当前不是天量当日 (避免当日追高)
-        df['UA_Breakout'] = (df['close'] > df['UA_Target_Price']) & (df['Is_UA'] == False)
+        out['UA_Breakout'] = (df['close'] > out['UA_Target_Price']) & (out['Is_UA'] == False)
         
         # 过滤连续信号：只看刚突破的那一天
-        df['UA_Buy_Signal'] = df['UA_Breakout'] & (df['UA_Breakout'].shift(1) == False)
+        out['UA_Buy_Signal'] = out['UA_Breakout'] & (out['UA_Breakout'].shift(1) == False)
         
-        return df
+        return out
     
     @staticmethod
-    def calculate_hmc_strategy(df):
+    def calculate_hmc_strategy(df, ctx=None):
         """
         计算 HMC 策略 (High-Momentum Channel)
         
@@ -238,43 +239,47 @@ class StrongStrategies:
         - 信号 = 红线上穿黄线 (动能强劲)
         
         :param df: 包含 OHLC 的 DataFrame
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含 HMC 信号的 DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 1. 黄线: 50日最高价 - 收盘价
-        hhv_50 = df['high'].rolling(window=50).max()
-        df['HMC_Yellow'] = hhv_50 - df['close']
+        out['HMC_Yellow'] = ctx.rolling_max('high', 50) - df['close']
         
         # 2. 红线: 收盘价 - EMA200
-        ema_200 = df['close'].ewm(span=200, adjust=False).mean()
-        df['HMC_Red'] = df['close'] - ema_200
+        out['HMC_Red'] = df['close'] - ctx.ema(200)
         
         # 3. 信号: 红线上穿黄线
         # 今天红 > 黄 且 昨天 红 <= 黄
-        df['HMC_Signal'] = (df['HMC_Red'] > df['HMC_Yellow']) & \
-                           (df['HMC_Red'].shift(1) <= df['HMC_Yellow'].shift(1))
+        out['HMC_Signal'] = (out['HMC_Red'] > out['HMC_Yellow']) & \
+                            (out['HMC_Red'].shift(1) <= out['HMC_Yellow'].shift(1))
         
-        return df
+        return out
     
     @staticmethod
-    def check_all_strong_strategies(df, index_df=None, selected_strategies=None):
+    def check_all_strong_strategies(df, index_df=None, selected_strategies=None, ctx=None):
         """
         检查所有强势股策略
         
         :param df: 个股数据 DataFrame
         :param index_df: 大盘指数数据 DataFrame (用于RS策略)
         :param selected_strategies: 选中的策略列表，如 ['Z_Score', 'RS', 'Fighting']
+        :param ctx: 可选的 FeatureContext，传入后可与弱势策略共享特征
         :return: 包含所有策略信号的 DataFrame
         """
         if selected_strategies is None:
             selected_strategies = ['Z_Score', 'RS', 'TKOS', 'DTR_Plus', 'Fighting', 'UA', 'HMC']
         
+        # 每只股票的 MACD / MA20 / 滚动高点只计算一次，各策略共用
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        
         signals = pd.DataFrame(index=df.index)
         
         # Z-score
         if 'Z_Score' in selected_strategies:
-            z_result = StrongStrategies.calculate_z_score(df)
+            z_result = StrongStrategies.calculate_z_score(df, ctx=ctx)
             signals['Signal_Z_Score'] = z_result['Z_Signal']
         
         # RS (需要大盘数据)
@@ -289,22 +294,22 @@ class StrongStrategies:
         
         # DTR Plus
         if 'DTR_Plus' in selected_strategies:
-            dtr_result = StrongStrategies.calculate_dtr_plus(df)
+            dtr_result = StrongStrategies.calculate_dtr_plus(df, ctx=ctx)
             signals['Signal_DTR_Plus'] = dtr_result['DTR_Plus_Signal']
         
         # Fighting
         if 'Fighting' in selected_strategies:
-            fighting_result = StrongStrategies.calculate_fighting_strategy(df)
+            fighting_result = StrongStrategies.calculate_fighting_strategy(df, ctx=ctx)
             signals['Signal_Fighting'] = fighting_result['Fighting_Signal']
         
         # UA
         if 'UA' in selected_strategies:
-            ua_result = StrongStrategies.calculate_ua_strategy(df)
+            ua_result = StrongStrategies.calculate_ua_strategy(df, ctx=ctx)
             signals['Signal_UA'] = ua_result['UA_Buy_Signal']
         
         # HMC
         if 'HMC' in selected_strategies:
-            hmc_result = StrongStrategies.calculate_hmc_strategy(df)
+            hmc_result = StrongStrategies.calculate_hmc_strategy(df, ctx=ctx)
             signals['Signal_HMC'] = hmc_result['HMC_Signal']
         
         return signals
@@ -0,0 +1,107 @@
+"""
+Per-symbol download manifest (negative cache).
+
+Records consecutive download failures and the last good bar date for every
+symbol in ``<data_dir>/symbol_manifest.json``. Symbols that keep failing
+(B-shares, PT and delisted names still present in stock_list.csv) are skipped
+for ``skip_days`` instead of burning a timeout/retry slot on every run, and
+can be excluded from scan universes via ``DataLoader.get_stock_list(exclude_dead=True)``.
+
+Only "no data" answers count as failures (record_failure). Transport errors
+(timeouts, resets, 5xx) say nothing about the symbol and go to record_error,
+so an outage cannot mark the whole market dead. A symbol with a recent good
+bar or a recently written CSV is never dead.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, date
+
+MANIFEST_FILE = "symbol_manifest.json"
+
+
+class SymbolManifest:
+    """Persisted negative cache of dead / unsupported symbols."""
+
+    def __init__(self, data_dir="stock_app/data/market_data", skip_days=7, min_failures=2, recent_days=30):
+        """
+        :param skip_days: how long a dead symbol is skipped after its last failure
+        :param min_failures: consecutive failures before a symbol counts as dead
+        :param recent_days: a good bar or CSV write within this many days keeps a symbol alive
+        """
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, MANIFEST_FILE)
+        self.skip_days = skip_days
+        self.min_failures = min_failures
+        self.recent_days = recent_days
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"[SymbolManifest] 清单读取失败，重新开始记录: {e}")
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+    def record_failure(self, code, reason=""):
+        """The source answered but had no data for ``code``: one strike towards dead."""
+        with self._lock:
+            entry = self.entries.setdefault(str(code), {'failures': 0, 'last_good_date': None})
+            entry['failures'] += 1
+            entry['last_failure'] = date.today().isoformat()
+            entry['reason'] = reason[:200]
+
+    def record_error(self, code, reason=""):
+        """Transport error (timeout, reset, 5xx): noted, but not a strike."""
+        with self._lock:
+            entry = self.entries.setdefault(str(code), {'failures': 0, 'last_good_date': None})
+            entry['last_error'] = date.today().isoformat()
+            entry['error'] = reason[:200]
+
+    def record_success(self, code, last_good_date=None):
+        with self._lock:
+            entry = self.entries.setdefault(str(code), {})
+            entry['failures'] = 0
+            for key in ('last_failure', 'reason', 'last_error', 'error'):
+                entry.pop(key, None)
+            if last_good_date is not None:
+                entry['last_good_date'] = str(last_good_date)[:10]
+            else:
+                entry.setdefault('last_good_date', None)
+
+    def is_dead(self, code, today=None):
+        """
+        True if ``code`` failed ``min_failures`` times in a row within the last ``skip_days``
+        and has neither a good bar nor a CSV write within ``recent_days``.
+        """
+        entry = self.entries.get(str(code))
+        if not entry or entry.get('failures', 0) < self.min_failures or not entry.get('last_failure'):
+            return False
+        today = today or date.today()
+        last_failure = datetime.strptime(entry['last_failure'], "%Y-%m-%d").date()
+        if (today - last_failure).days >= self.skip_days:
+            return False
+        return not self._recently_alive(code, entry, today)
+
+    def _recently_alive(self, code, entry, today):
+        if entry.get('last_good_date'):
+            last_good = datetime.strptime(entry['last_good_date'][:10], "%Y-%m-%d").date()
+            if (today - last_good).days < self.recent_days:
+                return True
+        csv_path = os.path.join(self.data_dir, f"{code}.csv")
+        if os.path.exists(csv_path):
+            written = datetime.fromtimestamp(os.path.getmtime(csv_path)).date()
+            if (today - written).days < self.recent_days:
+                return True
+        return False
+
+    def dead_codes(self, today=None):
+        return {code for code in self.entries if self.is_dead(code, today)}
@@ -0,0 +1,165 @@
+"""
+TA-Lib backend for Indicators (optional, ``pip install ta-lib``).
+
+    from indicators import Indicators
+    Indicators.set_backend('talib')     # verifies parity first, falls back to pandas on failure
+    Indicators.set_backend('pandas')
+
+Routes MA, RSI, Bollinger Bands, Williams %R and CCI to TA-Lib's C functions.
+Everything else keeps the pandas/numpy path.
+
+EMA, MACD and KDJ stay on pandas ``ewm(adjust=False)``: TA-Lib seeds an EMA
+with the SMA of its first ``span`` values (NaN before that) while pandas seeds
+with the first value. The gap only decays by (1 - alpha) per bar, and scans
+load ~260 bars (strategy_registry.LEGACY_WARMUP), so EMA200 would be NaN for
+the first 199 bars and still carry the seed at the last one, changing
+HPS/HMC signals.
+
+Known differences from the pandas path (bounded by PARITY_BOUNDS and checked
+by ``verify`` from the first bar, no warm-up excluded):
+- RSI: ``talib.RSI`` is Wilder's RSI (recursive smoothing of gains/losses),
+  which differs from the repo's SMA-style RSI by tens of points on RSI2. To
+  keep the strategy thresholds meaningful the backend builds the SMA-style RSI
+  from ``talib.SMA`` of gains and losses instead (exact up to rounding).
+- Bollinger: ``talib.BBANDS`` uses the population standard deviation; nbdev is
+  scaled by sqrt(n / (n - 1)) to reproduce the sample std (ddof=1) bands.
+- MA, WILLR, CCI: same definitions, rounding-level differences only.
+
+    python stock_app/talib_backend.py     # print the parity report
+"""
+
+import numpy as np
+import pandas as pd
+
+# column -> (rtol, atol)
+PARITY_BOUNDS = {
+    'MA5': (1e-9, 1e-9), 'MA20': (1e-9, 1e-9), 'MA250': (1e-9, 1e-9),
+    'Vol_MA20': (1e-9, 1e-6),
+    'Boll_Mid': (1e-9, 1e-9), 'Boll_Upper': (1e-7, 1e-7), 'Boll_Lower': (1e-7, 1e-7),
+    'RSI2': (1e-7, 1e-7), 'RSI6': (1e-7, 1e-7),
+    'WR': (1e-7, 1e-7), 'CCI': (1e-6, 1e-6),
+}
+
+
+def _talib():
+    import talib
+    return talib
+
+
+def available():
+    try:
+        _talib()
+        return True
+    except ImportError:
+        return False
+
+
+def _arr(s):
+    return np.asarray(s, dtype=np.float64)
+
+
+def _series(values, like):
+    return pd.Series(values, index=like.index)
+
+
+def sma(s, n):
+    return _series(_talib().SMA(_arr(s), timeperiod=n), s)
+
+
+def rsi(close, period):
+    """SMA-style RSI (same definition as Indicators.calculate_rsi) from talib.SMA."""
+    delta = np.diff(_arr(close), prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    ta = _talib()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = ta.SMA(gain, timeperiod=period) / ta.SMA(loss, timeperiod=period)
+        return _series(100 - (100 / (1 + rs)), close)
+
+
+def bbands(close, n=20, k=2):
+    """(mid, upper, lower) with sample-std (ddof=1) bands."""
+    nbdev = k * np.sqrt(n / (n - 1))
+    upper, mid, lower = _talib().BBANDS(_arr(close), timeperiod=n, nbdevup=nbdev, nbdevdn=nbdev, matype=0)
+    return _series(mid, close), _series(upper, close), _series(lower, close)
+
+
+def willr(high, low, close, n=14):
+    return _series(_talib().WILLR(_arr(high), _arr(low), _arr(close), timeperiod=n), close)
+
+
+def cci(high, low, close, n=14):
+    return _series(_talib().CCI(_arr(high), _arr(low), _arr(close), timeperiod=n), close)
+
+
+def compute(df):
+    """Every column in PARITY_BOUNDS computed with TA-Lib."""
+    out = {}
+    for n in (5, 20, 250):
+        out[f'MA{n}'] = sma(df['close'], n)
+    out['Vol_MA20'] = sma(df['volume'], 20)
+    out['Boll_Mid'], out['Boll_Upper'], out['Boll_Lower'] = bbands(df['close'])
+    out['RSI2'] = rsi(df['close'], 2)
+    out['RSI6'] = rsi(df['close'], 6)
+    out['WR'] = willr(df['high'], df['low'], df['close'])
+    out['CCI'] = cci(df['high'], df['low'], df['close'])
+    return out
+
+
+def _synthetic_frame(n=1500, seed=7):
+    rng = np.random.default_rng(seed)
+    c = np.round(np.exp(np.cumsum(rng.normal(0, 0.02, n))) * 20, 2)
+    o = np.round(c * (1 + rng.normal(0, 0.01, n)), 2)
+    h = np.maximum(o, c) + np.round(np.abs(rng.normal(0, 0.1, n)), 2)
+    l = np.minimum(o, c) - np.round(np.abs(rng.normal(0, 0.1, n)), 2)
+    v = rng.integers(1_000, 1_000_000, n).astype(float)
+    return pd.DataFrame({'date': pd.bdate_range('2018-01-02', periods=n), 'open': o, 'high': h,
+                         'low': l, 'close': c, 'volume': v, 'amount': v * c * 100})
+
+
+def verify(df=None):
+    """
+    Compare the TA-Lib columns with the pandas backend on ``df`` (default: a
+    1,500-bar synthetic series) and on a fresh frame of its last
+    ``strategy_registry.LEGACY_WARMUP`` bars, the window a scan actually loads.
+    Every bar counts, including the first ones.
+
+    :return: DataFrame (column, max_abs_diff, max_rel_diff, ok)
+    """
+    from indicators import Indicators
+    from strategy_registry import LEGACY_WARMUP
+
+    df = _synthetic_frame() if df is None else df
+    frames = [df, df.tail(LEGACY_WARMUP).reset_index(drop=True)]
+    stats = {name: {'max_abs_diff': 0.0, 'max_rel_diff': 0.0, 'ok': True} for name in PARITY_BOUNDS}
+    for frame in frames:
+        reference = Indicators.compute(frame, list(PARITY_BOUNDS))
+        got = compute(frame)
+        for name, (rtol, atol) in PARITY_BOUNDS.items():
+            a = reference[name].to_numpy(dtype=np.float64)
+            b = got[name].to_numpy(dtype=np.float64)
+            both = np.isfinite(a) & np.isfinite(b)
+            abs_diff = np.abs(a - b)[both]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rel_diff = (abs_diff / np.abs(a[both]))
+            # Both backends must define the same bars
+            ok = np.array_equal(np.isnan(a), np.isnan(b)) and bool(np.all(abs_diff <= atol + rtol * np.abs(a[both])))
+            row = stats[name]
+            row['max_abs_diff'] = max(row['max_abs_diff'], float(abs_diff.max()) if len(abs_diff) else 0.0)
+            row['max_rel_diff'] = max(row['max_rel_diff'], float(np.nanmax(rel_diff)) if len(rel_diff) else 0.0)
+            row['ok'] = row['ok'] and ok
+    return pd.DataFrame([{'column': name, **row} for name, row in stats.items()])
+
+
+def main():
+    if not available():
+        print("TA-Lib 未安装 (pip install ta-lib)，Indicators 使用 pandas 后端")
+        return
+    report = verify()
+    pd.set_option('display.width', 120)
+    print(report.to_string(index=False))
+    print("Parity:", "OK" if report['ok'].all() else "FAILED")
+
+
+if __name__ == "__main__":
+    main()
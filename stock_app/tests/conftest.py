@@ -0,0 +1,5 @@
+import os
+import sys
+
+# stock_app modules import each other by bare name (streamlit run stock_app/app.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+"""Streaming indicator state (indicator_state) against the full add_all_indicators recomputation."""
+
+import pytest
+
+import indicator_state
+from indicator_state import IndicatorStateStore
+from indicators import Indicators
+
+# Streaming starts at bar 90: the flat stretch (100-111) and the zero-volume day (150)
+# of the synthetic frame are both advanced through update()
+WARMUP = 90
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_update_matches_full_recomputation(seed):
+    df = indicator_state._synthetic_frame(400, seed)
+    assert indicator_state.compare_with_full(df, WARMUP) == {}
+
+
+def test_suspension_gap():
+    # Suspended days have no bar at all: drop a block of rows
+    df = indicator_state._synthetic_frame(400, 3)
+    df = df.drop(index=range(120, 140)).reset_index(drop=True)
+    assert indicator_state.compare_with_full(df, WARMUP) == {}
+
+
+def test_without_amount():
+    df = indicator_state._synthetic_frame(400, 4).drop(columns='amount')
+    assert indicator_state.compare_with_full(df, WARMUP) == {}
+
+
+def test_store_round_trip(tmp_path):
+    df = indicator_state._synthetic_frame(400, 5)
+    store = IndicatorStateStore(str(tmp_path))
+    store.save("1", Indicators.init_state(df.iloc[:-1]))
+    state = store.load("000001")
+    assert state is not None
+
+    full = Indicators.add_all_indicators(df)
+    row = Indicators.update(state, df.iloc[-1].to_dict())
+    for name, value in row.items():
+        expected = full[name].iloc[-1]
+        assert value == pytest.approx(expected, rel=1e-8, abs=1e-10, nan_ok=True), name
+
+    # Saving the advanced state and loading it again gives the same next bar
+    store.save("000001", state)
+    bar = df.iloc[-1].to_dict()
+    reloaded = Indicators.update(store.load("000001"), bar)
+    assert reloaded == pytest.approx(Indicators.update(state, bar), nan_ok=True)
+
+
+def test_store_rejects_other_version(tmp_path):
+    store = IndicatorStateStore(str(tmp_path))
+    state = Indicators.init_state(indicator_state._synthetic_frame(300, 6))
+    state['version'] = indicator_state.STATE_VERSION + 1
+    store.save("000002", state)
+    assert store.load("000002") is None
+
+
+def _assert_row_matches(row, df):
+    full = Indicators.add_all_indicators(df)
+    for name, value in row.items():
+        assert value == pytest.approx(full[name].iloc[-1], rel=1e-8, abs=1e-10, nan_ok=True), name
+
+
+def test_sync_streams_new_bars(tmp_path):
+    df = indicator_state._synthetic_frame(400, 7)
+    store = IndicatorStateStore(str(tmp_path))
+    # First sync builds the state, later ones stream only the bars after its last bar
+    _assert_row_matches(store.sync("000003", df.iloc[:300]), df.iloc[:300])
+    _assert_row_matches(store.sync("000003", df.iloc[250:303]), df.iloc[:303])
+    _assert_row_matches(store.sync("000003", df.iloc[302:304]), df.iloc[:304])
+    assert store.load("000003")['last_date'] == str(df['date'].iloc[303])[:10]
+
+
+def test_sync_rebuilds_when_history_changed(tmp_path):
+    df = indicator_state._synthetic_frame(400, 8)
+    store = IndicatorStateStore(str(tmp_path))
+    store.sync("000004", df.iloc[:300])
+
+    # qfq re-adjustment: every stored price moved
+    adjusted = df.copy()
+    adjusted[['open', 'high', 'low', 'close']] *= 0.9
+    _assert_row_matches(store.sync("000004", adjusted.iloc[:301]), adjusted.iloc[:301])
+
+    # Missed days: the state's last bar is not in the new rows, the full history is read instead
+    row = store.sync("000004", df.iloc[350:352], history=lambda: df.iloc[:352])
+    _assert_row_matches(row, df.iloc[:352])
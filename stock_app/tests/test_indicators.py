@@ -0,0 +1,28 @@
+"""Indicator dependency graph (indicators.feature declarations)."""
+
+import numpy as np
+import pytest
+
+import indicator_state
+from indicators import BASE_COLUMNS, FEATURES, Indicators
+
+
+def _base_inputs(outputs):
+    """K-line columns the features behind ``outputs`` declare, dependencies included."""
+    return {col for node in Indicators.resolve(outputs) for col in node.inputs if col in BASE_COLUMNS}
+
+
+@pytest.mark.parametrize("node", FEATURES, ids=lambda node: node.name)
+def test_declared_inputs_are_sufficient(node):
+    # A frame projected onto the declared inputs must give the same values as the full frame
+    df = indicator_state._synthetic_frame(300, 0)
+    full = Indicators.compute(df, node.outputs)
+    projected = Indicators.compute(df[['date'] + sorted(_base_inputs(node.outputs))], node.outputs)
+    for col in node.outputs:
+        np.testing.assert_array_equal(projected[col].to_numpy(dtype=np.float64),
+                                      full[col].to_numpy(dtype=np.float64), err_msg=col)
+
+
+def test_cyc_declares_amount():
+    # CYC reads amount: a projection built from the declarations must keep it
+    assert {'volume', 'amount'} <= _base_inputs(['CYC_13', 'CYC_Inf'])
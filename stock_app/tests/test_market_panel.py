@@ -0,0 +1,75 @@
+"""Market panel build/publish (market_panel)."""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from market_panel import MarketPanel, META_FILE
+
+
+class FrameLoader:
+    """Stands in for DataLoader: get_stock_list / get_k_data over in-memory frames."""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def get_stock_list(self):
+        return pd.DataFrame({'code': list(self.frames)})
+
+    def get_k_data(self, code, start_date, end_date):
+        df = self.frames[code]
+        return df[(df['date'] >= pd.Timestamp(start_date)) & (df['date'] <= pd.Timestamp(end_date))]
+
+
+def _frames(codes, days, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2024-01-02', periods=days)
+    frames = {}
+    for code in codes:
+        c = np.round(10 + np.cumsum(rng.normal(0, 0.1, days)), 2)
+        frames[code] = pd.DataFrame({'date': dates, 'open': c, 'high': c + 0.1, 'low': c - 0.1, 'close': c,
+                                     'volume': rng.integers(1, 1000, days).astype(float), 'amount': c * 100})
+    return frames
+
+
+def _build(panel_dir, frames):
+    return MarketPanel.build(FrameLoader(frames), str(panel_dir), start_date="2024-01-01", end_date="2025-12-31")
+
+
+def test_rebuild_publishes_new_data_file(tmp_path):
+    first = _frames(['600000', '600001'], 30)
+    old = _build(tmp_path, first)
+    old_view = old.view()
+
+    second = _frames(['600000', '600001', '600002'], 40, seed=1)
+    new = _build(tmp_path, second)
+
+    assert old.is_stale()
+    assert new.meta['data_file'] != old.meta['data_file']
+    assert new.view().shape == (3, 40, 6)
+    pd.testing.assert_frame_equal(new.view().to_frame('600002'), second['600002'], check_freq=False)
+    # The old handle still reads the old build, with its own shape
+    assert old_view.shape == (2, 30, 6)
+    pd.testing.assert_frame_equal(old_view.to_frame('600001'), first['600001'], check_freq=False)
+
+
+def test_old_data_files_are_pruned(tmp_path):
+    for seed in range(3):
+        _build(tmp_path, _frames(['600000'], 20, seed))
+    data_files = [n for n in os.listdir(tmp_path) if n.endswith('.dat')]
+    # The current build and the one before it
+    assert len(data_files) == 2
+    assert MarketPanel.exists(str(tmp_path))
+
+
+def test_mismatched_data_file_is_rejected(tmp_path):
+    _build(tmp_path, _frames(['600000', '600001'], 30))
+    meta_path = tmp_path / META_FILE
+    meta = json.loads(meta_path.read_text(encoding='utf-8'))
+    meta['shape'][1] += 1
+    meta_path.write_text(json.dumps(meta), encoding='utf-8')
+    with pytest.raises(ValueError):
+        MarketPanel(str(tmp_path))
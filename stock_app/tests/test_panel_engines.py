@@ -0,0 +1,56 @@
+"""Panel engines (panel_indicators, panel_strategies) against the per-stock DataFrame path."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicator_state
+from market_panel import MarketPanel
+from panel_indicators import PanelIndicators, compare_with_frames as compare_indicators
+from panel_strategies import SignalCube, compare_with_frames as compare_signals
+
+
+class FrameLoader:
+    def __init__(self, frames):
+        self.frames = frames
+
+    def get_stock_list(self):
+        return pd.DataFrame({'code': list(self.frames)})
+
+    def get_k_data(self, code, start_date, end_date):
+        return self.frames[code]
+
+
+@pytest.fixture(scope="module")
+def view(tmp_path_factory):
+    frames = {}
+    for i in range(12):
+        df = indicator_state._synthetic_frame(420, i)
+        if i % 3 == 1:
+            df = df.drop(index=range(180, 200)).reset_index(drop=True)    # suspension
+        if i % 4 == 2:
+            df = df.iloc[90:].reset_index(drop=True)                       # listed later
+        if i == 5:
+            df = df.drop(columns='amount')                                 # source without amount
+        frames[f"6000{i:02d}"] = df
+    panel = MarketPanel.build(FrameLoader(frames), str(tmp_path_factory.mktemp("panel")),
+                              start_date="2020-01-01", end_date="2030-01-01")
+    return panel.view()
+
+
+def test_indicators_match_per_stock_frames(view):
+    result = PanelIndicators.from_view(view)
+    assert compare_indicators(view, result, codes=view.codes) == {}
+
+
+def test_signal_cube_matches_check_all(view):
+    cube = SignalCube.from_view(view)
+    assert compare_signals(view, cube, codes=view.codes) == {}
+
+
+def test_cube_combinations(view):
+    cube = SignalCube.from_view(view)
+    a, b = cube.mask('Signal_Limit'), cube.mask('Signal_Pinbar')
+    np.testing.assert_array_equal(cube._unpack(cube.combine(['Signal_Limit', 'Signal_Pinbar'])), a & b)
+    np.testing.assert_array_equal(cube._unpack(cube.combine(['Signal_Limit', 'Signal_Pinbar'], how='or')), a | b)
+    np.testing.assert_array_equal(cube.hits(['Signal_Limit']), a.any(axis=0))
@@ -0,0 +1,45 @@
+"""Quote bar append (realtime_quotes) and the indicator state it keeps current."""
+
+import pytest
+
+import indicator_state
+import realtime_quotes
+from indicator_state import IndicatorStateStore
+from indicators import Indicators
+
+
+def _quote(df, i, **changes):
+    bar = df.iloc[i]
+    quote = {'code': '600001', 'date': bar['date'].strftime('%Y-%m-%d'), 'open': bar['open'],
+             'close': bar['close'], 'high': bar['high'], 'low': bar['low'], 'volume': bar['volume'],
+             'amount': bar['amount'], 'prev_close': df['close'].iloc[i - 1], 'suspended': False}
+    quote.update(changes)
+    return quote
+
+
+@pytest.fixture
+def warehouse(tmp_path):
+    df = indicator_state._synthetic_frame(320, 11)
+    df.iloc[:300].to_csv(tmp_path / "600001.csv", index=False)
+    return tmp_path, df
+
+
+def test_appended_bar_advances_state(warehouse):
+    data_dir, df = warehouse
+    store = IndicatorStateStore(str(data_dir / "state"))
+    realtime_quotes.sync_indicator_state('600001', store, str(data_dir))
+
+    for i in range(300, 303):
+        assert realtime_quotes.append_quote_bar(_quote(df, i), str(data_dir)) == 'appended'
+        row = realtime_quotes.sync_indicator_state('600001', store, str(data_dir))
+        full = Indicators.add_all_indicators(df.iloc[:i + 1])
+        for name, value in row.items():
+            assert value == pytest.approx(full[name].iloc[-1], rel=1e-8, abs=1e-10, nan_ok=True), name
+
+
+def test_append_outcomes(warehouse):
+    data_dir, df = warehouse
+    assert realtime_quotes.append_quote_bar({'code': '600001', 'suspended': True}, str(data_dir)) == 'suspended'
+    assert realtime_quotes.append_quote_bar(_quote(df, 300, code='600002'), str(data_dir)) == 'missing'
+    assert realtime_quotes.append_quote_bar(_quote(df, 300, prev_close=1.0), str(data_dir)) == 'stale'
+    assert realtime_quotes.append_quote_bar(_quote(df, 299), str(data_dir)) == 'unchanged'
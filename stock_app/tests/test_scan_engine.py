@@ -0,0 +1,58 @@
+"""Scan engine: vectorized (signal cube) screening against the per-stock path."""
+
+import datetime
+
+import pytest
+
+import indicator_state
+from data_loader import DataLoader
+from market_panel import MarketPanel
+from panel_strategies import SIGNALS
+from scan_engine import ScanEngine, ScanJob
+
+SCAN_START = datetime.date(2022, 6, 1)
+SCAN_END = datetime.date(2022, 11, 30)
+
+
+@pytest.fixture(scope="module")
+def loader(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp("warehouse") / "market_data"
+    data_dir.mkdir()
+    codes = ["000001"] + [f"6000{i:02d}" for i in range(30)]
+    for seed, code in enumerate(codes):
+        df = indicator_state._synthetic_frame(500, seed)
+        if seed % 7 == 3:
+            df = df.drop(index=range(200, 230)).reset_index(drop=True)   # suspension
+        df.to_csv(data_dir / f"{code}.csv", index=False)
+    with open(data_dir / "stock_list.csv", "w", encoding="utf-8") as f:
+        f.write("code,name\n" + "".join(f"{c},S{c}\n" for c in codes))
+    loader = DataLoader(data_dir=str(data_dir))
+    MarketPanel.build(loader, loader.panel_dir, start_date="2021-01-01", end_date="2023-12-31")
+
+    # Listed after the panel build: served from its file
+    indicator_state._synthetic_frame(500, 99).to_csv(data_dir / "600099.csv", index=False)
+    with open(data_dir / "stock_list.csv", "a", encoding="utf-8") as f:
+        f.write("600099,S600099\n")
+    return loader
+
+
+SELECTIONS = [[s] for s in SIGNALS] + [['Signal_Limit', 'Signal_Pinbar'], ['Signal_HPS', 'Signal_HMC'],
+                                       ['Signal_2B', 'Signal_Spring']]
+
+
+@pytest.mark.parametrize("selected", SELECTIONS, ids=lambda sel: "+".join(s[7:] for s in sel))
+def test_cube_matches_per_stock_scan(loader, selected):
+    stocks = ScanEngine.stock_pairs(loader.get_stock_list())
+    reference = ScanEngine('serial', source='files').run(ScanJob('screen', selected, SCAN_START, SCAN_END),
+                                                         stocks, loader=loader)
+    result = ScanEngine('serial').run(ScanJob('screen', selected, SCAN_START, SCAN_END), stocks, loader=loader)
+
+    assert result.source == 'panel'
+    assert (result.vectorized, result.file_fallback, result.done, result.total) == (31, 1, 32, 32)
+    assert result.to_frame().equals(reference.to_frame())
+
+
+def test_not_vectorized_outside_screening(loader):
+    stocks = ScanEngine.stock_pairs(loader.get_stock_list())
+    result = ScanEngine('serial').run(ScanJob('weak', ['Limit'], SCAN_START, SCAN_END), stocks, loader=loader)
+    assert result.vectorized == 0 and result.done == result.total == 32
@@ -0,0 +1,28 @@
+"""TA-Lib backend parity (talib_backend.verify); skipped when TA-Lib is not installed."""
+
+import pytest
+
+pytest.importorskip("talib")
+
+import talib_backend
+from indicators import Indicators
+from strategy_registry import LEGACY_WARMUP
+
+
+def test_parity_on_synthetic_frame():
+    # verify() checks the full frame and a fresh frame of its last LEGACY_WARMUP bars
+    report = talib_backend.verify()
+    assert report['ok'].all(), report[~report['ok']].to_string()
+
+
+def test_parity_on_scan_window():
+    df = talib_backend._synthetic_frame(n=LEGACY_WARMUP, seed=3)
+    report = talib_backend.verify(df)
+    assert report['ok'].all(), report[~report['ok']].to_string()
+
+
+def test_set_backend_accepts_talib():
+    try:
+        assert Indicators.set_backend('talib') == 'talib'
+    finally:
+        Indicators.set_backend('pandas')
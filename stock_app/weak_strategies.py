@@ -9,6 +9,10 @@ Royal 股票抄底实战策略模块
 import pandas as pd
 import numpy as np
 
+import jit_kernels
+import kernels
+from feature_context import FeatureContext
+
 
 class WeakStrategies:
     """弱势股抄底策略集合"""
@@ -17,8 +21,8 @@ class WeakStrategies:
     def _calculate_rsi(series, period):
         """辅助函数：计算RSI"""
         delta = series.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+        gain = kernels.rolling_mean(delta.where(delta > 0, 0), period)
+        loss = kernels.rolling_mean(-delta.where(delta < 0, 0), period)
         rs = gain / loss
         return 100 - (100 / (1 + rs))
     
@@ -36,14 +40,14 @@ class WeakStrategies:
         :param winner_col: 获利盘比例列名，默认'winner_pct' (0-100)
         :return: 包含HLP3信号的DataFrame
         """
-        df = df.copy()
+        out = pd.DataFrame(index=df.index)
         
         # 检查是否有获利盘数据
         if winner_col not in df.columns:
             # 如果没有数据，返回全False信号
-            df['HLP3_Signal'] = False
-            df['HLP3_Warning'] = True  # 标记数据缺失
-            return df
+            out['HLP3_Signal'] = False
+            out['HLP3_Warning'] = True  # 标记数据缺失
+            return out
         
         # 昨日获利盘 < 1
         cond_despair = df[winner_col].shift(1) < 1
@@ -52,13 +56,13 @@ class WeakStrategies:
         cond_surge = df[winner_col] > 35
         
         # 综合信号
-        df['HLP3_Signal'] = cond_despair & cond_surge
-        df['HLP3_Warning'] = False
+        out['HLP3_Signal'] = cond_despair & cond_surge
+        out['HLP3_Warning'] = False
         
-        return df
+        return out
     
     @staticmethod
-    def strategy_limit(df):
+    def strategy_limit(df, ctx=None):
         """
         Limit (极致缩量) - 量能静默筛查
         
@@ -66,28 +70,30 @@ class WeakStrategies:
         买入扳机：缩量后放量突破20日均量线 + 收阳
         
         :param df: 包含OHLCV的DataFrame
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含Limit信号的DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 计算20日均量
-        vma20 = df['volume'].rolling(window=20).mean()
+        vma20 = ctx.vol_ma(20)
         
         # 极致缩量：量 < 均量的一半
-        df['Limit_Signal'] = df['volume'] < (vma20 * 0.5)
+        out['Limit_Signal'] = df['volume'] < (vma20 * 0.5)
         
         # 进阶：Limit后放量突破 (Limit Breakout)
         # 过去5天内出现过Limit + 今日放量突破20日线 + 收阳
-        limit_setup = df['Limit_Signal'].rolling(window=5).max() > 0
+        limit_setup = kernels.rolling_max(out['Limit_Signal'], 5) > 0
         vol_breakout = df['volume'] > vma20
         bull_candle = df['close'] > df['open']
         
-        df['Limit_BO_Signal'] = limit_setup & vol_breakout & bull_candle
+        out['Limit_BO_Signal'] = limit_setup & vol_breakout & bull_candle
         
-        return df
+        return out
     
     @staticmethod
-    def strategy_rsi_reversion(df):
+    def strategy_rsi_reversion(df, ctx=None):
         """
         RSI均值回归 - 技术极度超卖
         
@@ -96,12 +102,14 @@ class WeakStrategies:
         买入时机：第3天开盘博弈反弹
         
         :param df: 包含OHLCV的DataFrame
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含RSI回归信号的DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 计算 EMA200
-        ema200 = df['close'].ewm(span=200, adjust=False).mean()
+        ema200 = ctx.ema(200)
         
         # 计算 RSI(2)
         rsi2 = WeakStrategies._calculate_rsi(df['close'], 2)
@@ -113,14 +121,14 @@ class WeakStrategies:
         cond_oversold = (rsi2.shift(1) < 25) & (rsi2 < 25)
         
         # 综合信号 (在第3天触发)
-        df['RSI_Rev_Signal'] = cond_trend & cond_oversold
+        out['RSI_Rev_Signal'] = cond_trend & cond_oversold
         
-        return df
+        return out
     
     # ========== 第二阶段：形态确认（寻找"诱空"与"试探"） ==========
     
     @staticmethod
-    def strategy_spring(df):
+    def strategy_spring(df, ctx=None):
         """
         Spring (弹簧) - 诱空形态
         
@@ -128,12 +136,14 @@ class WeakStrategies:
         含义：主力清洗最后浮筹，测试供应
         
         :param df: 包含OHLCV的DataFrame
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含Spring信号的DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 定义支撑：过去20天的最低点（不含今日）
-        support = df['low'].rolling(window=20).min().shift(1)
+        support = ctx.rolling_min('low', 20).shift(1)
         
         # 1. 最低价跌破支撑
         break_support = df['low'] < support
@@ -142,16 +152,16 @@ class WeakStrategies:
         recover = df['close'] > support
         
         # 3. 缩量特征 (可选，增强信号质量)
-        vma20 = df['volume'].rolling(window=20).mean()
+        vma20 = ctx.vol_ma(20)
         low_volume = df['volume'] < vma20
         
         # Spring信号：击穿且拉回
-        df['Spring_Signal'] = break_support & recover & low_volume
+        out['Spring_Signal'] = break_support & recover & low_volume
         
-        return df
+        return out
     
     @staticmethod
-    def strategy_pinbar(df):
+    def strategy_pinbar(df, ctx=None):
         """
         Pinbar (长钉 / 单针探底) - 多头长钉
         
@@ -159,28 +169,30 @@ class WeakStrategies:
         含义：恐慌盘涌出被主力全盘接下（多头探底神针）
         
         :param df: 包含OHLCV的DataFrame
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含Pinbar信号的DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 计算K线各部分
         body = abs(df['close'] - df['open'])
         lower_shadow = df[['close', 'open']].min(axis=1) - df['low']
         
         # 成交量放大 (大于20日均量)
-        vma20 = df['volume'].rolling(window=20).mean()
+        vma20 = ctx.vol_ma(20)
         vol_up = df['volume'] > vma20
         
         # 下影线 > 实体 * 3
         pin_shape = lower_shadow > (body * 3)
         
         # 多头长钉信号
-        df['Pinbar_Signal'] = pin_shape & vol_up
+        out['Pinbar_Signal'] = pin_shape & vol_up
         
-        return df
+        return out
     
     @staticmethod
-    def strategy_money_flow(df):
+    def strategy_money_flow(df, ctx=None):
         """
         Money Flow Divergence (资金背离)
         
@@ -195,9 +207,11 @@ class WeakStrategies:
         净流入 = SUM(DT - KT, 10)  # 10日累计
         
         :param df: 包含OHLCV的DataFrame
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含资金背离信号的DataFrame
         """
-        df = df.copy()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
         # 昨日收盘
         ref_c = df['close'].shift(1)
@@ -216,21 +230,21 @@ class WeakStrategies:
         kt = (df['volume'] * k1) * 100
         
         # 10日累计净流入
-        net_flow = pd.Series(dt - kt).rolling(window=10).sum()
-        df['Money_Flow'] = net_flow
+        net_flow = kernels.rolling_sum(pd.Series(dt - kt), 10)
+        out['Money_Flow'] = net_flow
         
         # 背离逻辑：股价创20日新低 + 资金流为正
-        price_low = df['close'] == df['close'].rolling(20).min()
-        flow_positive = df['Money_Flow'] > 0
+        price_low = df['close'] == ctx.rolling_min('close', 20)
+        flow_positive = out['Money_Flow'] > 0
         
-        df['Money_Flow_Signal'] = price_low & flow_positive
+        out['Money_Flow_Signal'] = price_low & flow_positive
         
-        return df
+        return out
     
     # ========== 第三阶段：买入扳机（确认"有"与"启动"） ==========
     
     @staticmethod
-    def strategy_ua(df, period=250):
+    def strategy_ua(df, period=250, ctx=None):
         """
         UA (Ultimate Amount 天量) - 底部天量突破
         
@@ -239,67 +253,63 @@ class WeakStrategies:
         
         :param df: 包含OHLCV的DataFrame
         :param period: 天量检测周期，默认250日
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含UA信号的DataFrame
         """
-        df = df.copy()
-        
-        # 识别天量（250日内最大成交量）
-        df['UA_Is_Max'] = df['volume'] == df['volume'].rolling(period).max()
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
-        # 记录天量当日的最高价 (作为突破目标位)
-        df['UA_Target_High'] = np.where(df['UA_Is_Max'], df['high'], np.nan)
-        df['UA_Target_High'] = df['UA_Target_High'].ffill()  # 向下填充
+        # 识别天量（250日内最大成交量），记录最近一次天量当日的最高价 (作为突破目标位)
+        out['UA_Is_Max'], out['UA_Target_High'] = jit_kernels.ua_target_high(df['volume'], df['high'], period)
         
         # UA突破买点：收盘价站上最近一次UA的最高价 (且当日不是UA日)
-        df['UA_Breakout_Signal'] = (df['close'] > df['UA_Target_High']) & (~df['UA_Is_Max'])
+        out['UA_Breakout_Signal'] = (df['close'] > out['UA_Target_High']) & (~out['UA_Is_Max'])
         
-        return df
+        return out
     
     @staticmethod
-    def strategy_double_volume_hold(df):
+    def strategy_double_volume_hold(df, ctx=None):
         """
         倍量不破 (Double Volume Hold)
         
         核心逻辑：今日量 > 昨日量 * 2 (倍量阳线)
         买入时机：回调不破该阳线最低价，再次启动时买入
         
+        状态机 (jit_kernels.double_volume_hold)：倍量柱出现后开始跟踪其最低价；
+        收盘跌破则失效，直到下一根倍量柱；守住期间第一次放量阳线即为信号，
+        之后等待下一根倍量柱。
+        
         :param df: 包含OHLCV的DataFrame
+        :param ctx: 可选的 FeatureContext（多个策略共享已计算的特征）
         :return: 包含倍量不破信号的DataFrame
         """
-        df = df.copy()
-        
-        # 1. 识别倍量柱
-        double_vol = df['volume'] > (df['volume'].shift(1) * 2)
-        
-        # 2. 标记倍量柱的最低价
-        df['Double_Vol_Low'] = np.where(double_vol, df['low'], np.nan)
-        df['Double_Vol_Low'] = df['Double_Vol_Low'].ffill()  # 填充最近的倍量低点
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        out = pd.DataFrame(index=df.index)
         
-        # 3. 检查是否守住 (当前收盘价 > 倍量低点)
-        df['Is_Holding'] = df['close'] > df['Double_Vol_Low']
+        # 倍量柱最低价 / 倍量后是否一直守住 / 守住后再次放量阳线
+        out['Double_Vol_Low'], out['Is_Holding'], out['Double_Vol_Signal'] = jit_kernels.double_volume_hold(
+            df['open'], df['close'], df['low'], df['volume'], ctx.vol_ma(20))
         
-        # 4. 信号：倍量后守住低点 + 再次放量
-        vma20 = df['volume'].rolling(window=20).mean()
-        vol_up = df['volume'] > vma20
-        
-        df['Double_Vol_Signal'] = df['Is_Holding'] & vol_up & (df['close'] > df['open'])
-        
-        return df
+        return out
     
     @staticmethod
-    def check_all_weak_strategies(df, selected_strategies=None, winner_col='winner_pct'):
+    def check_all_weak_strategies(df, selected_strategies=None, winner_col='winner_pct', ctx=None):
         """
         检查所有抄底策略
         
         :param df: 个股数据 DataFrame
         :param selected_strategies: 选中的策略列表
         :param winner_col: 获利盘列名（用于HLP3）
+        :param ctx: 可选的 FeatureContext，传入后可与强势策略共享特征
         :return: 包含所有策略信号的 DataFrame
         """
         if selected_strategies is None:
             selected_strategies = ['HLP3', 'Limit', 'RSI_Rev', 'Spring', 
                                   'Pinbar', 'Money_Flow', 'UA', 'Double_Vol']
         
+        # 20日均量等特征每只股票只计算一次，各策略共用
+        ctx = ctx if ctx is not None else FeatureContext(df)
+        
         signals = pd.DataFrame(index=df.index)
         
         # 第一阶段：扫描与初筛
@@ -309,34 +319,34 @@ class WeakStrategies:
             signals['HLP3_Warning'] = hlp3_result['HLP3_Warning']
         
         if 'Limit' in selected_strategies:
-            limit_result = WeakStrategies.strategy_limit(df)
+            limit_result = WeakStrategies.strategy_limit(df, ctx=ctx)
             # 使用Limit突破信号作为主信号
             signals['Signal_Limit'] = limit_result['Limit_BO_Signal']
         
         if 'RSI_Rev' in selected_strategies:
-            rsi_result = WeakStrategies.strategy_rsi_reversion(df)
+            rsi_result = WeakStrategies.strategy_rsi_reversion(df, ctx=ctx)
             signals['Signal_RSI_Rev'] = rsi_result['RSI_Rev_Signal']
         
         # 第二阶段：形态确认
         if 'Spring' in selected_strategies:
-            spring_result = WeakStrategies.strategy_spring(df)
+            spring_result = WeakStrategies.strategy_spring(df, ctx=ctx)
             signals['Signal_Spring'] = spring_result['Spring_Signal']
         
         if 'Pinbar' in selected_strategies:
-            pinbar_result = WeakStrategies.strategy_pinbar(df)
+            pinbar_result = WeakStrategies.strategy_pinbar(df, ctx=ctx)
             signals['Signal_Pinbar'] = pinbar_result['Pinbar_Signal']
         
         if 'Money_Flow' in selected_strategies:
-            flow_result = WeakStrategies.strategy_money_flow(df)
+            flow_result = WeakStrategies.strategy_money_flow(df, ctx=ctx)
             signals['Signal_Money_Flow'] = flow_result['Money_Flow_Signal']
         
         # 第三阶段：买入扳机
         if 'UA' in selected_strategies:
-            ua_result = WeakStrategies.strategy_ua(df)
+            ua_result = WeakStrategies.strategy_ua(df, ctx=ctx)
             signals['Signal_UA'] = ua_result['UA_Breakout_Signal']
         
         if 'Double_Vol' in selected_strategies:
-            dv_result = WeakStrategies.strategy_double_volume_hold(df)
+            dv_result = WeakStrategies.strategy_double_volume_hold(df, ctx=ctx)
             signals['Signal_Double_Vol'] = dv_result['Double_Vol_Signal']
         
         return signals